@@ -0,0 +1,333 @@
+import glob
+import hashlib
+import json
+import os
+import re
+import threading
+
+import discovery_cache
+
+CATALOG_FILE = "address-catalog.json"
+CATALOG_VERSION = 1
+
+IDENT_RE = re.compile(r'[A-Za-z_][\w-]*')
+NUMBER_RE = re.compile(r'\d+(\.\d+)?([eE][+-]?\d+)?')
+HEREDOC_RE = re.compile(r'<<-?([A-Za-z_]\w*)[ \t]*\n')
+INDEX_RE = r'\[(?:"[^"\\]*"|\d+)\]'
+# module.<name>[<index>][.module...].<resource_type>.<resource_name>[<"key"> or <index>]; also imports-generator's check
+ADDRESS_RE = re.compile(
+    rf'^((?:module\.[A-Za-z_][\w-]*(?:{INDEX_RE})?\.)*)'
+    rf'([a-z][a-z0-9_]*\.[A-Za-z_][\w-]*)({INDEX_RE})?$'
+)
+MODULE_RE = re.compile(rf'module\.([A-Za-z_][\w-]*)({INDEX_RE})?\.')
+
+
+# Just enough of an HCL scanner to find blocks, their labels and their own
+# attributes, and to read type constraints and literal values: comments and
+# heredoc bodies are skipped, strings (including ${...} interpolations holding
+# braces and quotes) become single tokens, and operators other than '=' are
+# dropped.
+
+def _interpolation_end(text, i):
+    depth = 1
+    while i < len(text) and depth:
+        c = text[i]
+        if c == '"':
+            _, i = _string(text, i)
+            continue
+        if c == '{':
+            depth += 1
+        elif c == '}':
+            depth -= 1
+        i += 1
+    return i
+
+def _string(text, i):
+    """Returns (literal text, index after the closing quote) for the string starting at text[i]."""
+    j = i + 1
+    while j < len(text):
+        c = text[j]
+        if c == '\\':
+            j += 2
+            continue
+        if c == '"' or c == '\n':
+            return text[i + 1:j], j + 1
+        if c in '$%' and text.startswith(c + '{', j + 1):
+            j += 3  # $${ and %%{ are escaped, literal template markers
+            continue
+        if c in '$%' and text.startswith('{', j + 1):
+            j = _interpolation_end(text, j + 2)
+            continue
+        j += 1
+    return text[i + 1:j], j
+
+def tokens(text):
+    """Yields (kind, value) tokens: 'ident', 'string', 'number', 'newline' and the punctuation {}()[],=."""
+    i, n = 0, len(text)
+    while i < n:
+        c = text[i]
+        if c == '#' or text.startswith('//', i):
+            i = text.find('\n', i)
+            if i < 0:
+                return
+            continue
+        if text.startswith('/*', i):
+            end = text.find('*/', i + 2)
+            i = n if end < 0 else end + 2
+            continue
+        if c == '"':
+            value, i = _string(text, i)
+            yield 'string', value
+            continue
+        if text.startswith('<<', i):
+            heredoc = HEREDOC_RE.match(text, i)
+            if heredoc:
+                end = re.compile(rf'^[ \t]*{re.escape(heredoc.group(1))}[ \t]*$', re.M).search(text, heredoc.end())
+                i = n if end is None else end.end()
+                yield 'string', ''
+                continue
+        if c.isalpha() or c == '_':
+            ident = IDENT_RE.match(text, i)
+            yield 'ident', ident.group()
+            i = ident.end()
+            continue
+        if c.isdigit():
+            number = NUMBER_RE.match(text, i)
+            yield 'number', number.group()
+            i = number.end()
+            continue
+        if c == '=':
+            if text[i + 1:i + 2] in ('=', '>'):
+                i += 2
+                continue
+            if i == 0 or text[i - 1] not in '!<>':
+                yield '=', c
+        elif c in '{}()[],':
+            yield c, c
+        elif c == '\n':
+            yield 'newline', c
+        i += 1
+
+def parse_blocks(text):
+    """Returns [(block type, [labels], {attribute: string value or None})] for the top-level blocks of a .tf file.
+
+    Only a block's own attributes are collected (so a for_each inside a
+    dynamic block doesn't count); non-string values are recorded as None.
+    """
+    blocks = []
+    depth = 0
+    header = []
+    line = []
+    current = None
+    attribute = None
+    for kind, value in tokens(text):
+        if kind == '{':
+            if depth == 0 and header and header[0][0] == 'ident':
+                current = (header[0][1], [v for k, v in header[1:] if k == 'string'], {})
+                blocks.append(current)
+            depth += 1
+            header, line, attribute = [], [], None
+        elif kind == '}':
+            depth = max(0, depth - 1)
+            line, attribute = [], None
+            if depth == 0:
+                current = None
+        elif depth == 0:
+            header = [] if kind == 'newline' else header + [(kind, value)]
+        elif depth == 1 and current is not None:
+            if attribute is not None:
+                current[2][attribute] = value if kind == 'string' else None
+                attribute = None
+            if kind == 'newline':
+                line = []
+            elif kind == '=' and len(line) == 1 and line[0][0] == 'ident':
+                attribute = line[0][1]
+                current[2][attribute] = None
+                line.append((kind, value))
+            else:
+                line.append((kind, value))
+    return blocks
+
+
+def shape_of(attributes):
+    return "for_each" if "for_each" in attributes else "count" if "count" in attributes else "single"
+
+def config_files(directory):
+    return {path: os.stat(path).st_mtime_ns for path in sorted(glob.glob(os.path.join(directory, "*.tf")))}
+
+def installed_modules(root):
+    """{module key: directory} from terraform init's .terraform/modules/modules.json, for non-local module sources."""
+    try:
+        with open(os.path.join(root, ".terraform", "modules", "modules.json")) as f:
+            entries = json.load(f).get("Modules", [])
+    except (OSError, ValueError):
+        return {}
+    return {entry["Key"]: os.path.join(root, entry["Dir"]) for entry in entries if entry.get("Key") and entry.get("Dir")}
+
+def scan_config(root):
+    """Parses the configuration in root and every module it calls.
+
+    Returns (resources, modules, files): resources and modules map each
+    address without instance keys (module.rts.aws_route_table.private_a) to
+    "single", "count" or "for_each"; files maps every .tf file read to its
+    mtime. Modules whose source is neither local nor installed by terraform
+    init contribute no resources.
+    """
+    resources, modules, files = {}, {}, {}
+    installed = None
+    pending = [(root, "", "")]
+    while pending:
+        directory, prefix, key = pending.pop()
+        found = config_files(directory)
+        files.update(found)
+        for path in found:
+            with open(path) as f:
+                blocks = parse_blocks(f.read())
+            for block_type, labels, attributes in blocks:
+                if block_type == "resource" and len(labels) == 2:
+                    resources[f"{prefix}{labels[0]}.{labels[1]}"] = shape_of(attributes)
+                elif block_type == "module" and labels:
+                    module = f"{prefix}module.{labels[0]}"
+                    modules[module] = shape_of(attributes)
+                    module_key = f"{key}.{labels[0]}" if key else labels[0]
+                    source = attributes.get("source") or ""
+                    if source.startswith(("./", "../")):
+                        child = os.path.normpath(os.path.join(directory, source))
+                    else:
+                        if installed is None:
+                            installed = installed_modules(root)
+                        child = installed.get(module_key)
+                    if child and os.path.isdir(child):
+                        pending.append((child, module + ".", module_key))
+    return resources, modules, files
+
+
+class AddressCatalog:
+    """The resource addresses a Terraform configuration can hold, for resolving and checking import addresses."""
+    __slots__ = ("resources", "modules", "files", "digest", "by_resource")
+
+    def __init__(self, resources, modules, files=None):
+        self.resources = resources
+        self.modules = modules
+        self.files = files or {}
+        self.digest = hashlib.sha256(json.dumps([resources, modules], sort_keys=True).encode()).hexdigest()[:16]
+        self.by_resource = {}
+        for address in resources:
+            self.by_resource.setdefault('.'.join(address.split('.')[-2:]), []).append(address)
+
+    def resolve(self, relative):
+        """Places a module-relative address such as 'aws_subnet.public_a' or
+        'aws_route.public_routes["0.0.0.0/0"]' in the configuration.
+
+        The instance key is fitted to the resource's shape: kept for
+        for_each, [0] for count; a single resource takes none, so a key
+        given for one is a reason rather than being dropped (different keys
+        would otherwise collide on one address). Returns (address, None),
+        or (None, reason) when it can't be placed.
+        """
+        resource, _, key = relative.partition('[')
+        key = key[:-1] if key else None
+        candidates = self.by_resource.get(resource)
+        if not candidates:
+            return None, f"no {resource} resource in the Terraform configuration"
+        if len(candidates) > 1:
+            return None, f"{resource} is defined in more than one module ({', '.join(sorted(candidates))})"
+        address = candidates[0]
+        module_path = address.rsplit('.', 2)[0]
+        for module in [m for m in self.modules if module_path == m or module_path.startswith(m + ".")]:
+            if self.modules[module] != "single":
+                return None, f"{module} uses {self.modules[module]}, so {resource} has no fixed address"
+        shape = self.resources[address]
+        if shape == "for_each":
+            if not key or not key.startswith('"'):
+                return None, f"{address} uses for_each and needs a key"
+            return f"{address}[{key}]", None
+        if shape == "count":
+            return f"{address}[{key if key and key.isdigit() else 0}]", None
+        if key:
+            return None, _index_problem(address, shape, f"[{key}]")
+        return address, None
+
+    def check(self, address):
+        """Why a full resource address doesn't exist in the configuration, or None if it does."""
+        match = ADDRESS_RE.match(address or "")
+        if not match:
+            return "not a valid resource address"
+        module_part, resource, index = match.groups()
+        module_path = ""
+        for name, module_index in MODULE_RE.findall(module_part):
+            module_path += f"module.{name}"
+            shape = self.modules.get(module_path)
+            if shape is None:
+                return f"no module {module_path} in the Terraform configuration"
+            problem = _index_problem(module_path, shape, module_index)
+            if problem:
+                return problem
+            module_path += "."
+        shape = self.resources.get(module_path + resource)
+        if shape is None:
+            return f"no {module_path}{resource} in the Terraform configuration"
+        return _index_problem(module_path + resource, shape, index)
+
+    def to_dict(self):
+        return {"version": CATALOG_VERSION, "resources": self.resources, "modules": self.modules, "files": self.files}
+
+def _index_problem(address, shape, index):
+    if shape == "for_each" and not (index and index.startswith('["')):
+        return f"{address} uses for_each and needs a [\"key\"]"
+    if shape == "count" and not (index and index[1:-1].isdigit()):
+        return f"{address} uses count and needs a [number]"
+    if shape == "single" and index:
+        return f"{address} is a single resource and takes no {index}"
+    return None
+
+
+_catalogs = {}
+_catalogs_lock = threading.Lock()
+
+
+def _load_cached(path):
+    try:
+        with open(path) as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if data.get("version") != CATALOG_VERSION:
+        return None
+    directories = {os.path.dirname(p) for p in data["files"]}
+    try:
+        current = {}
+        for directory in directories:
+            current.update(config_files(directory))
+    except OSError:
+        return None
+    if current != data["files"]:
+        return None
+    return AddressCatalog(data["resources"], data["modules"], data["files"])
+
+def load_catalog(tf_dir, cache_dir=discovery_cache.CACHE_DIR):
+    """The AddressCatalog of the configuration in tf_dir, or None when tf_dir has no .tf files.
+
+    Parsed once per process, and reused across runs from
+    <tf_dir>/<cache_dir>/address-catalog.json until a .tf file it was built
+    from is changed, added or removed.
+    """
+    tf_dir = os.path.abspath(tf_dir)
+    with _catalogs_lock:
+        if tf_dir in _catalogs:
+            return _catalogs[tf_dir]
+        path = os.path.join(tf_dir, cache_dir, CATALOG_FILE)
+        catalog = _load_cached(path)
+        if catalog is None:
+            resources, modules, files = scan_config(tf_dir)
+            catalog = AddressCatalog(resources, modules, files) if files else None
+            if catalog is not None:
+                try:
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    with open(path + ".tmp", 'w') as f:
+                        json.dump(catalog.to_dict(), f)
+                    os.replace(path + ".tmp", path)
+                except OSError:
+                    pass  # a read-only checkout just parses every run
+        _catalogs[tf_dir] = catalog
+        return catalog
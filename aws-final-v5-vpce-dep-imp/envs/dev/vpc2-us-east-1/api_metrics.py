@@ -0,0 +1,295 @@
+import json
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+THROTTLING_CODES = {
+    "Throttling", "ThrottlingException", "ThrottledException", "RequestThrottled",
+    "RequestThrottledException", "RequestLimitExceeded", "TooManyRequestsException",
+    "ProvisionedThroughputExceededException", "SlowDown",
+}
+OPERATION_STATS = ("calls", "pages", "items", "seconds", "max_page_seconds", "bytes", "retries", "throttles", "errors")
+METRIC_PREFIX = "vpc_discovery"
+
+
+def snake_case(name):
+    """'DescribeRouteTables' -> 'describe_route_tables', the client method name."""
+    return re.sub(r'(?<!^)(?=[A-Z])', '_', name).lower()
+
+def error_code(exc):
+    return ((getattr(exc, 'response', None) or {}).get('Error') or {}).get('Code')
+
+def is_throttling(exc):
+    return error_code(exc) in THROTTLING_CODES
+
+
+class DiscoveryProfile:
+    """API statistics per operation and time per discovery phase for one run.
+
+    Operation stats are updated from worker threads; phases are only marked
+    from the thread consuming the records.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.finished = None
+        self.operations = {}
+        self.phases = {}
+        self.current = None
+        self._lock = threading.Lock()
+
+    def instrument(self, client):
+        return InstrumentedClient(client, self)
+
+    def _stats(self, operation):
+        stats = self.operations.get(operation)
+        if stats is None:
+            stats = self.operations[operation] = dict.fromkeys(OPERATION_STATS, 0)
+        return stats
+
+    def record_call(self, operation):
+        with self._lock:
+            self._stats(operation)["calls"] += 1
+
+    def record_page(self, operation, page, seconds):
+        metadata = page.get('ResponseMetadata') or {}
+        items = sum(len(value) for value in page.values() if isinstance(value, list))
+        size = int((metadata.get('HTTPHeaders') or {}).get('content-length') or 0)
+        with self._lock:
+            stats = self._stats(operation)
+            stats["pages"] += 1
+            stats["items"] += items
+            stats["seconds"] += seconds
+            stats["max_page_seconds"] = max(stats["max_page_seconds"], seconds)
+            stats["bytes"] += size
+            stats["retries"] += metadata.get('RetryAttempts', 0)
+
+    def record_error(self, operation, exc, seconds, count_throttle=True):
+        metadata = (getattr(exc, 'response', None) or {}).get('ResponseMetadata') or {}
+        with self._lock:
+            stats = self._stats(operation)
+            stats["errors"] += 1
+            stats["seconds"] += seconds
+            stats["retries"] += metadata.get('RetryAttempts', 0)
+            if count_throttle and is_throttling(exc):
+                stats["throttles"] += 1
+
+    def on_needs_retry(self, response=None, operation=None, **kwargs):
+        """botocore needs-retry hook: counts every throttled attempt, retried or not. Never alters retrying."""
+        if response is not None and operation is not None:
+            code = ((response[1] or {}).get('Error') or {}).get('Code')
+            if code in THROTTLING_CODES:
+                with self._lock:
+                    self._stats(snake_case(operation.name))["throttles"] += 1
+        return None
+
+    def phase(self, name):
+        """Marks the start of a phase; later time is charged to it until the next mark."""
+        self.current = name
+        self.phases.setdefault(name, {"seconds": 0.0, "api_wait": 0.0})
+
+    @contextmanager
+    def section(self, name, api=False):
+        """Times a block as phase name; with api, the whole block also counts as api_wait."""
+        previous = self.current
+        self.phase(name)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.phases[name]["seconds"] += elapsed
+            if api:
+                self.phases[name]["api_wait"] += elapsed
+            self.current = previous
+
+    def _charge(self, field, start):
+        name = self.current or "other"
+        self.phases.setdefault(name, {"seconds": 0.0, "api_wait": 0.0})[field] += time.perf_counter() - start
+
+    def timed(self, records):
+        """Yields from records, charging only the time spent producing each one (not the consumer's) to the current phase."""
+        iterator = iter(records)
+        while True:
+            start = time.perf_counter()
+            try:
+                record = next(iterator)
+            except StopIteration:
+                self._charge("seconds", start)
+                return
+            self._charge("seconds", start)
+            yield record
+
+    def waited(self, fetch):
+        """Wraps a fetched callable so time blocked on its describe results counts as the current phase's api_wait."""
+        def run():
+            start = time.perf_counter()
+            iterator = iter(fetch())
+            self._charge("api_wait", start)
+            while True:
+                start = time.perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    self._charge("api_wait", start)
+                    return
+                self._charge("api_wait", start)
+                yield item
+        return run
+
+    def finish(self):
+        self.finished = time.perf_counter()
+
+    def total_seconds(self):
+        return (self.finished or time.perf_counter()) - self.started
+
+    def to_dict(self):
+        phases = {}
+        for name, phase in self.phases.items():
+            phases[name] = {"seconds": round(phase["seconds"], 6), "api_wait": round(phase["api_wait"], 6),
+                            "local": round(max(0.0, phase["seconds"] - phase["api_wait"]), 6)}
+        operations = {}
+        for name, stats in sorted(self.operations.items()):
+            operations[name] = {k: round(v, 6) if isinstance(v, float) else v for k, v in stats.items()}
+        return {"total_seconds": round(self.total_seconds(), 6), "operations": operations, "phases": phases}
+
+    def to_prometheus(self):
+        """Node-exporter textfile format."""
+        data = self.to_dict()
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP {METRIC_PREFIX}_{name} {help_text}")
+            lines.append(f"# TYPE {METRIC_PREFIX}_{name} {kind}")
+            for labels, value in samples:
+                label_text = ",".join(f'{k}="{v}"' for k, v in labels.items())
+                lines.append(f"{METRIC_PREFIX}_{name}{{{label_text}}} {value}" if label_text else f"{METRIC_PREFIX}_{name} {value}")
+
+        operations = data["operations"]
+        for stat, kind, help_text in (
+            ("calls", "counter", "describe_* calls (one per paginated call)"),
+            ("pages", "counter", "response pages received"),
+            ("items", "counter", "items received"),
+            ("seconds", "counter", "seconds spent waiting on responses"),
+            ("max_page_seconds", "gauge", "slowest single page"),
+            ("bytes", "counter", "response bytes (Content-Length)"),
+            ("retries", "counter", "retry attempts reported by botocore"),
+            ("throttles", "counter", "throttled attempts"),
+            ("errors", "counter", "calls that failed after retries"),
+        ):
+            suffix = "" if kind == "gauge" else "_total"
+            metric(f"api_{stat}{suffix}", kind, help_text,
+                   [({"operation": name}, stats[stat]) for name, stats in operations.items()])
+        for field, help_text in (("seconds", "wall seconds spent producing records in the phase"),
+                                 ("api_wait", "seconds of the phase spent blocked on describe results")):
+            metric(f"phase_{field}", "gauge", help_text,
+                   [({"phase": name}, phase[field]) for name, phase in data["phases"].items()])
+        metric("run_seconds", "gauge", "wall seconds for the whole run", [({}, data["total_seconds"])])
+        return "\n".join(lines) + "\n"
+
+    def export(self, path):
+        """Writes a JSON export, or a Prometheus textfile when path ends in .prom; replaced atomically for scrapers."""
+        content = self.to_prometheus() if path.endswith(".prom") else json.dumps(self.to_dict(), indent=2)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+        return path
+
+    def print_summary(self):
+        data = self.to_dict()
+        print(f"\n--- DISCOVERY PROFILE ({data['total_seconds']:.2f}s total) ---")
+        print(f"{'OPERATION':<30}{'CALLS':>6}{'PAGES':>7}{'ITEMS':>8}{'SECONDS':>9}{'MAX PAGE':>10}"
+              f"{'BYTES':>11}{'RETRIES':>9}{'THROTTLED':>10}{'ERRORS':>8}")
+        for name, s in data["operations"].items():
+            print(f"{name:<30}{s['calls']:>6}{s['pages']:>7}{s['items']:>8}{s['seconds']:>9.3f}{s['max_page_seconds']:>10.3f}"
+                  f"{s['bytes']:>11}{s['retries']:>9}{s['throttles']:>10}{s['errors']:>8}")
+        print(f"\n{'PHASE':<30}{'SECONDS':>9}{'API WAIT':>10}{'LOCAL':>9}")
+        accounted = 0.0
+        for name, p in data["phases"].items():
+            accounted += p["seconds"]
+            print(f"{name:<30}{p['seconds']:>9.3f}{p['api_wait']:>10.3f}{p['local']:>9.3f}")
+        print(f"{'other (setup, writing output)':<30}{max(0.0, data['total_seconds'] - accounted):>9.3f}")
+
+
+class NullProfile:
+    """Stands in for DiscoveryProfile when profiling is off; every hook is a no-op."""
+
+    def instrument(self, client):
+        return client
+
+    def phase(self, name):
+        pass
+
+    def section(self, name, api=False):
+        return nullcontext()
+
+    def timed(self, records):
+        return records
+
+    def waited(self, fetch):
+        return fetch
+
+NO_PROFILE = NullProfile()
+
+
+class InstrumentedPaginator:
+    def __init__(self, paginator, operation, profile, hooked):
+        self._paginator = paginator
+        self._operation = operation
+        self._profile = profile
+        self._hooked = hooked
+
+    def paginate(self, **kwargs):
+        profile = self._profile
+        profile.record_call(self._operation)
+        pages = iter(self._paginator.paginate(**kwargs))
+        while True:
+            start = time.perf_counter()
+            try:
+                page = next(pages)
+            except StopIteration:
+                return
+            except Exception as e:
+                profile.record_error(self._operation, e, time.perf_counter() - start, not self._hooked)
+                raise
+            profile.record_page(self._operation, page, time.perf_counter() - start)
+            yield page
+
+class InstrumentedClient:
+    """Wraps a boto3 EC2 client so paginated and direct describe_* calls are measured in profile.
+
+    Throttled attempts are counted through botocore's needs-retry event when
+    the client has one; otherwise only a call's final throttling error is.
+    """
+
+    def __init__(self, client, profile):
+        self._client = client
+        self._profile = profile
+        events = getattr(getattr(client, 'meta', None), 'events', None)
+        self._hooked = events is not None
+        if self._hooked:
+            events.register_first('needs-retry.ec2', profile.on_needs_retry)
+
+    def get_paginator(self, operation):
+        return InstrumentedPaginator(self._client.get_paginator(operation), operation, self._profile, self._hooked)
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        if not name.startswith('describe_') or not callable(attr):
+            return attr
+        profile = self._profile
+
+        def call(**kwargs):
+            profile.record_call(name)
+            start = time.perf_counter()
+            try:
+                response = attr(**kwargs)
+            except Exception as e:
+                profile.record_error(name, e, time.perf_counter() - start, not self._hooked)
+                raise
+            profile.record_page(name, response, time.perf_counter() - start)
+            return response
+        return call
@@ -0,0 +1,169 @@
+"""Micro-benchmark: legacy hcl_format_map/hcl_format_list vs. the streaming hcl_writer.
+
+Run from anywhere: python benchmarks/bench_hcl.py [--sizes 100 1000 10000] [--depth 40]
+"""
+import argparse
+import io
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from hcl_writer import write_hcl_assignment  # noqa: E402
+
+
+# --- legacy implementation, kept verbatim as the baseline -----------------
+
+def hcl_format_list(data, indent=0):
+    if not data:
+        return "[]"
+    
+    indent_str = ' ' * indent
+    lines = [indent_str + "["]
+    
+    for i, item in enumerate(data):
+        is_last = (i == len(data) - 1)
+        comma = "," if not is_last else ""
+        map_content = hcl_format_map(item, indent + 2) 
+        map_lines = map_content.split('\n')
+        map_lines[-1] += comma   
+        lines.append('\n' + '\n'.join(map_lines)) 
+        
+    lines.append('\n' + indent_str + "]")
+    return "".join(lines)
+
+
+def hcl_format_map(data, indent=0):
+    if not data:
+        return "{}"
+    
+    indent_str = ' ' * indent
+    inner_indent_str = ' ' * (indent + 2)
+    lines = [indent_str + "{"]
+    keys = sorted(data.keys())
+
+    for i, key in enumerate(keys):
+        value = data[key]
+        is_last = (i == len(keys) - 1)
+        comma = "," if not is_last else ""
+        
+        if isinstance(value, dict):
+            hcl_value = hcl_format_map(value, indent + 2)
+        elif isinstance(value, list) and value and isinstance(value[0], dict):
+            hcl_value = hcl_format_list(value, indent + 2)
+        elif isinstance(value, list):
+            list_items = ', '.join([f'"{x}"' if isinstance(x, str) else str(x) for x in value])
+            hcl_value = f'[{list_items}]'
+        elif isinstance(value, str):
+            hcl_value = f'"{value}"'
+        elif isinstance(value, bool):
+            hcl_value = str(value).lower()
+        elif isinstance(value, (int, float)):
+            hcl_value = str(value)
+        else:
+            lines.append(f'\n{inner_indent_str}# TODO: Unhandled type for {key}')
+            continue
+            
+        if hcl_value.startswith('{') or hcl_value.startswith('['):
+            hcl_lines = hcl_value.split('\n')
+            hcl_lines[-1] += comma
+            
+            lines.append(f'\n{inner_indent_str}{key} = {hcl_lines[0]}')
+            lines.append('\n'.join(hcl_lines[1:]))
+            
+        else:
+            lines.append(f'\n{inner_indent_str}{key} = {hcl_value}{comma}')
+            
+    lines.append('\n' + indent_str + "}")
+    return "".join(lines)
+
+# ---------------------------------------------------------------------------
+
+
+def make_subnets(n):
+    tiers = ("public", "private", "nonroutable")
+    per_tier = max(1, n // len(tiers))
+    return {
+        tier: {f"k{i:06d}": {"cidr": f"10.{t}.{i // 256 % 256}.{i % 256}/32", "az": f"us-east-1{'abc'[i % 3]}"}
+               for i in range(per_tier)}
+        for t, tier in enumerate(tiers)
+    }
+
+def make_nacl_rules(n):
+    half = max(1, n // 2)
+    return {
+        tier: [{"rule_no": 100 + i, "protocol": "6", "from": i % 65535, "to": i % 65535,
+                "cidr": f"10.{i // 256 % 256}.{i % 256}.0/24", "egress": bool(i % 2)} for i in range(half)]
+        for tier in ("public", "private")
+    }
+
+def make_deep(depth):
+    value = {"cidr": "10.0.0.0/16", "routes": [{"cidr": "0.0.0.0/0", "target": "igw"}]}
+    for i in range(depth):
+        value = {f"level{i}": value, "sibling": [{"n": i}] * 10}
+    return value
+
+def legacy(name, value):
+    return f'{name} = {hcl_format_map(value, 0)}'
+
+def streaming(name, value):
+    out = io.StringIO()
+    write_hcl_assignment(out, name, value)
+    return out.getvalue()
+
+def best_of(fn, *args, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def peak_kib(fn, *args):
+    tracemalloc.start()
+    fn(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak // 1024
+
+def legacy_to_file(name, value):
+    with tempfile.TemporaryFile('w') as f:
+        f.write(legacy(name, value))
+
+def to_file(name, value):
+    with tempfile.TemporaryFile('w') as f:
+        write_hcl_assignment(f, name, value)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000, 50000])
+    parser.add_argument("--depth", type=int, default=60)
+    args = parser.parse_args()
+
+    cases = []
+    for n in args.sizes:
+        cases.append((f"subnets n={n}", "subnets", make_subnets(n)))
+        cases.append((f"nacl_rules n={n}", "nacl_rules", make_nacl_rules(n)))
+    cases.append((f"nested depth={args.depth}", "route_tables", make_deep(args.depth)))
+
+    print(f"{'CASE':<24}{'BYTES':>12}{'LEGACY s':>12}{'STREAM s':>12}{'FILE s':>12}{'SPEEDUP':>9}"
+          f"{'LEGACY KiB':>12}{'FILE KiB':>10}  SAME")
+    for label, name, value in cases:
+        same = legacy(name, value) == streaming(name, value)
+        t_legacy = best_of(legacy, name, value)
+        t_stream = best_of(streaming, name, value)
+        t_file = best_of(to_file, name, value)
+        size = len(streaming(name, value))
+        mem_legacy = peak_kib(legacy_to_file, name, value)
+        mem_file = peak_kib(to_file, name, value)
+        print(f"{label:<24}{size:>12}{t_legacy:>12.4f}{t_stream:>12.4f}{t_file:>12.4f}{t_legacy / t_stream:>8.1f}x"
+              f"{mem_legacy:>12}{mem_file:>10}  {same}")
+        if not same:
+            sys.exit(f"output mismatch for {label}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""Offline benchmark of discovery, record I/O and tfvars/import generation on synthetic VPCs.
+
+Run from anywhere: python benchmarks/bench_pipeline.py [--subnets 30 300 3000] [--latency 20]
+    [--report bench-report.json] [--baseline previous-report.json]
+
+No AWS access: describe_* calls are served by benchmarks/synthetic_vpc.py with
+multi-page responses and per-page latency. Each phase is timed (best of
+--repeat) and then run once more under tracemalloc for its peak memory.
+"""
+import argparse
+import contextlib
+import importlib.util
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from functools import partial
+
+SCRIPT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SCRIPT_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import rate_limiter  # noqa: E402
+import record_stream  # noqa: E402
+import synthetic_vpc  # noqa: E402
+
+
+def load_script(filename):
+    """Imports one of the hyphenated CLI scripts as a module."""
+    spec = importlib.util.spec_from_file_location(filename[:-3].replace('-', '_'), os.path.join(SCRIPT_DIR, filename))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def best_of(fn, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def peak_kib(fn):
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak // 1024
+
+def quiet(fn):
+    def run():
+        with contextlib.redirect_stdout(io.StringIO()):
+            return fn()
+    return run
+
+def build_phases(discover, tfvars, imports, client, data, workdir):
+    """Returns [(phase name, callable)] in pipeline order; later phases reuse the first discovery's records."""
+    vpc = data["Vpcs"][0]
+    prefetched = {name: data[key] for name, (_, key, _) in discover.DISCOVERY_CALLS.items()}
+    records = list(discover.discover_vpc(vpc, client, 1, prefetched))
+    ndjson_path = os.path.join(workdir, record_stream.RECORDS_FILE)
+    json_path = os.path.join(workdir, record_stream.LEGACY_FILE)
+    record_stream.write_records(records, ndjson_path)
+    record_stream.write_records(records, json_path)
+
+    def in_workdir(fn):
+        def run():
+            cwd = os.getcwd()
+            os.chdir(workdir)
+            try:
+                fn()
+            finally:
+                os.chdir(cwd)
+        return run
+
+    return [
+        ("discover_sequential", lambda: list(discover.discover_vpc(vpc, client, 1))),
+        ("discover_concurrent", lambda: list(discover.discover_vpc(vpc, client, discover.DEFAULT_WORKERS))),
+        ("classify", lambda: list(discover.discover_vpc(vpc, client, 1, prefetched))),
+        ("write_ndjson", partial(record_stream.write_records, records, ndjson_path)),
+        ("read_ndjson", lambda: list(record_stream.iter_records(ndjson_path))),
+        ("write_json", partial(record_stream.write_records, records, json_path)),
+        ("read_json", lambda: list(record_stream.iter_records(json_path))),
+        ("tfvars", in_workdir(lambda: tfvars.generate_tfvars_from_json(record_stream.iter_records(ndjson_path), ndjson_path))),
+        ("imports", in_workdir(lambda: imports.generate_imports_from_json(ndjson_path, "imports.tf"))),
+    ], len(records)
+
+def run_case(modules, size, args):
+    data = synthetic_vpc.make_vpc(0, subnets=size, azs=args.azs, routes=args.routes,
+                                  nacl_entries=args.nacl_entries, endpoints=args.endpoints, sg_rules=args.sg_rules)
+    fake = synthetic_vpc.SyntheticEC2(data, page_size=args.page_size, latency=args.latency / 1000.0,
+                                      throttle_every=args.throttle_every)
+    client = fake
+    if args.api_rate or args.throttle_every:
+        bucket = rate_limiter.TokenBucket(args.api_rate or rate_limiter.DEFAULT_RATE)
+        client = rate_limiter.RateLimitedClient(fake, bucket, rate_limiter.RetryPolicy(base_delay=0.01))
+    result = {"case": f"subnets={size}", "counts": synthetic_vpc.counts(data), "phases": {}}
+
+    with tempfile.TemporaryDirectory() as workdir:
+        with contextlib.redirect_stdout(io.StringIO()):
+            phases, result["records"] = build_phases(*modules, client, data, workdir)
+        for name, fn in phases:
+            fn = quiet(fn)
+            fake.reset_stats()
+            seconds = best_of(fn, args.repeat)
+            api = {"calls": sum(fake.calls.values()) // args.repeat, "pages": sum(fake.pages.values()) // args.repeat}
+            if fake.throttled:
+                api["throttled"] = fake.throttled // args.repeat
+            result["phases"][name] = {"seconds": round(seconds, 6), "peak_kib": peak_kib(fn)}
+            if api["calls"]:
+                result["phases"][name].update(api)
+    return result
+
+def compare(report, baseline, tolerance):
+    """Returns one line per phase that got slower or bigger than baseline by more than tolerance."""
+    previous = {r["case"]: r["phases"] for r in baseline.get("results", [])}
+    regressions = []
+    for result in report["results"]:
+        for name, phase in result["phases"].items():
+            before = previous.get(result["case"], {}).get(name)
+            if not before:
+                continue
+            for metric in ("seconds", "peak_kib"):
+                if before[metric] and phase[metric] > before[metric] * (1 + tolerance):
+                    regressions.append(f"{result['case']} {name} {metric}: {before[metric]} -> {phase[metric]}")
+    return regressions
+
+def print_table(report):
+    print(f"{'CASE':<16}{'PHASE':<22}{'SECONDS':>10}{'PEAK KiB':>10}{'CALLS':>7}{'PAGES':>7}")
+    for result in report["results"]:
+        for name, phase in result["phases"].items():
+            print(f"{result['case']:<16}{name:<22}{phase['seconds']:>10.4f}{phase['peak_kib']:>10}"
+                  f"{phase.get('calls', ''):>7}{phase.get('pages', ''):>7}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--subnets", type=int, nargs="+", default=[30, 300, 3000], help="subnets per synthetic VPC, one case each")
+    parser.add_argument("--azs", type=int, default=3)
+    parser.add_argument("--routes", type=int, default=10, help="routes per route table besides the local one")
+    parser.add_argument("--nacl-entries", type=int, default=20)
+    parser.add_argument("--endpoints", type=int, default=3)
+    parser.add_argument("--sg-rules", type=int, default=50, help="ingress CIDR rules on the module's security group")
+    parser.add_argument("--page-size", type=int, default=100, help="items per describe_* page")
+    parser.add_argument("--latency", type=float, default=20.0, help="simulated milliseconds per describe_* page")
+    parser.add_argument("--api-rate", type=float, default=0,
+                        help="send discovery through the rate limiter at this many requests/s (0 = no limiter)")
+    parser.add_argument("--throttle-every", type=int, default=0,
+                        help="fail every Nth page request with RequestLimitExceeded (implies the limiter)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--report", help="write the machine-readable JSON report here")
+    parser.add_argument("--baseline", help="earlier report to compare against; exits 1 on regressions")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown/growth vs. --baseline (0.25 = 25%%)")
+    args = parser.parse_args()
+
+    modules = (load_script("discover-aws.py"), load_script("tfvars-generator.py"), load_script("imports-generator.py"))
+    report = {
+        "generated_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "params": {k: v for k, v in vars(args).items() if k not in ("report", "baseline")},
+        "results": [run_case(modules, size, args) for size in args.subnets],
+    }
+
+    print_table(report)
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.report}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
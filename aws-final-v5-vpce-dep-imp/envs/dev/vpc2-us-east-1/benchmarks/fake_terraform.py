@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""Stand-in terraform binary for exercising imports-generator.py --execute offline.
+
+    python imports-generator.py --execute --terraform benchmarks/fake_terraform.py
+
+Supports `init`, `import [options] ADDRESS ID` and `show -json PLAN`, which
+prints PLAN as is, so a plan JSON captured elsewhere can stand in for a saved
+plan (plan-verifier.py --tfplan). Imported addresses are kept
+as NDJSON in FAKE_TF_STATE (default fake.tfstate.ndjson in the working
+directory) under an exclusive lock, like the local backend; an address already
+there is reported as already managed. Environment knobs:
+
+    FAKE_TF_LATENCY     seconds each import takes while holding the lock (default 0.05)
+    FAKE_TF_FAIL        regex; matching addresses fail with a provider error
+    FAKE_TF_FLAKY       regex; matching addresses hit a state lock error on their first attempt
+"""
+import fcntl
+import json
+import os
+import re
+import sys
+import time
+
+STATE_FILE = os.environ.get("FAKE_TF_STATE", "fake.tfstate.ndjson")
+
+
+def imported_addresses(f):
+    f.seek(0)
+    return {json.loads(line)["address"] for line in f if line.strip()}
+
+def flaky_once(address):
+    marker = f"{STATE_FILE}.flaky"
+    with open(marker, 'a+') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        f.seek(0)
+        if address in f.read().splitlines():
+            return False
+        f.write(address + '\n')
+        return True
+
+def do_import(address, aws_id):
+    pattern = os.environ.get("FAKE_TF_FLAKY")
+    if pattern and re.search(pattern, address) and flaky_once(address):
+        print("Error: Error acquiring the state lock", file=sys.stderr)
+        return 1
+
+    with open(STATE_FILE, 'a+') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        if address in imported_addresses(f):
+            print(f"Error: {'Resource already managed by Terraform'}", file=sys.stderr)
+            print(f'Terraform is already managing a remote object for {address}.', file=sys.stderr)
+            return 1
+        time.sleep(float(os.environ.get("FAKE_TF_LATENCY", "0.05")))
+        pattern = os.environ.get("FAKE_TF_FAIL")
+        if pattern and re.search(pattern, address):
+            print(f"Error: Cannot import non-existent remote object\n\nWhile attempting to import {aws_id}",
+                  file=sys.stderr)
+            return 1
+        f.write(json.dumps({"address": address, "id": aws_id}) + '\n')
+    print(f"{address}: Import prepared!\nImport successful!")
+    return 0
+
+def show(path):
+    with open(path) as f:
+        while chunk := f.read(1 << 20):
+            sys.stdout.write(chunk)
+    return 0
+
+def main(argv):
+    if not argv:
+        print("Usage: fake_terraform.py init|import [options] ADDRESS ID|show -json PLAN", file=sys.stderr)
+        return 2
+    command, args = argv[0], [a for a in argv[1:] if not a.startswith('-')]
+    if command == "init":
+        print("Terraform has been successfully initialized!")
+        return 0
+    if command == "import" and len(args) == 2:
+        return do_import(*args)
+    if command == "show" and "-json" in argv and len(args) == 1:
+        return show(args[0])
+    print(f"Error: unsupported fake terraform command: {' '.join(argv)}", file=sys.stderr)
+    return 1
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
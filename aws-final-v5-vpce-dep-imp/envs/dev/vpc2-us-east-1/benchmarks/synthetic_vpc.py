@@ -0,0 +1,270 @@
+"""Synthetic VPC fixtures and an in-process EC2 stand-in for offline benchmarks.
+
+make_vpc() builds describe_* items for one VPC of a chosen size; SyntheticEC2
+serves them through the same get_paginator()/paginate() surface discovery
+uses, split into pages of page_size with latency seconds slept per page.
+throttle_every=N makes every Nth page request fail with RequestLimitExceeded,
+and operations listed in failing always fail, to exercise retries and
+per-type failure handling.
+"""
+import threading
+import time
+from types import SimpleNamespace
+
+TIERS = ("public", "private", "nonroutable")
+SERVICES = ("s3", "ssm", "ec2messages", "ssmmessages", "kms", "logs", "sts", "ecr.api", "ecr.dkr")
+
+# describe operation -> result key
+RESULT_KEYS = {
+    "describe_vpcs": "Vpcs",
+    "describe_internet_gateways": "InternetGateways",
+    "describe_subnets": "Subnets",
+    "describe_nat_gateways": "NatGateways",
+    "describe_route_tables": "RouteTables",
+    "describe_network_acls": "NetworkAcls",
+    "describe_vpc_endpoints": "VpcEndpoints",
+    "describe_security_groups": "SecurityGroups",
+    "describe_dhcp_options": "DhcpOptions",
+}
+
+# filter name / id list parameter -> item field
+FILTER_FIELDS = {
+    "vpc-id": "VpcId",
+    "subnet-id": "SubnetId",
+    "nat-gateway-id": "NatGatewayId",
+    "route-table-id": "RouteTableId",
+    "network-acl-id": "NetworkAclId",
+    "vpc-endpoint-id": "VpcEndpointId",
+    "internet-gateway-id": "InternetGatewayId",
+    "group-id": "GroupId",
+    "dhcp-options-id": "DhcpOptionsId",
+}
+ID_PARAMS = {"VpcIds": "VpcId", "SubnetIds": "SubnetId", "RouteTableIds": "RouteTableId", "NetworkAclIds": "NetworkAclId"}
+
+
+def name_tag(name):
+    return [{"Key": "Name", "Value": name}]
+
+def subnet_cidr(vpc_index, i, count):
+    """Non-overlapping subnet CIDRs inside 10.<vpc_index>.0.0/16: /28s up to 4096 subnets, /32s beyond."""
+    size, prefix = (16, 28) if count <= 4096 else (1, 32)
+    offset = i * size
+    return f"10.{vpc_index % 256}.{offset // 256 % 256}.{offset % 256}/{prefix}"
+
+def make_vpc(vpc_index=0, subnets=9, azs=3, routes=2, nacl_entries=4, endpoints=3, sg_rules=8,
+             region="us-east-1", owner="111122223333"):
+    """Returns {result key: [items]} for one VPC.
+
+    Subnets are spread round-robin over the public/private/nonroutable tiers
+    and azs zones. There is one public route table, one route table per
+    private/nonroutable zone, a NAT gateway per zone, and a single NACL
+    associated with every subnet. Each route table carries routes extra
+    routes next to the local one. The module's security group gets sg_rules
+    ingress rules from adjacent /24s, so they compact well, and the VPC uses
+    its own DHCP options set.
+    """
+    vpc_id = f"vpc-{vpc_index:017x}"
+    zones = [chr(ord('a') + z) for z in range(azs)]
+    data = {key: [] for key in RESULT_KEYS.values()}
+
+    dopt_id = f"dopt-{vpc_index:017x}"
+    data["Vpcs"].append({"VpcId": vpc_id, "OwnerId": owner, "CidrBlock": f"10.{vpc_index % 256}.0.0/16",
+                         "DhcpOptionsId": dopt_id, "State": "available", "Tags": name_tag(f"bench-{region}-vpc{vpc_index}")})
+    data["DhcpOptions"].append({"DhcpOptionsId": dopt_id, "OwnerId": owner, "DhcpConfigurations": [
+        {"Key": "domain-name", "Values": [{"Value": f"{region}.bench.internal"}]},
+        {"Key": "domain-name-servers", "Values": [{"Value": "AmazonProvidedDNS"}]},
+    ]})
+    igw_id = f"igw-{vpc_index:017x}"
+    data["InternetGateways"].append({"InternetGatewayId": igw_id, "OwnerId": owner,
+                                     "Attachments": [{"State": "available", "VpcId": vpc_id}]})
+
+    by_tier_az = {}
+    for i in range(subnets):
+        tier = TIERS[i % len(TIERS)]
+        az = zones[i // len(TIERS) % azs]
+        subnet_id = f"subnet-{vpc_index:08x}{i:09x}"
+        by_tier_az.setdefault((tier, az), []).append(subnet_id)
+        data["Subnets"].append({"SubnetId": subnet_id, "VpcId": vpc_id, "OwnerId": owner,
+                                "CidrBlock": subnet_cidr(vpc_index, i, subnets),
+                                "AvailabilityZone": f"{region}{az}", "State": "available",
+                                "Tags": name_tag(f"{tier}-{az}-{i}")})
+
+    nat_ids = {}
+    for az in zones:
+        public = by_tier_az.get(("public", az))
+        if not public:
+            continue
+        nat_ids[az] = f"nat-{vpc_index:08x}{ord(az):09x}"
+        data["NatGateways"].append({"NatGatewayId": nat_ids[az], "VpcId": vpc_id, "SubnetId": public[0],
+                                    "State": "available",
+                                    "NatGatewayAddresses": [{"AllocationId": f"eipalloc-{vpc_index:08x}{ord(az):09x}"}]})
+
+    def route_table(rt_id, name, subnet_ids, target):
+        extra = [{"DestinationCidrBlock": f"172.{16 + r // 65536 % 16}.{r // 256 % 256}.{r % 256}/32",
+                  "TransitGatewayId": "tgw-0bench", "State": "active"} for r in range(max(0, routes - 1))]
+        if routes:
+            extra.insert(0, dict(target, DestinationCidrBlock="0.0.0.0/0", State="active"))
+        data["RouteTables"].append({
+            "RouteTableId": rt_id, "VpcId": vpc_id, "OwnerId": owner, "Tags": name_tag(name),
+            "Associations": [{"RouteTableAssociationId": f"rtbassoc-{s[7:]}", "RouteTableId": rt_id, "SubnetId": s}
+                             for s in subnet_ids],
+            "Routes": [{"DestinationCidrBlock": f"10.{vpc_index % 256}.0.0/16", "GatewayId": "local"}] + extra,
+        })
+
+    data["RouteTables"].append({"RouteTableId": f"rtb-{vpc_index:08x}main00000", "VpcId": vpc_id, "OwnerId": owner,
+                                "Associations": [{"Main": True, "RouteTableAssociationId": f"rtbassoc-{vpc_index:08x}main00000"}],
+                                "Routes": [{"DestinationCidrBlock": f"10.{vpc_index % 256}.0.0/16", "GatewayId": "local"}]})
+    route_table(f"rtb-{vpc_index:08x}public000", "rt-public",
+                [s for az in zones for s in by_tier_az.get(("public", az), [])], {"GatewayId": igw_id})
+    for t, tier in enumerate(TIERS[1:], 1):
+        for az in zones:
+            if (tier, az) in by_tier_az:
+                target = {"NatGatewayId": nat_ids[az]} if az in nat_ids else {"GatewayId": igw_id}
+                route_table(f"rtb-{vpc_index:08x}{t}{ord(az):08x}", f"rt-{tier}-{az}", by_tier_az[(tier, az)], target)
+
+    acl_id = f"acl-{vpc_index:017x}"
+    data["NetworkAcls"].append({
+        "NetworkAclId": acl_id, "VpcId": vpc_id, "OwnerId": owner, "IsDefault": True,
+        "Associations": [{"NetworkAclAssociationId": f"aclassoc-{s['SubnetId'][7:]}", "NetworkAclId": acl_id,
+                          "SubnetId": s["SubnetId"]} for s in data["Subnets"]],
+        "Entries": [{"RuleNumber": 100 + n, "Protocol": "6", "RuleAction": "allow", "Egress": bool(n % 2),
+                     "CidrBlock": f"10.{n % 256}.0.0/16", "PortRange": {"From": 443, "To": 443}}
+                    for n in range(nacl_entries)],
+    })
+
+    allow_all_out = [{"IpProtocol": "-1", "IpRanges": [{"CidrIp": "0.0.0.0/0"}]}]
+    data["SecurityGroups"].append({"GroupId": f"sg-{vpc_index:017x}", "GroupName": "default", "VpcId": vpc_id,
+                                   "OwnerId": owner, "IpPermissions": [], "IpPermissionsEgress": allow_all_out})
+    data["SecurityGroups"].append({
+        "GroupId": f"sg-{vpc_index:08x}{1:09x}", "GroupName": f"bench-vpc{vpc_index}-sg", "VpcId": vpc_id, "OwnerId": owner,
+        "IpPermissions": [{"IpProtocol": "tcp", "FromPort": 443, "ToPort": 443,
+                           "IpRanges": [{"CidrIp": f"10.{vpc_index % 256}.{r % 256}.0/24", "Description": f"https {r}"}
+                                        for r in range(sg_rules)]}] if sg_rules else [],
+        "IpPermissionsEgress": allow_all_out,
+    })
+
+    for e in range(endpoints):
+        service = SERVICES[e] if e < len(SERVICES) else f"svc{e}"
+        data["VpcEndpoints"].append({"VpcEndpointId": f"vpce-{vpc_index:08x}{e:09x}", "VpcId": vpc_id,
+                                     "ServiceName": f"com.amazonaws.{region}.{service}",
+                                     "VpcEndpointType": "Gateway" if service == "s3" else "Interface",
+                                     "State": "available"})
+    return data
+
+def merge(*fixtures):
+    merged = {}
+    for fixture in fixtures:
+        for key, items in fixture.items():
+            merged.setdefault(key, []).extend(items)
+    return merged
+
+def counts(data):
+    return {
+        "subnets": len(data["Subnets"]),
+        "route_tables": len(data["RouteTables"]),
+        "routes": sum(len(rt["Routes"]) for rt in data["RouteTables"]),
+        "rt_associations": sum(len(rt["Associations"]) for rt in data["RouteTables"]),
+        "nacl_associations": sum(len(acl["Associations"]) for acl in data["NetworkAcls"]),
+        "nat_gateways": len(data["NatGateways"]),
+        "endpoints": len(data["VpcEndpoints"]),
+        "sg_rules": sum(len(perm.get("IpRanges", [])) for sg in data["SecurityGroups"]
+                        for perm in sg["IpPermissions"] + sg["IpPermissionsEgress"]),
+    }
+
+
+class SyntheticClientError(Exception):
+    """Shaped like botocore's ClientError: the error code lives in .response['Error']['Code']."""
+
+    def __init__(self, code, operation):
+        super().__init__(f"An error occurred ({code}) when calling the {operation} operation")
+        self.response = {"Error": {"Code": code, "Message": code}, "ResponseMetadata": {"RetryAttempts": 0}}
+
+
+def _matches(item, flt):
+    name, values = flt["Name"], flt["Values"]
+    if name == "attachment.vpc-id":
+        return any(a.get("VpcId") in values for a in item.get("Attachments", []))
+    if name.startswith("tag:"):
+        return any(t["Key"] == name[4:] and t["Value"] in values for t in item.get("Tags", []))
+    if name in FILTER_FIELDS:
+        return item.get(FILTER_FIELDS[name]) in values
+    raise ValueError(f"SyntheticEC2 does not support filter {name}")
+
+class SyntheticPaginator:
+    def __init__(self, client, operation):
+        self.client = client
+        self.operation = operation
+
+    def paginate(self, Filters=(), PaginationConfig=None, **kwargs):
+        key = RESULT_KEYS[self.operation]
+        items = self.client.data.get(key, [])
+        for flt in Filters:
+            items = [item for item in items if _matches(item, flt)]
+        for param, field in ID_PARAMS.items():
+            if param in kwargs:
+                items = [item for item in items if item.get(field) in kwargs[param]]
+
+        page_size = self.client.page_size
+        client = self.client
+        client.record_call(self.operation)
+        first = int((PaginationConfig or {}).get("StartingToken") or 0)
+        for start in range(first, max(len(items), 1), page_size):
+            if client.latency:
+                time.sleep(client.latency)
+            client.record_page(self.operation)
+            client.maybe_fail(self.operation)
+            page = {key: items[start:start + page_size]}
+            if start + page_size < len(items):
+                page["NextToken"] = str(start + page_size)
+            yield page
+
+class SyntheticEC2:
+    """Stand-in for boto3.client('ec2') covering what discovery calls; safe to share across threads."""
+
+    def __init__(self, data, page_size=100, latency=0.0, region="us-east-1", throttle_every=0, failing=()):
+        self.data = data
+        self.page_size = page_size
+        self.latency = latency
+        self.throttle_every = throttle_every
+        self.failing = set(failing)
+        self.meta = SimpleNamespace(region_name=region)
+        self.calls = {}
+        self.pages = {}
+        self.throttled = 0
+        self._requests = 0
+        self._lock = threading.Lock()
+
+    def maybe_fail(self, operation):
+        if operation in self.failing:
+            raise SyntheticClientError("UnauthorizedOperation", operation)
+        with self._lock:
+            self._requests += 1
+            throttle = self.throttle_every and self._requests % self.throttle_every == 0
+            if throttle:
+                self.throttled += 1
+        if throttle:
+            raise SyntheticClientError("RequestLimitExceeded", operation)
+
+    def get_paginator(self, operation):
+        if operation not in RESULT_KEYS:
+            raise NotImplementedError(f"SyntheticEC2 has no paginator for {operation}")
+        return SyntheticPaginator(self, operation)
+
+    def describe_regions(self, **kwargs):
+        if self.latency:
+            time.sleep(self.latency)
+        return {"Regions": [{"RegionName": self.meta.region_name}]}
+
+    def record_call(self, operation):
+        with self._lock:
+            self.calls[operation] = self.calls.get(operation, 0) + 1
+
+    def record_page(self, operation):
+        with self._lock:
+            self.pages[operation] = self.pages.get(operation, 0) + 1
+
+    def reset_stats(self):
+        with self._lock:
+            self.calls = {}
+            self.pages = {}
+            self.throttled = 0
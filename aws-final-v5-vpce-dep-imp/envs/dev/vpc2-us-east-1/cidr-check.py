@@ -0,0 +1,53 @@
+import argparse
+import sys
+
+import cidr_index
+import record_stream
+
+
+def check_cidrs(paths, free=None, prefixlen=None):
+    """Checks the subnet and VPC CIDRs of a batch of discovery files before generating from them.
+
+    Returns 0 when every subnet sits inside its VPC's CIDRs and nothing
+    overlaps, 1 otherwise. With free, also prints the unused space inside
+    that CIDR across all the files (or the first free /prefixlen).
+    """
+    files = record_stream.find_records_files(paths)
+    if not files:
+        print(f"ERROR: no discovery files found in {', '.join(paths)}")
+        return 1
+
+    cidrs, errors = cidr_index.index_files(files)
+    for path, error in errors.items():
+        print(f"ERROR reading {path}: {error}")
+    problems = cidr_index.find_problems(cidrs)
+    for problem in problems:
+        print(f"CIDR problem: {problem}")
+    print(f"Checked {len(cidrs)} CIDRs from {len(files) - len(errors)} discovery file(s): {len(problems)} problem(s).")
+
+    if free:
+        if prefixlen is not None:
+            block = cidrs.first_free(free, prefixlen)
+            print(f"First free /{prefixlen} in {free}: {block or 'none'}")
+        else:
+            blocks = cidrs.free_blocks(free)
+            print(f"Free space in {free}: {', '.join(blocks) or 'none'}")
+    return 1 if problems or errors else 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check discovered subnet and VPC CIDRs for containment and overlaps")
+    parser.add_argument("paths", nargs="*", metavar="PATH",
+                        help="discovery files, directories searched recursively (e.g. a batch --output-dir) or glob patterns "
+                             f"(default: {record_stream.RECORDS_FILE}, else {record_stream.LEGACY_FILE})")
+    parser.add_argument("--free", metavar="CIDR", help="also report the unused space inside this CIDR, e.g. 10.0.0.0/8")
+    parser.add_argument("--prefix", type=int, metavar="N", help="with --free: report only the first free /N")
+    args = parser.parse_args()
+    if args.prefix is not None and not args.free:
+        parser.error("--prefix needs --free")
+    if args.free:
+        try:
+            cidr_index.parse_cidr(args.free)
+        except ValueError as e:
+            parser.error(str(e))
+
+    sys.exit(check_cidrs(args.paths or [record_stream.default_records_file()], args.free, args.prefix))
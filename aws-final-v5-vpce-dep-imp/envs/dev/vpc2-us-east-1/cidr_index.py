@@ -0,0 +1,256 @@
+import bisect
+import ipaddress
+from collections import namedtuple
+
+import record_stream
+from resource_model import ResourceIndex, Subnet, Vpc
+
+# What a CIDR in the index belongs to: kind is "vpc" or "subnet", source the discovery file.
+Owner = namedtuple("Owner", "kind vpc_id aws_id source")
+
+ADDRESS_BITS = {4: 32, 6: 128}
+
+
+def parse_cidr(cidr):
+    """Returns (version, first, last, prefixlen) as integers; host bits are ignored.
+
+    Dotted-quad IPv4 is parsed with integer arithmetic, IPv6 goes through
+    ipaddress. Raises ValueError for anything that isn't a CIDR.
+    """
+    address, _, prefix = cidr.partition('/')
+    octets = address.split('.')
+    if len(octets) == 4:
+        if not all(o.isdigit() and int(o) <= 255 for o in octets) or (prefix and not prefix.isdigit()):
+            raise ValueError(f"invalid CIDR {cidr!r}")
+        prefixlen = int(prefix) if prefix else 32
+        if prefixlen > 32:
+            raise ValueError(f"invalid CIDR {cidr!r}")
+        value = int(octets[0]) << 24 | int(octets[1]) << 16 | int(octets[2]) << 8 | int(octets[3])
+        size = 1 << (32 - prefixlen)
+        first = value & -size
+        return 4, first, first + size - 1, prefixlen
+    network = ipaddress.ip_network(cidr, strict=False)
+    return network.version, int(network.network_address), int(network.broadcast_address), network.prefixlen
+
+def format_cidr(version, first, prefixlen):
+    if version == 4:
+        return f"{first >> 24}.{first >> 16 & 255}.{first >> 8 & 255}.{first & 255}/{prefixlen}"
+    return f"{ipaddress.IPv6Address(first)}/{prefixlen}"
+
+def aligned_blocks(version, first, last):
+    """Splits [first, last] into the fewest CIDR-aligned blocks, as (first, prefixlen) pairs."""
+    bits = ADDRESS_BITS[version]
+    blocks = []
+    while first <= last:
+        size = first & -first or 1 << bits
+        while size > last - first + 1:
+            size >>= 1
+        blocks.append((first, bits - size.bit_length() + 1))
+        first += size
+    return blocks
+
+def collapse_cidrs(cidrs):
+    """Like ipaddress.collapse_addresses over CIDR strings: overlapping and adjacent blocks are merged
+    into the fewest CIDRs covering exactly the same addresses, IPv4 before IPv6, in address order."""
+    merged = []
+    for version, first, last, _ in sorted(parse_cidr(cidr) for cidr in cidrs):
+        if merged and merged[-1][0] == version and first <= merged[-1][2] + 1:
+            merged[-1][2] = max(merged[-1][2], last)
+        else:
+            merged.append([version, first, last])
+    return [format_cidr(version, start, length)
+            for version, first, last in merged for start, length in aligned_blocks(version, first, last)]
+
+
+class CidrBlock:
+    __slots__ = ("cidr", "version", "first", "last", "prefixlen", "owner")
+
+    def __init__(self, cidr, owner=None):
+        self.cidr = cidr
+        self.version, self.first, self.last, self.prefixlen = parse_cidr(cidr)
+        self.owner = owner
+
+    def __repr__(self):
+        return f"CidrBlock({self.cidr!r}, {self.owner!r})"
+
+class CidrIndex:
+    """CIDRs held as integer ranges for containment, overlap and free-space queries.
+
+    Since two CIDRs are either disjoint or nested, the blocks containing a
+    CIDR are found with one hash lookup per shorter prefix length in use, and
+    the blocks inside it with a bisect over the start addresses.
+    """
+    __slots__ = ("_by_network", "_lengths", "_blocks", "_starts", "_dirty")
+
+    def __init__(self):
+        self._by_network = {}
+        self._lengths = {}
+        self._blocks = {}
+        self._starts = {}
+        self._dirty = set()
+
+    def add(self, cidr, owner=None):
+        block = CidrBlock(cidr, owner)
+        self._by_network.setdefault((block.version, block.prefixlen, block.first), []).append(block)
+        lengths = self._lengths.setdefault(block.version, [])
+        if block.prefixlen not in lengths:
+            lengths.append(block.prefixlen)
+            lengths.sort(reverse=True)
+        self._blocks.setdefault(block.version, []).append(block)
+        self._dirty.add(block.version)
+        return block
+
+    def _sorted(self, version):
+        if version in self._dirty:
+            blocks = self._blocks[version]
+            blocks.sort(key=lambda b: (b.first, -b.last))
+            self._starts[version] = [b.first for b in blocks]
+            self._dirty.discard(version)
+        return self._blocks.get(version, []), self._starts.get(version, [])
+
+    def _containing(self, version, first, prefixlen):
+        bits = ADDRESS_BITS[version]
+        found = []
+        for length in self._lengths.get(version, ()):
+            if length > prefixlen:
+                continue
+            network = first & -(1 << (bits - length))
+            found.extend(self._by_network.get((version, length, network), ()))
+        return found
+
+    def _within(self, version, first, last, prefixlen):
+        blocks, starts = self._sorted(version)
+        found = []
+        for i in range(bisect.bisect_left(starts, first), bisect.bisect_right(starts, last)):
+            if blocks[i].prefixlen > prefixlen:
+                found.append(blocks[i])
+        return found
+
+    def containing(self, cidr):
+        """Blocks that contain cidr (an equal block included), most specific first."""
+        version, first, _, prefixlen = parse_cidr(cidr)
+        return self._containing(version, first, prefixlen)
+
+    def within(self, cidr):
+        """Blocks strictly inside cidr, in address order."""
+        return self._within(*parse_cidr(cidr))
+
+    def overlapping(self, cidr):
+        version, first, last, prefixlen = parse_cidr(cidr)
+        return self._containing(version, first, prefixlen) + self._within(version, first, last, prefixlen)
+
+    def _free(self, cidr):
+        version, first, last, prefixlen = parse_cidr(cidr)
+        free = []
+        cursor = first
+        for block in self._within(version, first, last, prefixlen):
+            if block.first > cursor:
+                free.extend(aligned_blocks(version, cursor, block.first - 1))
+            cursor = max(cursor, block.last + 1)
+        if cursor <= last:
+            free.extend(aligned_blocks(version, cursor, last))
+        return version, free
+
+    def free_blocks(self, cidr):
+        """The unused space inside cidr as the fewest CIDR-aligned blocks, in address order."""
+        version, free = self._free(cidr)
+        return [format_cidr(version, start, length) for start, length in free]
+
+    def first_free(self, cidr, prefixlen):
+        """The lowest free /prefixlen inside cidr, or None when none is left."""
+        version, free = self._free(cidr)
+        for start, length in free:
+            if length <= prefixlen:
+                return format_cidr(version, start, prefixlen)
+        return None
+
+    def __len__(self):
+        return sum(len(blocks) for blocks in self._blocks.values())
+
+    def __iter__(self):
+        for version in sorted(self._blocks):
+            yield from self._sorted(version)[0]
+
+
+def index_resources(resources, source=None, cidrs=None):
+    """Adds the VPC (primary and secondary) and subnet CIDRs of one VPC's ResourceIndex to cidrs.
+
+    Returns the CidrIndex (a new one unless given) and how many CIDRs were
+    added; CIDRs that don't parse are skipped.
+    """
+    if cidrs is None:
+        cidrs = CidrIndex()
+    vpc = resources.first(Vpc.TYPE)
+    vpc_id = (vpc.vpc_id or vpc.aws_id) if vpc else None
+    entries = []
+    if vpc:
+        entries += [(cidr, Owner("vpc", vpc_id, vpc.aws_id, source))
+                    for cidr in [vpc.cidr] + list(vpc.secondary_cidrs or ()) if cidr]
+    entries += [(subnet.cidr, Owner("subnet", vpc_id, subnet.aws_id, source))
+                for subnet in resources.of_type(Subnet.TYPE) if subnet.cidr]
+    added = 0
+    for cidr, owner in entries:
+        try:
+            cidrs.add(cidr, owner)
+        except ValueError:
+            continue
+        added += 1
+    return cidrs, added
+
+def index_files(paths, cidrs=None):
+    """Indexes the VPC and subnet CIDRs of every discovery file in paths; only those two record types are decoded.
+
+    Returns the CidrIndex and {path: error} for files that couldn't be read.
+    """
+    if cidrs is None:
+        cidrs = CidrIndex()
+    errors = {}
+    for path in paths:
+        try:
+            resources = ResourceIndex.from_records(record_stream.iter_records(path, (Vpc.TYPE, Subnet.TYPE)))
+        except (OSError, ValueError) as e:
+            errors[path] = str(e)
+            continue
+        index_resources(resources, path, cidrs)
+    return cidrs, errors
+
+def describe_block(block):
+    owner = block.owner
+    if owner is None:
+        return block.cidr
+    where = f" in {owner.source}" if owner.source else ""
+    if owner.kind == "vpc":
+        return f"VPC {owner.vpc_id} {block.cidr}{where}"
+    # static or hand-written records may have no AWS id yet; the CIDR still identifies the subnet
+    subnet = f"subnet {owner.aws_id} {block.cidr}" if owner.aws_id else f"subnet {block.cidr}"
+    return f"{subnet} (VPC {owner.vpc_id}){where}"
+
+def conflicting(a, b):
+    """True for two subnets of the same VPC, or CIDR blocks of two different VPCs."""
+    if a.owner.kind != b.owner.kind:
+        return False
+    same_vpc = a.owner.vpc_id == b.owner.vpc_id
+    return same_vpc if a.owner.kind == "subnet" else not same_vpc
+
+def find_problems(cidrs):
+    """Returns a message per subnet outside its VPC's CIDRs, per overlapping subnet pair within a VPC,
+    and per overlapping VPC CIDR pair across VPCs."""
+    problems = []
+    visited = set()
+    for block in cidrs:
+        owner = block.owner
+        if owner is None:
+            continue
+        visited.add(id(block))
+        containing = cidrs._containing(block.version, block.first, block.prefixlen)
+        if owner.kind == "subnet" and not any(b.owner and b.owner.kind == "vpc" and b.owner.vpc_id == owner.vpc_id
+                                              for b in containing):
+            problems.append(f"{describe_block(block)} is outside the VPC's CIDR blocks")
+
+        # each pair is reported once, from the block that sorts first (ids may be missing, so they can't break ties)
+        for other in containing + cidrs._within(block.version, block.first, block.last, block.prefixlen):
+            if other is block or other.owner is None or not conflicting(block, other):
+                continue
+            if id(other) not in visited:
+                problems.append(f"{describe_block(block)} overlaps {describe_block(other)}")
+    return problems
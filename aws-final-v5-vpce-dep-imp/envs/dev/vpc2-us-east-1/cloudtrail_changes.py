@@ -0,0 +1,130 @@
+import gzip
+import json
+import os
+from datetime import datetime, timezone
+
+# EC2 calls that can change what discovery would return for a VPC.
+NETWORK_MUTATIONS = {
+    "CreateRoute", "ReplaceRoute", "DeleteRoute",
+    "CreateRouteTable", "DeleteRouteTable",
+    "AssociateRouteTable", "DisassociateRouteTable", "ReplaceRouteTableAssociation",
+    "CreateSubnet", "DeleteSubnet", "ModifySubnetAttribute",
+    "AssociateSubnetCidrBlock", "DisassociateSubnetCidrBlock",
+    "CreateNatGateway", "DeleteNatGateway",
+    "CreateNetworkAcl", "DeleteNetworkAcl", "ReplaceNetworkAclAssociation",
+    "CreateNetworkAclEntry", "ReplaceNetworkAclEntry", "DeleteNetworkAclEntry",
+    "CreateVpcEndpoint", "DeleteVpcEndpoints", "ModifyVpcEndpoint",
+    "CreateInternetGateway", "DeleteInternetGateway", "AttachInternetGateway", "DetachInternetGateway",
+    "CreateSecurityGroup", "DeleteSecurityGroup",
+    "AuthorizeSecurityGroupIngress", "AuthorizeSecurityGroupEgress",
+    "RevokeSecurityGroupIngress", "RevokeSecurityGroupEgress", "ModifySecurityGroupRules",
+    "UpdateSecurityGroupRuleDescriptionsIngress", "UpdateSecurityGroupRuleDescriptionsEgress",
+    "CreateDhcpOptions", "DeleteDhcpOptions", "AssociateDhcpOptions",
+    "CreateTags", "DeleteTags",
+}
+
+# Mutations of the VPC item itself, which the snapshot keeps as its "vpc" entry:
+# they name the VPC by its vpcId rather than the id of anything discovered.
+VPC_MUTATIONS = {"AssociateDhcpOptions"}
+
+# AWS id prefix -> discovery entry name (see DISCOVERY_CALLS in discover-aws.py)
+PREFIX_TYPES = {
+    "igw": "igw",
+    "subnet": "subnets",
+    "nat": "nat_gateways",
+    "rtb": "route_tables",
+    "acl": "nacls",
+    "vpce": "vpc_endpoints",
+    "sg": "security_groups",
+    "dopt": "dhcp_options",
+}
+
+
+def parse_event_time(value):
+    return datetime.strptime(value, "%Y-%m-%dT%H:%M:%SZ").replace(tzinfo=timezone.utc).timestamp()
+
+def iter_event_files(path):
+    if os.path.isfile(path):
+        yield path
+        return
+    for root, _, files in os.walk(path):
+        for name in sorted(files):
+            if name.endswith(".json") or name.endswith(".json.gz"):
+                yield os.path.join(root, name)
+
+def iter_events(path):
+    """Yields CloudTrail events from a file or directory of delivered/exported log files (.json or .json.gz)."""
+    for file_path in iter_event_files(path):
+        opener = gzip.open if file_path.endswith(".gz") else open
+        try:
+            with opener(file_path, 'rt') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Warning: skipping unreadable CloudTrail file {file_path}: {e}")
+            continue
+        if isinstance(data, dict) and "Records" in data:
+            data = data["Records"]
+        elif isinstance(data, dict):
+            data = [data]
+        for event in data:
+            yield event
+
+def iter_ids(value):
+    """Yields every string in a requestParameters/responseElements tree that looks like an AWS resource id."""
+    if isinstance(value, dict):
+        for item in value.values():
+            yield from iter_ids(item)
+    elif isinstance(value, list):
+        for item in value:
+            yield from iter_ids(item)
+    elif isinstance(value, str) and '-' in value and ' ' not in value and len(value) < 64:
+        yield value
+
+def find_changes(path, vpc_id, region, id_index, since_by_type):
+    """Returns ({entry name: {ids to re-describe}}, newest event time in the logs, matching event count).
+
+    id_index maps every id known from the snapshot (including route table and
+    NACL association ids) to (entry name, id to re-describe). An event counts
+    when it names the VPC or one of those ids and happened after the entry of
+    the affected type was last fetched. VPC_MUTATIONS of this VPC come back
+    as {"vpc": {vpc_id}}.
+    """
+    changes = {}
+    horizon = None
+    matched = 0
+
+    for event in iter_events(path):
+        try:
+            event_time = parse_event_time(event["eventTime"])
+        except (KeyError, TypeError, ValueError):
+            continue
+        horizon = event_time if horizon is None else max(horizon, event_time)
+
+        if event.get("eventSource") != "ec2.amazonaws.com" or event.get("eventName") not in NETWORK_MUTATIONS:
+            continue
+        if event.get("errorCode") or (region and event.get("awsRegion") != region):
+            continue
+
+        ids = set(iter_ids(event.get("requestParameters"))) | set(iter_ids(event.get("responseElements")))
+        if vpc_id not in ids and not ids & id_index.keys():
+            continue
+
+        hit = False
+        if event["eventName"] in VPC_MUTATIONS and vpc_id in ids and event_time > since_by_type.get("vpc", 0):
+            changes.setdefault("vpc", set()).add(vpc_id)
+            hit = True
+        for resource_id in ids:
+            if resource_id in id_index:
+                name, target_id = id_index[resource_id]
+            elif resource_id.split('-', 1)[0] in PREFIX_TYPES:
+                name, target_id = PREFIX_TYPES[resource_id.split('-', 1)[0]], resource_id
+            else:
+                continue
+            if event_time > since_by_type.get(name, 0):
+                changes.setdefault(name, set()).add(target_id)
+                hit = True
+
+        if hit:
+            matched += 1
+
+    return changes, horizon, matched
@@ -1,25 +1,117 @@
-import boto3
+import argparse
 import json
+import os
 import re
 import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 
+import address_catalog
+import api_metrics
+import cloudtrail_changes
+import discovery_cache
+import rate_limiter
+import record_stream
+from api_metrics import NO_PROFILE, error_code
+from record_stream import write_records
+from resource_model import (
+    DhcpOptions, Eip, InternetGateway, NatGateway, NetworkAcl, NetworkAclAssociation, ResourceIndex,
+    Route, RouteTable, RouteTableAssociation, SecurityGroup, Subnet, Vpc, VpcEndpoint, parse_tags,
+)
 
+
+# Module-relative address templates. resolve_address() fills them in and places them in
+# the configuration parsed from main.tf and its modules (see address_catalog), which
+# supplies the module and the instance key shape.
 TF_ADDRESSES = {
-    
-    "VPC": "module.vpc.aws_vpc.this",
-    "IGW": "module.vpc.aws_internet_gateway.this",
-    "SUBNET": "module.subnets.aws_subnet.<TYPE>[\"<AZ_KEY>\"]",
-    "EIP": "module.gateways.aws_eip.public_nat[\"<AZ_KEY>\"]",
-    "NAT_GATEWAY": "module.gateways.aws_nat_gateway.private_nat[\"<AZ_KEY>\"]",
-    "ROUTE_TABLE": "module.route_tables.aws_route_table.<TYPE>[\"<AZ_KEY>\"]", 
-    "ROUTE": "module.route_tables.aws_route.<RT_TYPE>[<CIDR>]",
-    "NACL": "module.nacls.aws_network_acl.this[0]",
-    "NACL_ASSOC": "module.nacls.aws_network_acl_association.<RT_TYPE>_assoc[\"<AZ_KEY>\"]",
-    "VPC_ENDPOINT": "module.vpc_endpoints.aws_vpc_endpoint[\"<SERVICE_NAME>\"]",
-    "RT_ASSOC": "module.route_tables.aws_route_table_association.<TYPE>_assoc[\"<AZ_KEY>\"]",
+    "VPC": "aws_vpc.this",
+    "IGW": "aws_internet_gateway.igw",
+    "SUBNET": "aws_subnet.<TYPE>_<AZ_KEY>",
+    "EIP": "aws_eip.public_nat_<AZ_KEY>",
+    "NAT_GATEWAY": "aws_nat_gateway.<NAT_TYPE>_nat_<AZ_KEY>",
+    "ROUTE_TABLE": "aws_route_table.<TYPE><AZ_SUFFIX>",
+    "PUBLIC_ROUTE": "aws_route.public_routes[\"<CIDR>\"]",
+    "NAT_ROUTE": "aws_route.<RT_TYPE>_routes_<AZ_KEY>",
+    "NACL": "aws_network_acl.<NACL_TYPE>",
+    "NACL_ASSOC": "aws_network_acl_association.<RT_TYPE>_assoc[\"<AZ_KEY>\"]",
+    "VPC_ENDPOINT": "aws_vpc_endpoint.<ENDPOINT_TYPE>[\"<SERVICE_NAME>\"]",
+    "RT_ASSOC": "aws_route_table_association.<TYPE>_assoc_<AZ_KEY>",
+    "SECURITY_GROUP": "aws_security_group.default",
+    "DHCP_OPTIONS": "aws_vpc_dhcp_options.this[\"this\"]",
 }
+TF_DIR = os.path.dirname(os.path.abspath(__file__))
 # -----------------------------------------------
 
+AUTH_ERROR_CODES = {
+    "AuthFailure", "UnauthorizedOperation", "InvalidClientTokenId", "ExpiredToken", "ExpiredTokenException",
+    "SignatureDoesNotMatch", "OptInRequired",
+}
+AUTH_EXCEPTIONS = {"NoCredentialsError", "PartialCredentialsError", "CredentialRetrievalError", "TokenRetrievalError"}
+
+# Route tables the route-tables module creates once per AZ (<type>_a, <type>_b, ...)
+PER_AZ_ROUTE_TABLES = ("private", "nonroutable")
+# The only routes the route-tables module defines: IGW routes (keyed by CIDR) in the
+# public table, and one default route to the AZ's NAT gateway in each per-AZ table.
+NAT_ROUTE_DESTINATION = "0.0.0.0/0"
+
+# Route target fields in the order they are checked; GatewayId is typed by its id prefix.
+ROUTE_TARGETS = (
+    ('NatGatewayId', 'nat'),
+    ('TransitGatewayId', 'transit_gateway'),
+    ('VpcPeeringConnectionId', 'vpc_peering'),
+    ('EgressOnlyInternetGatewayId', 'egress_only_igw'),
+    ('CarrierGatewayId', 'carrier_gateway'),
+    ('LocalGatewayId', 'local_gateway'),
+    ('NetworkInterfaceId', 'network_interface'),
+    ('InstanceId', 'instance'),
+    ('CoreNetworkArn', 'core_network'),
+    ('GatewayId', None),
+)
+GATEWAY_TARGET_TYPES = {"igw": "igw", "vgw": "vpn_gateway", "vpce": "vpc_endpoint"}
+
+# The nacls module has a public and a private NACL; nonroutable subnets share the private one.
+NACL_TYPES = {"public": "public", "private": "private", "nonroutable": "private"}
+# Implicit catch-all deny entries every NACL carries (IPv4, IPv6)
+DEFAULT_NACL_RULE_NUMBERS = (32767, 32768)
+
+# DhcpConfigurations key -> (DhcpOptions field, whether it holds a list)
+DHCP_CONFIG_KEYS = {
+    "domain-name": ("domain_name", False),
+    "domain-name-servers": ("domain_name_servers", True),
+    "ntp-servers": ("ntp_servers", True),
+    "netbios-name-servers": ("netbios_name_servers", True),
+    "netbios-node-type": ("netbios_node_type", False),
+}
+
+# Independent per-VPC describe calls: name -> (operation, result key, vpc filter name)
+DISCOVERY_CALLS = {
+    "igw": ('describe_internet_gateways', 'InternetGateways', 'attachment.vpc-id'),
+    "subnets": ('describe_subnets', 'Subnets', 'vpc-id'),
+    "nat_gateways": ('describe_nat_gateways', 'NatGateways', 'vpc-id'),
+    "route_tables": ('describe_route_tables', 'RouteTables', 'vpc-id'),
+    "nacls": ('describe_network_acls', 'NetworkAcls', 'vpc-id'),
+    "vpc_endpoints": ('describe_vpc_endpoints', 'VpcEndpoints', 'vpc-id'),
+    "security_groups": ('describe_security_groups', 'SecurityGroups', 'vpc-id'),
+    "dhcp_options": ('describe_dhcp_options', 'DhcpOptions', 'dhcp-options-id'),
+}
+DEFAULT_WORKERS = len(DISCOVERY_CALLS)
+
+# Calls whose filter value is another field of the VPC item rather than its VpcId
+VPC_FILTER_FIELDS = {"dhcp_options": 'DhcpOptionsId'}
+
+# Per DISCOVERY_CALLS name: the item's id field and the describe filter that selects it by id
+ID_FIELDS = {
+    "igw": ('InternetGatewayId', 'internet-gateway-id'),
+    "subnets": ('SubnetId', 'subnet-id'),
+    "nat_gateways": ('NatGatewayId', 'nat-gateway-id'),
+    "route_tables": ('RouteTableId', 'route-table-id'),
+    "nacls": ('NetworkAclId', 'network-acl-id'),
+    "vpc_endpoints": ('VpcEndpointId', 'vpc-endpoint-id'),
+    "security_groups": ('GroupId', 'group-id'),
+    "dhcp_options": ('DhcpOptionsId', 'dhcp-options-id'),
+}
+
 
 def get_tag_value(tags, key):
     for tag in tags:
@@ -27,66 +119,262 @@ def get_tag_value(tags, key):
             return tag.get('Value')
     return None
 
-def discover_vpc_resources(vpc_identifier):
-    client = boto3.client('ec2')
-    resources_for_import = []
+def paginate(client, operation, result_key, **kwargs):
+    """Yields every item under result_key, following NextToken across pages."""
+    paginator = client.get_paginator(operation)
+    for page in paginator.paginate(**kwargs):
+        for item in page.get(result_key, []):
+            yield item
+
+def make_ec2_client(max_workers=DEFAULT_WORKERS, region=None):
+    """One EC2 client whose connection pool is large enough for every worker thread.
+
+    Requests go through the region's shared rate limiter, which also owns
+    retrying, so botocore's own retries are switched off.
+    """
+    # boto3 is imported here so cached/offline runs never pay for it.
+    import boto3
+    from botocore.config import Config
+
+    config = Config(max_pool_connections=max(10, max_workers), retries={'mode': 'standard', 'max_attempts': 1})
+    client = boto3.client('ec2', region_name=region, config=config)
+    return rate_limiter.RateLimitedClient(client, rate_limiter.limiter_for(client.meta.region_name))
+
+def list_all(client, operation, result_key, **kwargs):
+    return list(paginate(client, operation, result_key, **kwargs))
+
+def route_destination(route):
+    return route.get('DestinationCidrBlock') or route.get('DestinationIpv6CidrBlock') or route.get('DestinationPrefixListId')
+
+def route_target(route):
+    """Returns (target type, target id) for a describe_route_tables route entry."""
+    for field, target_type in ROUTE_TARGETS:
+        target_id = route.get(field)
+        if target_id:
+            return target_type or GATEWAY_TARGET_TYPES.get(target_id.split('-', 1)[0], "gateway"), target_id
+    return None, None
+
+def is_managed_route(route):
+    """False for the implicit local route and for routes propagated from a virtual private gateway."""
+    return route.get('GatewayId') != 'local' and route.get('Origin') not in ('CreateRouteTable', 'EnableVgwRoutePropagation')
+
+def describe_error(exc):
+    return str(exc) or type(exc).__name__
+
+def exit_on_auth_error(exc):
+    """Credentials are first exercised by the VPC lookup; a rejected or missing credential ends the run there."""
+    if error_code(exc) in AUTH_ERROR_CODES or type(exc).__name__ in AUTH_EXCEPTIONS:
+        print("--- AWS AUTHENTICATION ERROR ---")
+        print(f"Details: {exc}")
+        sys.exit(1)
+
+def guard_fetches(fetched, failures):
+    """Wraps each fetched callable so an error describing one resource type is recorded in
+    failures ({name: error}) and that type comes back short, instead of aborting the VPC."""
+    def guarded(name, fetch):
+        def run():
+            try:
+                yield from fetch()
+            except Exception as e:
+                failures[name] = describe_error(e)
+                print(f"Warning: could not describe {name} ({failures[name]}); its records will be missing.")
+        return run
+    return {name: guarded(name, fetch) for name, fetch in fetched.items()}
+
+def vpc_cidr_blocks(vpc):
+    """Returns [primary CIDR] + the associated secondary IPv4 CIDRs of a describe_vpcs item."""
+    primary = vpc.get('CidrBlock')
+    secondary = [assoc['CidrBlock'] for assoc in vpc.get('CidrBlockAssociationSet', [])
+                 if assoc.get('CidrBlock') != primary
+                 and (assoc.get('CidrBlockState') or {}).get('State', 'associated') == 'associated']
+    return ([primary] if primary else []) + secondary
+
+def vpc_filters(name, vpc):
+    """The describe filter selecting the items of DISCOVERY_CALLS[name] that belong to vpc."""
+    return [{'Name': DISCOVERY_CALLS[name][2], 'Values': [vpc.get(VPC_FILTER_FIELDS.get(name, 'VpcId')) or '']}]
+
+def security_group_rules(permissions):
+    """Flattens IpPermissions(Egress) into one rule per source: a CIDR, security group or prefix list."""
+    rules = []
+    for perm in permissions:
+        base = {"protocol": perm.get('IpProtocol'), "from": perm.get('FromPort', 0), "to": perm.get('ToPort', 0)}
+        sources = ([('cidr', r['CidrIp'], r) for r in perm.get('IpRanges', [])]
+                   + [('cidr', r['CidrIpv6'], r) for r in perm.get('Ipv6Ranges', [])]
+                   + [('source_security_group_id', r['GroupId'], r) for r in perm.get('UserIdGroupPairs', [])]
+                   + [('prefix_list_id', r['PrefixListId'], r) for r in perm.get('PrefixListIds', [])])
+        for field, value, source in sources:
+            rule = dict(base)
+            rule[field] = value
+            if source.get('Description'):
+                rule["description"] = source['Description']
+            rules.append(rule)
+    return rules
+
+def module_security_group(groups):
+    """The group the security module manages: a '<prefix>-sg' group, else the first non-default one, else the VPC default."""
+    ranked = sorted(groups, key=lambda g: (g.get('GroupName') == 'default', not g.get('GroupName', '').endswith('-sg'),
+                                           g.get('GroupName', '')))
+    return ranked[0] if ranked else None
+
+def nacl_entries(entries):
+    """The NACL's explicit entries (the implicit catch-all denies left out), sorted by direction and rule number."""
+    rules = []
+    for entry in entries:
+        if entry.get('RuleNumber') in DEFAULT_NACL_RULE_NUMBERS:
+            continue
+        ports = entry.get('PortRange') or {}
+        rules.append({"rule_no": entry['RuleNumber'], "protocol": entry.get('Protocol'),
+                      "from": ports.get('From', 0), "to": ports.get('To', 0),
+                      "cidr": entry.get('CidrBlock') or entry.get('Ipv6CidrBlock'),
+                      "egress": bool(entry.get('Egress')), "action": entry.get('RuleAction')})
+    rules.sort(key=lambda rule: (rule["egress"], rule["rule_no"]))
+    return rules
+
+def dhcp_options_fields(dhcp):
+    fields = {}
+    for config in dhcp.get('DhcpConfigurations', []):
+        field, is_list = DHCP_CONFIG_KEYS.get(config.get('Key'), (None, False))
+        values = [v.get('Value') for v in config.get('Values', [])]
+        if field and values:
+            fields[field] = values if is_list else values[0]
+    if fields.get("netbios_node_type", "").isdigit():
+        fields["netbios_node_type"] = int(fields["netbios_node_type"])
+    return fields
+
+def find_vpcs(client, vpc_identifier=None):
+    """Returns every VPC matching a VPC ID or Name tag, or all VPCs when no identifier is given."""
+    if vpc_identifier is None:
+        return list_all(client, 'describe_vpcs', 'Vpcs')
+    if vpc_identifier.lower().startswith('vpc-'):
+        return list_all(client, 'describe_vpcs', 'Vpcs', VpcIds=[vpc_identifier])
+    return list_all(client, 'describe_vpcs', 'Vpcs',
+        Filters=[{'Name': 'tag:Name', 'Values': [vpc_identifier]}]
+    )
+
+def discover_vpc_resources(vpc_identifier, client=None, max_workers=DEFAULT_WORKERS, profile=NO_PROFILE, failures=None):
+    """Yields import records for the VPC as each describe_* page arrives.
+
+    With max_workers > 1 the independent describe_* calls run concurrently on
+    one shared client; records still come out in the sequential order.
+    """
+    if client is None:
+        client = make_ec2_client(max_workers)
     is_vpc_id = vpc_identifier.lower().startswith('vpc-')
     
     print(f"Searching for VPC using identifier: {vpc_identifier} (Type: {'ID' if is_vpc_id else 'Name Tag'})")
     
     try:
-        if is_vpc_id:
-            response = client.describe_vpcs(VpcIds=[vpc_identifier])
-        else:
-            response = client.describe_vpcs(
-                Filters=[{'Name': 'tag:Name', 'Values': [vpc_identifier]}]
-            )
-        vpcs = response.get('Vpcs', [])
+        with profile.section("vpc lookup", api=True):
+            vpcs = find_vpcs(client, vpc_identifier)
     except Exception as e:
+        exit_on_auth_error(e)
         print(f"Error during VPC search: {e}")
-        return []
+        return
 
     if not vpcs:
         print("ERROR: VPC not found. plz check AWS region/connection.")
-        return []
+        return
+    if len(vpcs) > 1:
+        print(f"Warning: {len(vpcs)} VPCs match '{vpc_identifier}', using {vpcs[0]['VpcId']}. Use --manifest to discover all of them.")
+
+    yield from discover_vpc(vpcs[0], client, max_workers, profile=profile, failures=failures)
+
+def discover_vpc(vpc, client, max_workers=DEFAULT_WORKERS, prefetched=None, profile=NO_PROFILE, failures=None):
+    """Yields import records for one resolved VPC.
 
-    vpc = vpcs[0]
+    prefetched is this VPC's slice of a region-wide bulk fetch (see
+    partition_by_vpc); when given, no further API calls are made. Resource
+    types that can't be described are recorded in failures and skipped.
+    """
+    if failures is None:
+        failures = {}
     vpc_id = vpc['VpcId']
     vpc_name = get_tag_value(vpc.get('Tags', []), 'Name') or vpc_id
+    vpc_cidrs = vpc_cidr_blocks(vpc)
+    region = client.meta.region_name
+    environment = get_tag_value(vpc.get('Tags', []), 'Environment')
     
     print(f"-> Found VPC ID: {vpc_id} (Name: {vpc_name})")
-    
-   
-    resources_for_import.append({
-        "type": "aws_vpc",
-        "aws_id": vpc_id,
-        "terraform_address": TF_ADDRESSES["VPC"],
-        "metadata": {"Name": vpc_name, "VpcId": vpc_id}
-    })
 
-   
-    response = client.describe_internet_gateways(Filters=[{'Name': 'attachment.vpc-id', 'Values': [vpc_id]}])
-    if response['InternetGateways']:
-        igw_id = response['InternetGateways'][0]['InternetGatewayId']
-        resources_for_import.append({
-            "type": "aws_internet_gateway",
-            "aws_id": igw_id,
-            "terraform_address": TF_ADDRESSES["IGW"],
-            "metadata": {"VpcId": vpc_id}
-        })
+    if prefetched is not None:
+        fetched = {name: partial(iter, prefetched.get(name, [])) for name in DISCOVERY_CALLS}
+        yield from profile.timed(classify_vpc_resources(vpc_id, vpc_name, fetched, profile=profile, vpc_cidrs=vpc_cidrs,
+                                                        region=region, environment=environment))
+        return
+
+    if max_workers <= 1:
+        fetched = {
+            name: partial(paginate, client, op, key, Filters=vpc_filters(name, vpc))
+            for name, (op, key, _) in DISCOVERY_CALLS.items()
+        }
+        fetched = guard_fetches(fetched, failures)
+        yield from profile.timed(classify_vpc_resources(vpc_id, vpc_name, fetched, profile=profile, vpc_cidrs=vpc_cidrs,
+                                                        region=region, environment=environment))
+        return
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        fetched = {
+            name: pool.submit(list_all, client, op, key, Filters=vpc_filters(name, vpc)).result
+            for name, (op, key, _) in DISCOVERY_CALLS.items()
+        }
+        fetched = guard_fetches(fetched, failures)
+        yield from profile.timed(classify_vpc_resources(vpc_id, vpc_name, fetched, profile=profile, vpc_cidrs=vpc_cidrs,
+                                                        region=region, environment=environment))
+
+def resolve_address(catalog, kind, warned, **values):
+    """Fills in a TF_ADDRESSES template and resolves it against the address catalog.
+
+    Returns None when the configuration has no place for it, warning once
+    per reason (collected in warned).
+    """
+    relative = TF_ADDRESSES[kind]
+    for placeholder, value in values.items():
+        relative = relative.replace(f"<{placeholder.upper()}>", value)
+    if catalog is None:
+        address, reason = None, f"no Terraform configuration in {TF_DIR}"
+    else:
+        address, reason = catalog.resolve(relative)
+    if reason and reason not in warned:
+        warned.add(reason)
+        print(f"Warning: {relative} has no Terraform address ({reason}); its records won't be imported.")
+    return address
+
+def classify_vpc_resources(vpc_id, vpc_name, fetched, index=None, profile=NO_PROFILE, vpc_cidrs=(), region=None,
+                           environment=None):
+    """Turns raw describe_* items into import records.
+
+    fetched maps each DISCOVERY_CALLS name to a callable returning its items;
+    only NAT, route table and NACL handling wait on the subnets. Every record
+    is also added to index (a fresh ResourceIndex unless one is passed in),
+    which is where those subnet lookups are served from. Routes are taken
+    from the same describe_route_tables items and emitted last, once every
+    route target (IGW, NAT gateway, endpoint) is in the index. vpc_cidrs is
+    the VPC's primary CIDR followed by its secondary ones; region and
+    environment (its Environment tag) go into the VPC record. Sections are marked
+    as phases on profile. Terraform addresses come from resolve_address; records
+    it can't place keep a None address.
+    """
+    if index is None:
+        index = ResourceIndex()
+    address = partial(resolve_address, address_catalog.load_catalog(TF_DIR), warned=set())
+    fetched = {name: profile.waited(fetch) for name, fetch in fetched.items()}
+
+    profile.phase("vpc and internet gateway")
+    yield index.add(Vpc(vpc_id, address("VPC"), name=vpc_name, vpc_id=vpc_id,
+                        cidr=vpc_cidrs[0] if vpc_cidrs else None, secondary_cidrs=list(vpc_cidrs[1:]) or None,
+                        region=region, environment=environment)).to_record()
 
    
-    response = client.describe_subnets(Filters=[{'Name': 'vpc-id', 'Values': [vpc_id]}])
-    subnets = response.get('Subnets', [])
-    
-   
-    subnet_map = {} 
-    
-    for subnet in subnets:
-        subnet_id = subnet['SubnetId']
-        cidr = subnet['CidrBlock']
+    igw = next(iter(fetched["igw"]()), None)
+    if igw:
+        yield index.add(InternetGateway(igw['InternetGatewayId'], address("IGW"), igw.get('Tags'),
+                                        vpc_id=vpc_id)).to_record()
+
+    profile.phase("subnet classification")
+    for subnet in fetched["subnets"]():
+        tags = parse_tags(subnet.get('Tags'))
         az = subnet['AvailabilityZone']
-        subnet_name = get_tag_value(subnet.get('Tags', []), 'Name') or f"{vpc_name}-subnet-{az}"
+        subnet_name = tags.get('Name') or f"{vpc_name}-subnet-{az}"
         
    
         subnet_type = "public"
@@ -98,58 +386,40 @@ def discover_vpc_resources(vpc_identifier):
         
         az_key = az[-1:]
         
-        tf_address = TF_ADDRESSES["SUBNET"].replace("<TYPE>", subnet_type).replace("<AZ_KEY>", az_key)
+        tf_address = address("SUBNET", type=subnet_type, az_key=az_key)
         
-        resources_for_import.append({
-            "type": "aws_subnet",
-            "aws_id": subnet_id,
-            "terraform_address": tf_address, 
-            "metadata": {
-                "Name": subnet_name,
-                "AvailabilityZone": az,
-                "Type": subnet_type,
-                "CidrBlock": cidr
-            }
-        })
-        
-        subnet_map[subnet_id] = {'az_key': az_key, 'type': subnet_type}
+        yield index.add(Subnet(subnet['SubnetId'], tf_address, tags, name=subnet_name, az=az,
+                               subnet_type=subnet_type, cidr=subnet['CidrBlock'])).to_record()
 
-    response = client.describe_nat_gateways(Filters=[{'Name': 'vpc-id', 'Values': [vpc_id]}])
-    for nat in response.get('NatGateways', []):
+    profile.phase("nat gateway mapping")
+    for nat in fetched["nat_gateways"]():
         nat_id = nat['NatGatewayId']
         subnet_id = nat['SubnetId']
-        az_key = subnet_map.get(subnet_id, {}).get('az_key', 'unknown')
+        subnet = index.get(subnet_id, Subnet.TYPE)
+        az_key = subnet.az_key if subnet else 'unknown'
         
-        tf_address_nat = TF_ADDRESSES["NAT_GATEWAY"].replace("<AZ_KEY>", az_key)
-        resources_for_import.append({
-            "type": "aws_nat_gateway",
-            "aws_id": nat_id,
-            "terraform_address": tf_address_nat,
-            "metadata": {"VpcId": vpc_id, "SubnetId": subnet_id, "AzKey": az_key}
-        })
+        # the gateways module puts public NATs in public subnets and private (connectivity) NATs in nonroutable ones
+        nat_type = nat.get('ConnectivityType') or ("public" if subnet and subnet.subnet_type == "public" else "private")
+        tf_address_nat = address("NAT_GATEWAY", nat_type=nat_type, az_key=az_key)
+        yield index.add(NatGateway(nat_id, tf_address_nat, nat.get('Tags'),
+                                   vpc_id=vpc_id, subnet_id=subnet_id, az_key=az_key)).to_record()
         
       #EIP
         if nat.get('NatGatewayAddresses'):
             nat_address = nat['NatGatewayAddresses'][0]
             if nat_address.get('AllocationId'):
-                eip_alloc_id = nat_address['AllocationId']
-
-                tf_address_eip = TF_ADDRESSES["EIP"].replace("<AZ_KEY>", az_key)
-                resources_for_import.append({
-                    "type": "aws_eip",
-                    "aws_id": eip_alloc_id,
-                    "terraform_address": tf_address_eip,
-                    "metadata": {"AzKey": az_key}
-                })
+                tf_address_eip = address("EIP", az_key=az_key)
+                yield index.add(Eip(nat_address['AllocationId'], tf_address_eip, az_key=az_key)).to_record()
             else:
                 print(f"Warning: NAT Gateway {nat_id} found 'AllocationId' missing(State: {nat.get('State', 'unknown')}). Skipping")
 
     # ROUTE TABLES, ROUTES, and ASSOCIATIONS 
-
-    response = client.describe_route_tables(Filters=[{'Name': 'vpc-id', 'Values': [vpc_id]}])
-    for rt in response.get('RouteTables', []):
+    profile.phase("route-table mapping")
+    pending_routes = []
+    for rt in fetched["route_tables"]():
         rt_id = rt['RouteTableId']
-        rt_name = get_tag_value(rt.get('Tags', []), 'Name') or rt_id
+        tags = parse_tags(rt.get('Tags'))
+        rt_name = tags.get('Name') or rt_id
         
         associations = rt.get('Associations', [])
         rt_type = "main"
@@ -161,106 +431,541 @@ def discover_vpc_resources(vpc_identifier):
                 subnet_id_for_type = assoc['SubnetId']
                 break
         
-        if subnet_id_for_type and subnet_id_for_type in subnet_map:
-            rt_type = subnet_map[subnet_id_for_type]['type']
-            rt_az_key = subnet_map[subnet_id_for_type]['az_key']
-        tf_address_rt = TF_ADDRESSES["ROUTE_TABLE"].replace("<TYPE>", rt_type).replace("<AZ_KEY>", rt_az_key)
+        subnet = index.get(subnet_id_for_type, Subnet.TYPE) if subnet_id_for_type else None
+        if subnet:
+            rt_type = subnet.subnet_type
+            rt_az_key = subnet.az_key
+        az_suffix = f"_{rt_az_key}" if rt_type in PER_AZ_ROUTE_TABLES else ""
+        tf_address_rt = address("ROUTE_TABLE", type=rt_type, az_suffix=az_suffix)
             
-        resources_for_import.append({
-            "type": "aws_route_table",
-            "aws_id": rt_id,
-            "terraform_address": tf_address_rt,
-            "metadata": {"Name": rt_name, "VpcId": vpc_id, "RtType": rt_type, "RtAzKey": rt_az_key}
-        })
+        yield index.add(RouteTable(rt_id, tf_address_rt, tags, name=rt_name, vpc_id=vpc_id,
+                                   rt_type=rt_type, az_key=rt_az_key)).to_record()
+
+        # ROUTES, resolved once all targets are known
+        for route in rt.get('Routes', []):
+            destination = route_destination(route)
+            if destination and is_managed_route(route):
+                pending_routes.append((rt_id, rt_type, rt_az_key, destination) + route_target(route))
         
         #  ROUTE TABLE ASSOCIATIONS
         for assoc in associations:
-            subnet_id = assoc.get('SubnetId')
-            if subnet_id and subnet_id in subnet_map:
-                az_key = subnet_map[subnet_id]['az_key']
-                subnet_type = subnet_map[subnet_id]['type']
-                tf_address_assoc = TF_ADDRESSES["RT_ASSOC"].replace("<TYPE>", subnet_type).replace("<AZ_KEY>", az_key)
+            subnet = index.get(assoc.get('SubnetId'), Subnet.TYPE)
+            if subnet:
+                tf_address_assoc = address("RT_ASSOC", type=subnet.subnet_type, az_key=subnet.az_key)
 
-                resources_for_import.append({
-                    "type": "aws_route_table_association",
-                    "aws_id": assoc['RouteTableAssociationId'],
-                    "terraform_address": tf_address_assoc,
-                    "metadata": {"SubnetId": subnet_id, "RouteTableId": rt_id, "SubnetType": subnet_type}
-                })
+                yield index.add(RouteTableAssociation(
+                    assoc['RouteTableAssociationId'], tf_address_assoc,
+                    subnet_id=subnet.aws_id, route_table_id=rt_id, subnet_type=subnet.subnet_type,
+                )).to_record()
 
 
     # NETWORK ACLS
-    response = client.describe_network_acls(Filters=[{'Name': 'vpc-id', 'Values': [vpc_id]}])
-    if response.get('NetworkAcls'):
-        nacl_id = response['NetworkAcls'][0]['NetworkAclId']
-        
-        resources_for_import.append({
-            "type": "aws_network_acl",
-            "aws_id": nacl_id,
-            "terraform_address": TF_ADDRESSES["NACL"],
-            "metadata": {"VpcId": vpc_id}
-        })
+    profile.phase("nacl association")
+    for nacl in fetched["nacls"]():
+        nacl_id = nacl['NetworkAclId']
+        associated = [(assoc, index.get(assoc.get('SubnetId'), Subnet.TYPE)) for assoc in nacl.get('Associations', [])]
+        associated = [(assoc, subnet) for assoc, subnet in associated if subnet]
+        if not associated:
+            continue
+
+        # public when it serves any public subnet, else private or nonroutable
+        subnet_types = {subnet.subnet_type for _, subnet in associated}
+        nacl_type = next((t for t in ("public", "private") if t in subnet_types), "nonroutable")
+        tf_address_nacl = address("NACL", nacl_type=NACL_TYPES[nacl_type])
+        yield index.add(NetworkAcl(nacl_id, tf_address_nacl, nacl.get('Tags'), vpc_id=vpc_id, nacl_type=nacl_type,
+                                   entries=nacl_entries(nacl.get('Entries', [])))).to_record()
         
         # Network ACL Associations
-        for nacl in response.get('NetworkAcls', []):
-            for assoc in nacl.get('Associations', []):
-                subnet_id = assoc.get('SubnetId')
-                if subnet_id and subnet_id in subnet_map:
-                    az_key = subnet_map[subnet_id]['az_key']
-                    subnet_type = subnet_map[subnet_id]['type']
-                    tf_address_nacl_assoc = TF_ADDRESSES["NACL_ASSOC"].replace("<RT_TYPE>", subnet_type).replace("<AZ_KEY>", az_key)
-
-                    resources_for_import.append({
-                        "type": "aws_network_acl_association",
-                        "aws_id": assoc['NetworkAclAssociationId'],
-                        "terraform_address": tf_address_nacl_assoc,
-                        "metadata": {"SubnetId": subnet_id, "NaclId": nacl_id, "SubnetType": subnet_type}
-                    })
+        for assoc, subnet in associated:
+            tf_address_nacl_assoc = address("NACL_ASSOC", rt_type=subnet.subnet_type, az_key=subnet.az_key)
+
+            yield index.add(NetworkAclAssociation(
+                assoc['NetworkAclAssociationId'], tf_address_nacl_assoc,
+                subnet_id=subnet.aws_id, nacl_id=nacl_id, subnet_type=subnet.subnet_type,
+            )).to_record()
 
     # VPC Endpoint
-    response = client.describe_vpc_endpoints(Filters=[{'Name': 'vpc-id', 'Values': [vpc_id]}])
-    for ep in response.get('VpcEndpoints', []):
-        ep_id = ep['VpcEndpointId']
+    profile.phase("vpc endpoints")
+    for ep in fetched["vpc_endpoints"]():
         service_name = ep['ServiceName'].split('.')[-1].replace('-', '_')
         
         
-        tf_address_ep = TF_ADDRESSES["VPC_ENDPOINT"].replace("<SERVICE_NAME>", service_name)
-        
-        resources_for_import.append({
-            "type": "aws_vpc_endpoint",
-            "aws_id": ep_id,
-            "terraform_address": tf_address_ep,
-            "metadata": {"ServiceName": ep['ServiceName'], "VpcId": vpc_id}
-        })
+        tf_address_ep = address("VPC_ENDPOINT", endpoint_type=ep.get('VpcEndpointType', 'Interface').lower(),
+                                service_name=service_name)
         
-    return resources_for_import
+        yield index.add(VpcEndpoint(ep['VpcEndpointId'], tf_address_ep, ep.get('Tags'),
+                                    service_name=ep['ServiceName'], vpc_id=vpc_id)).to_record()
+
+    # SECURITY GROUP and DHCP OPTIONS
+    profile.phase("security group and dhcp options")
+    group = module_security_group(list(fetched["security_groups"]()))
+    if group:
+        yield index.add(SecurityGroup(
+            group['GroupId'], address("SECURITY_GROUP"), group.get('Tags'), name=group.get('GroupName'), vpc_id=vpc_id,
+            ingress=security_group_rules(group.get('IpPermissions', [])),
+            egress=security_group_rules(group.get('IpPermissionsEgress', [])),
+        )).to_record()
+
+    dhcp = next(iter(fetched["dhcp_options"]()), None)
+    if dhcp:
+        yield index.add(DhcpOptions(dhcp['DhcpOptionsId'], address("DHCP_OPTIONS"), dhcp.get('Tags'),
+                                    **dhcp_options_fields(dhcp))).to_record()
+
+    # ROUTES
+    profile.phase("route target resolution")
+    unmanaged_routes = 0
+    for rt_id, rt_type, rt_az_key, destination, target_type, target_id in pending_routes:
+        if rt_type == "public" and target_type == "igw":
+            tf_address_route = address("PUBLIC_ROUTE", cidr=destination)
+        elif rt_type in PER_AZ_ROUTE_TABLES and target_type == "nat" and destination == NAT_ROUTE_DESTINATION:
+            tf_address_route = address("NAT_ROUTE", rt_type=rt_type, az_key=rt_az_key)
+        else:
+            tf_address_route = None
+            unmanaged_routes += 1
+        target = index.get(target_id) if target_id else None
+
+        # terraform import id for aws_route: <route table id>_<destination>
+        yield index.add(Route(
+            f"{rt_id}_{destination}", tf_address_route,
+            route_table_id=rt_id, destination=destination, target_type=target_type, target_id=target_id,
+            target_address=target.terraform_address if target else None, rt_type=rt_type, az_key=rt_az_key,
+        )).to_record()
+    if unmanaged_routes:
+        print(f"Warning: {unmanaged_routes} route(s) aren't defined by the route-tables module (only IGW routes in the public "
+              f"table and {NAT_ROUTE_DESTINATION} to the NAT gateway in each private/nonroutable one); they get no Terraform address.")
+
+def connect(max_workers=DEFAULT_WORKERS, region=None, profile=NO_PROFILE):
+    """The discovery client. Credentials are not checked up front: the first describe_* call
+    validates them (see exit_on_auth_error), which saves a round trip per run."""
+    return profile.instrument(make_ec2_client(max_workers, region))
+
+def discover_vpc_cached(vpc_identifier, cache_dir=discovery_cache.CACHE_DIR, ttl=discovery_cache.DEFAULT_TTL,
+                        refresh=(), region=None, max_workers=DEFAULT_WORKERS, client_factory=connect,
+                        profile=NO_PROFILE, failures=None):
+    """Returns import records for the VPC from the snapshot cache.
+
+    Only snapshot entries that are missing, older than ttl or named in refresh
+    are described again; a fully fresh snapshot makes no AWS calls at all.
+    An entry that fails to refresh is recorded in failures and keeps its
+    cached items and age, so the next run tries it again.
+    """
+    if failures is None:
+        failures = {}
+    names = ["vpc"] + list(DISCOVERY_CALLS)
+    snapshot = discovery_cache.find_snapshot(cache_dir, vpc_identifier, region)
+    stale = discovery_cache.stale_entries(snapshot, names, ttl, refresh) if snapshot else names
+
+    if not stale:
+        print(f"-> Using cached snapshot for {snapshot['vpc_id']} (Name: {snapshot['vpc_name']}, Region: {snapshot['region']})")
+        if snapshot.get("catalog") != catalog_digest():
+            print("-> Terraform configuration changed since the snapshot; re-deriving its addresses")
+            return rebuild_snapshot(cache_dir, snapshot, profile)
+        return snapshot["records"]
+
+    client = client_factory(max_workers, region)
+
+    if snapshot is None or "vpc" in stale:
+        print(f"Searching for VPC using identifier: {vpc_identifier}")
+        try:
+            with profile.section("vpc lookup", api=True):
+                vpcs = find_vpcs(client, snapshot["vpc_id"] if snapshot else vpc_identifier)
+        except Exception as e:
+            exit_on_auth_error(e)
+            print(f"Error during VPC search: {e}")
+            return []
+        if not vpcs:
+            print("ERROR: VPC not found. plz check AWS region/connection.")
+            return []
+        if len(vpcs) > 1:
+            print(f"Warning: {len(vpcs)} VPCs match '{vpc_identifier}', using {vpcs[0]['VpcId']}. Use --manifest to discover all of them.")
+        vpc = vpcs[0]
+        if snapshot is None or snapshot["vpc_id"] != vpc['VpcId']:
+            vpc_name = get_tag_value(vpc.get('Tags', []), 'Name') or vpc['VpcId']
+            snapshot = discovery_cache.new_snapshot(vpc.get('OwnerId'), client.meta.region_name, vpc['VpcId'], vpc_name)
+            stale = names
+        discovery_cache.set_entry(snapshot, "vpc", [vpc])
+
+    vpc_id = snapshot["vpc_id"]
+    vpc = discovery_cache.entry_items(snapshot, "vpc")[0]
+    to_fetch = [name for name in stale if name != "vpc"]
+    print(f"-> Refreshing {', '.join(to_fetch) or 'nothing'} for {vpc_id}")
+
+    with profile.section("describe stale entries", api=True), ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        futures = {}
+        for name in to_fetch:
+            op, key, _ = DISCOVERY_CALLS[name]
+            futures[name] = pool.submit(list_all, client, op, key, Filters=vpc_filters(name, vpc))
+        for name, future in futures.items():
+            try:
+                discovery_cache.set_entry(snapshot, name, future.result())
+            except Exception as e:
+                exit_on_auth_error(e)
+                failures[name] = describe_error(e)
+                print(f"Warning: could not describe {name} ({failures[name]}); keeping the cached entry.")
+
+    return rebuild_snapshot(cache_dir, snapshot, profile)
+
+def catalog_digest():
+    """Identifies the address catalog a snapshot's records were derived with."""
+    catalog = address_catalog.load_catalog(TF_DIR)
+    return catalog.digest if catalog else None
+
+def rebuild_snapshot(cache_dir, snapshot, profile=NO_PROFILE):
+    """Re-derives the snapshot's import records from its cached entries and saves it."""
+    vpc_id = snapshot["vpc_id"]
+    vpc = discovery_cache.entry_items(snapshot, "vpc")[0]
+    snapshot["vpc_name"] = get_tag_value(vpc.get('Tags', []), 'Name') or vpc_id
+    fetched = {name: partial(iter, discovery_cache.entry_items(snapshot, name)) for name in DISCOVERY_CALLS}
+    snapshot["records"] = list(profile.timed(classify_vpc_resources(
+        vpc_id, snapshot["vpc_name"], fetched, profile=profile, vpc_cidrs=vpc_cidr_blocks(vpc), region=snapshot["region"],
+        environment=get_tag_value(vpc.get('Tags', []), 'Environment'))))
+    snapshot["catalog"] = catalog_digest()
+    path = discovery_cache.save_snapshot(cache_dir, snapshot)
+    print(f"-> Snapshot saved to {path}")
+    return snapshot["records"]
+
+def snapshot_id_index(snapshot):
+    """Maps every id in the snapshot, association ids included, to (entry name, id to re-describe)."""
+    index = {}
+    for name, (id_field, _) in ID_FIELDS.items():
+        for item in discovery_cache.entry_items(snapshot, name):
+            index[item[id_field]] = (name, item[id_field])
+            for assoc in item.get('Associations', []):
+                assoc_id = assoc.get('RouteTableAssociationId') or assoc.get('NetworkAclAssociationId')
+                if assoc_id:
+                    index[assoc_id] = (name, item[id_field])
+    return index
+
+def belongs_to_vpc(name, item, vpc_id):
+    if name == "dhcp_options":
+        # only ever described by the id the snapshot's VPC points at
+        return True
+    if name == "igw":
+        return any(a.get('VpcId') == vpc_id for a in item.get('Attachments', []))
+    return item.get('VpcId') == vpc_id
+
+def merge_items(name, items, changed_ids, described, vpc_id):
+    """Replaces changed items in place, drops the ones gone from the VPC and appends new ones."""
+    id_field = ID_FIELDS[name][0]
+    fresh = {item[id_field]: item for item in described if belongs_to_vpc(name, item, vpc_id)}
+    merged = []
+    for item in items:
+        item_id = item[id_field]
+        if item_id not in changed_ids:
+            merged.append(item)
+        elif item_id in fresh:
+            merged.append(fresh.pop(item_id))
+    merged.extend(fresh.values())
+    return merged
+
+def discover_vpc_incremental(vpc_identifier, cloudtrail_path, cache_dir=discovery_cache.CACHE_DIR, region=None,
+                             max_workers=DEFAULT_WORKERS, client_factory=connect, profile=NO_PROFILE,
+                             failures=None):
+    """Refreshes a cached snapshot from CloudTrail logs instead of rediscovering the whole VPC.
+
+    Only ids touched by EC2 network mutations newer than the snapshot are
+    described again (by id filter); everything else is kept from the cache.
+    A new DHCP options association re-describes the VPC and replaces its
+    DHCP options entry with the set the VPC now points at.
+    Returns the merged records, or None when there is no snapshot to start from.
+    If a type fails to describe it is recorded in failures, and the CloudTrail
+    horizon is not advanced so its changes are picked up next time.
+    """
+    if failures is None:
+        failures = {}
+    snapshot = discovery_cache.find_snapshot(cache_dir, vpc_identifier, region)
+    if snapshot is None:
+        print(f"ERROR: no cached snapshot for '{vpc_identifier}'. Run a full discovery with --cache first.")
+        return None
+
+    vpc_id = snapshot["vpc_id"]
+    trail_until = snapshot.get("cloudtrail_until", 0)
+    since_by_type = {name: max(entry["fetched_at"], trail_until) for name, entry in snapshot["entries"].items()}
+    with profile.section("cloudtrail scan"):
+        changes, horizon, matched = cloudtrail_changes.find_changes(
+            cloudtrail_path, vpc_id, snapshot["region"], snapshot_id_index(snapshot), since_by_type)
+
+    print(f"-> {matched} CloudTrail event(s) touch {vpc_id}: "
+          + (", ".join(f"{name} x{len(ids)}" for name, ids in sorted(changes.items())) or "no changes"))
+
+    if changes:
+        client = client_factory(max_workers, snapshot["region"])
+        if "vpc" in changes:
+            # the VPC points at another DHCP options set: take the set it now names whole rather than merging by id
+            try:
+                with profile.section("describe changed vpc", api=True):
+                    vpcs = find_vpcs(client, vpc_id)
+                    op, key, _ = DISCOVERY_CALLS["dhcp_options"]
+                    dhcp = list_all(client, op, key, Filters=vpc_filters("dhcp_options", vpcs[0])) if vpcs else []
+            except Exception as e:
+                exit_on_auth_error(e)
+                failures["vpc"] = describe_error(e)
+                print(f"Warning: could not describe changed vpc ({failures['vpc']}); keeping the cached VPC and DHCP options.")
+            else:
+                if vpcs:
+                    discovery_cache.set_entry(snapshot, "vpc", vpcs)
+                    discovery_cache.set_entry(snapshot, "dhcp_options", dhcp)
+                else:
+                    failures["vpc"] = "VPC not found"
+                    print(f"Warning: {vpc_id} no longer exists; keeping the cached VPC and DHCP options.")
+        by_id = {name: ids for name, ids in changes.items() if name != "vpc" and not (name == "dhcp_options" and "vpc" in changes)}
+        with profile.section("describe changed ids", api=True), ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+            futures = {}
+            for name, ids in by_id.items():
+                op, key, _ = DISCOVERY_CALLS[name]
+                id_filter = ID_FIELDS[name][1]
+                ids = sorted(ids)
+                futures[name] = [
+                    pool.submit(list_all, client, op, key, Filters=[{'Name': id_filter, 'Values': ids[i:i + 200]}])
+                    for i in range(0, len(ids), 200)
+                ]
+            for name, chunks in futures.items():
+                try:
+                    described = [item for future in chunks for item in future.result()]
+                except Exception as e:
+                    exit_on_auth_error(e)
+                    failures[name] = describe_error(e)
+                    print(f"Warning: could not describe changed {name} ({failures[name]}); keeping the cached items.")
+                    continue
+                items = merge_items(name, discovery_cache.entry_items(snapshot, name), changes[name], described, vpc_id)
+                snapshot["entries"][name]["items"] = items
+
+    if horizon is not None and not failures:
+        snapshot["cloudtrail_until"] = max(trail_until, horizon)
+    if changes:
+        return rebuild_snapshot(cache_dir, snapshot, profile)
+    discovery_cache.save_snapshot(cache_dir, snapshot)
+    return snapshot["records"]
+
+def load_manifest(path):
+    """Reads a JSON list of {"region": ..., "vpc": ...} entries; an entry without "vpc" means every VPC in that region."""
+    with open(path) as f:
+        entries = json.load(f)
+    return [(entry['region'], entry.get('vpc')) for entry in entries]
+
+def match_vpcs(vpcs, vpc_identifier=None):
+    """In-memory counterpart of find_vpcs over an already listed set of VPCs."""
+    if vpc_identifier is None:
+        return list(vpcs)
+    if vpc_identifier.lower().startswith('vpc-'):
+        return [vpc for vpc in vpcs if vpc['VpcId'] == vpc_identifier]
+    return [vpc for vpc in vpcs if get_tag_value(vpc.get('Tags', []), 'Name') == vpc_identifier]
+
+def fetch_region_resources(client, max_workers=DEFAULT_WORKERS):
+    """Lists every DISCOVERY_CALLS resource type once for the whole region, without a vpc-id filter."""
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        futures = {name: pool.submit(list_all, client, op, key) for name, (op, key, _) in DISCOVERY_CALLS.items()}
+        return {name: future.result() for name, future in futures.items()}
+
+def partition_by_vpc(fetched, vpcs=()):
+    """Splits region-wide describe_* results into {vpc_id: {call name: [items]}}.
+
+    Items are placed by their VpcId; IGWs go by attachment, DHCP options go to
+    every VPC in vpcs using them, and anything that only names a subnet or
+    route table is placed through those indexes.
+    """
+    subnet_vpc = {subnet['SubnetId']: subnet['VpcId'] for subnet in fetched.get("subnets", [])}
+    rt_vpc = {rt['RouteTableId']: rt['VpcId'] for rt in fetched.get("route_tables", [])}
+    dhcp_vpcs = {}
+    for vpc in vpcs:
+        dhcp_vpcs.setdefault(vpc.get('DhcpOptionsId'), []).append(vpc['VpcId'])
+    partitions = {}
+
+    for name, items in fetched.items():
+        for item in items:
+            if name == "igw":
+                vpc_ids = [a['VpcId'] for a in item.get('Attachments', []) if a.get('VpcId')]
+            elif name == "dhcp_options":
+                vpc_ids = dhcp_vpcs.get(item['DhcpOptionsId'], [])
+            elif item.get('VpcId'):
+                vpc_ids = [item['VpcId']]
+            elif item.get('SubnetId') in subnet_vpc:
+                vpc_ids = [subnet_vpc[item['SubnetId']]]
+            else:
+                vpc_ids = sorted({rt_vpc[rt_id] for rt_id in item.get('RouteTableIds', []) if rt_id in rt_vpc})
+            for vpc_id in vpc_ids:
+                partitions.setdefault(vpc_id, {}).setdefault(name, []).append(item)
+
+    return partitions
+
+def discover_region(region, identifiers, output_dir, max_workers=DEFAULT_WORKERS, bulk=True, fmt="ndjson"):
+    """Discovers every requested VPC of one region with a single regional client.
+
+    With bulk, a region holding more than one requested VPC is fetched once per
+    resource type and partitioned in memory instead of once per VPC and type.
+    """
+    client = make_ec2_client(max_workers, region)
+    results = []
+    targets = []
+    seen = set()
+
+    all_vpcs = None
+    if bulk and (len(identifiers) > 1 or None in identifiers):
+        try:
+            all_vpcs = find_vpcs(client)
+        except Exception as e:
+            return [{"region": region, "vpc_id": "*", "name": "", "records": 0, "seconds": 0.0, "error": str(e)}]
+
+    for identifier in identifiers:
+        try:
+            vpcs = match_vpcs(all_vpcs, identifier) if all_vpcs is not None else find_vpcs(client, identifier)
+        except Exception as e:
+            results.append({"region": region, "vpc_id": identifier or "*", "name": "", "records": 0, "seconds": 0.0, "error": str(e)})
+            continue
+        if not vpcs:
+            results.append({"region": region, "vpc_id": identifier or "*", "name": "", "records": 0, "seconds": 0.0, "error": "VPC not found"})
+        for vpc in vpcs:
+            if vpc['VpcId'] not in seen:
+                seen.add(vpc['VpcId'])
+                targets.append(vpc)
+
+    partitions = None
+    if bulk and len(targets) > 1:
+        start = time.perf_counter()
+        try:
+            partitions = partition_by_vpc(fetch_region_resources(client, max_workers), targets)
+        except Exception as e:
+            print(f"Warning: bulk fetch in {region} failed ({e}), falling back to per-VPC discovery.")
+        else:
+            print(f"-> {region}: bulk fetch of {len(DISCOVERY_CALLS)} resource types took {time.perf_counter() - start:.2f}s")
+
+    for vpc in targets:
+        vpc_id = vpc['VpcId']
+        prefetched = partitions.get(vpc_id, {}) if partitions is not None else None
+
+        out_dir = os.path.join(output_dir, region, vpc_id)
+        os.makedirs(out_dir, exist_ok=True)
+        path = os.path.join(out_dir, record_stream.records_file_for(fmt))
+        result = {"region": region, "vpc_id": vpc_id, "name": get_tag_value(vpc.get('Tags', []), 'Name') or vpc_id,
+                  "records": 0, "seconds": 0.0, "file": path, "error": None}
+
+        start = time.perf_counter()
+        failures = {}
+        try:
+            result["records"] = write_records(discover_vpc(vpc, client, max_workers, prefetched, failures=failures), path)
+            if failures:
+                result["error"] = f"partial, could not describe {', '.join(sorted(failures))}"
+        except Exception as e:
+            result["error"] = str(e)
+        result["seconds"] = time.perf_counter() - start
+        results.append(result)
+
+    return results
+
+def run_batch(entries, output_dir, max_workers=DEFAULT_WORKERS, region_workers=4, bulk=True, fmt="ndjson"):
+    """Fans (region, identifier) entries out across regions; returns one result per VPC."""
+    by_region = {}
+    for region, identifier in entries:
+        by_region.setdefault(region, []).append(identifier)
+
+    with ThreadPoolExecutor(max_workers=max(1, min(region_workers, len(by_region)))) as pool:
+        futures = [pool.submit(discover_region, region, identifiers, output_dir, max_workers, bulk, fmt)
+                   for region, identifiers in by_region.items()]
+        return [result for future in futures for result in future.result()]
+
+def print_batch_summary(results):
+    print("\n--- BATCH DISCOVERY SUMMARY ---")
+    print(f"{'REGION':<16}{'VPC':<24}{'NAME':<32}{'RECORDS':>8}{'SECONDS':>10}  STATUS")
+    for r in results:
+        status = f"ERROR: {r['error']}" if r['error'] else r['file']
+        print(f"{r['region']:<16}{r['vpc_id']:<24}{r['name'][:31]:<32}{r['records']:>8}{r['seconds']:>10.2f}  {status}")
+    failed = sum(1 for r in results if r['error'])
+    print(f"{len(results) - failed} VPC(s) discovered, {failed} failed.")
 
 if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("Usage: python vpc_discoverer.py <VPC_ID_OR_NAME_TAG>")
-        print("Example (Using ID): python vpc_discoverer.py vpc-054415081e04329ba")
-        print("Example (Using Name Tag): python vpc_discoverer.py dev-us-east-1-vpc1")
-        sys.exit(1)
-        
-    vpc_identifier = sys.argv[1]
+    parser = argparse.ArgumentParser(
+        description=f"Discover an existing VPC and write {record_stream.RECORDS_FILE}",
+        epilog="Examples: python discover-aws.py vpc-054415081e04329ba | python discover-aws.py dev-us-east-1-vpc1",
+    )
+    parser.add_argument("vpc_identifier", metavar="VPC_ID_OR_NAME_TAG", nargs="?")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help="concurrent describe_* calls per VPC (1 = sequential)")
+    parser.add_argument("--manifest", help="batch mode: JSON list of {\"region\": ..., \"vpc\": ...} entries")
+    parser.add_argument("--regions", nargs="+", metavar="REGION", help="batch mode: discover all VPCs in these regions")
+    parser.add_argument("--output-dir", default="discovery",
+                        help="batch mode: results go to <output-dir>/<region>/<vpc-id>/")
+    parser.add_argument("--region-workers", type=int, default=4, help="batch mode: regions discovered in parallel")
+    parser.add_argument("--no-bulk", action="store_true",
+                        help="batch mode: describe per VPC instead of once per region and resource type")
+    parser.add_argument("--format", choices=["ndjson", "json"], default="ndjson",
+                        help=f"ndjson streams {record_stream.RECORDS_FILE}; json writes the legacy pretty {record_stream.LEGACY_FILE}")
+    parser.add_argument("--region", help="AWS region (defaults to the AWS config/environment)")
+    parser.add_argument("--cache", action="store_true",
+                        help="serve unchanged resource types from the local snapshot cache")
+    parser.add_argument("--cache-dir", default=discovery_cache.CACHE_DIR)
+    parser.add_argument("--ttl", type=int, default=discovery_cache.DEFAULT_TTL,
+                        help="seconds before a cached resource type is described again")
+    parser.add_argument("--refresh", nargs="+", default=[], choices=["all", "vpc"] + list(DISCOVERY_CALLS),
+                        help="force these cached resource types to be described again (implies --cache)")
+    parser.add_argument("--cloudtrail", metavar="PATH",
+                        help="incremental mode: re-describe only what these CloudTrail logs changed since the cached snapshot")
+    parser.add_argument("--offline", action="store_true",
+                        help="write the cached records without contacting AWS, regardless of --ttl")
+    parser.add_argument("--api-rate", type=float, default=rate_limiter.DEFAULT_RATE,
+                        help="describe_* requests per second per region, shared by all threads; halves on throttling")
+    parser.add_argument("--api-burst", type=int, default=rate_limiter.DEFAULT_BURST)
+    parser.add_argument("--max-attempts", type=int, default=rate_limiter.DEFAULT_MAX_ATTEMPTS,
+                        help="attempts per request on throttling/transient errors, with jittered backoff")
+    parser.add_argument("--profile", action="store_true",
+                        help="print per-call API latency/pages/bytes/retries/throttling and time per discovery phase")
+    parser.add_argument("--profile-out", metavar="PATH",
+                        help="also export the profile: Prometheus textfile if PATH ends in .prom, else JSON (implies --profile)")
+    args = parser.parse_args()
+    rate_limiter.configure(args.api_rate, args.api_burst, args.max_attempts)
+
+    if args.manifest or args.regions:
+        entries = load_manifest(args.manifest) if args.manifest else []
+        entries += [(region, None) for region in args.regions or []]
+        results = run_batch(entries, args.output_dir, args.workers, args.region_workers, not args.no_bulk, args.format)
+        print_batch_summary(results)
+        sys.exit(1 if not results or any(r['error'] for r in results) else 0)
+
+    if not args.vpc_identifier:
+        parser.error("a VPC_ID_OR_NAME_TAG, --manifest or --regions is required")
         
-    try:
-        boto3.client('ec2').describe_regions()
-    except Exception as e:
-        print("--- AWS AUTHENTICATION ERROR ---")
-        print(f"Details: {e}")
-        sys.exit(1)
+    vpc_identifier = args.vpc_identifier
+    profile = api_metrics.DiscoveryProfile() if args.profile or args.profile_out else NO_PROFILE
+    client_factory = partial(connect, profile=profile)
+    failures = {}
 
+    if args.offline:
+        records = discovery_cache.load_records(args.cache_dir, vpc_identifier, args.region)
+        if records is None:
+            print(f"ERROR: no cached snapshot for '{vpc_identifier}' in {args.cache_dir}.")
+            sys.exit(1)
+    elif args.cloudtrail:
+        records = discover_vpc_incremental(vpc_identifier, args.cloudtrail, args.cache_dir, args.region, args.workers,
+                                           client_factory, profile, failures)
+        if records is None:
+            sys.exit(1)
+    elif args.cache or args.refresh:
+        records = discover_vpc_cached(vpc_identifier, args.cache_dir, args.ttl, args.refresh, args.region, args.workers,
+                                      client_factory, profile, failures)
+    else:
+        client = client_factory(args.workers, args.region)
+        records = discover_vpc_resources(vpc_identifier, client, args.workers, profile, failures)
 
-    discovered_resources = discover_vpc_resources(vpc_identifier)
+    output_file = record_stream.records_file_for(args.format)
+    discovered_count = write_records(records, output_file)
     
-    if discovered_resources:
-        with open("resources_for_import.json", "w") as f:
-            json.dump(discovered_resources, f, indent=4)
-        
+    if discovered_count:
         print("\n--- DISCOVERY COMPLETE ---")
-        print(f"Successfully discovered {len(discovered_resources)} resources.")
-        print("The file 'resources_for_import.json' has been updated.")
+        print(f"Successfully discovered {discovered_count} resources.")
+        print(f"The file '{output_file}' has been updated.")
     else:
         print("\n--- DISCOVERY FAILED ---")
-        print("No resources were discovered.check the VPC ID/Name and AWS connectivity.")
\ No newline at end of file
+        print("No resources were discovered.check the VPC ID/Name and AWS connectivity.")
+    if failures:
+        print("\n--- PARTIAL DISCOVERY ---")
+        for name, error in sorted(failures.items()):
+            print(f"Could not describe {name}: {error}")
+        print("Records of these types are missing or incomplete; rerun once the errors clear.")
+
+    if args.profile or args.profile_out:
+        profile.finish()
+        profile.print_summary()
+        if args.profile_out:
+            print(f"Profile written to {profile.export(args.profile_out)}")
+
+    if failures:
+        sys.exit(1)
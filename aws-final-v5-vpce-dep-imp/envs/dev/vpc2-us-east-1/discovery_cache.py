@@ -0,0 +1,81 @@
+import glob
+import json
+import os
+import time
+
+CACHE_DIR = ".discovery-cache"
+DEFAULT_TTL = 3600
+
+# Snapshot layout, one file per <account>/<region>/<vpc_id>.json:
+# {
+#   "account": ..., "region": ..., "vpc_id": ..., "vpc_name": ...,
+#   "entries": {"vpc": {"fetched_at": <epoch>, "items": [...]}, "subnets": {...}, ...},
+#   "records": [... import records derived from the entries ...]
+#   "catalog": <digest of the address catalog the records were derived with>
+# }
+
+
+def snapshot_path(cache_dir, account, region, vpc_id):
+    return os.path.join(cache_dir, account or "unknown", region or "unknown", f"{vpc_id}.json")
+
+def new_snapshot(account, region, vpc_id, vpc_name):
+    return {"account": account, "region": region, "vpc_id": vpc_id, "vpc_name": vpc_name, "entries": {}, "records": []}
+
+def load_snapshot(path):
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def save_snapshot(cache_dir, snapshot):
+    path = snapshot_path(cache_dir, snapshot["account"], snapshot["region"], snapshot["vpc_id"])
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(snapshot, f)
+    os.replace(tmp_path, path)
+    return path
+
+def set_entry(snapshot, name, items, fetched_at=None):
+    snapshot["entries"][name] = {"fetched_at": time.time() if fetched_at is None else fetched_at, "items": items}
+
+def entry_items(snapshot, name):
+    return snapshot["entries"].get(name, {}).get("items", [])
+
+def stale_entries(snapshot, names, ttl=DEFAULT_TTL, refresh=(), now=None):
+    """Returns the entry names that are missing, older than ttl seconds, or forced through refresh."""
+    now = time.time() if now is None else now
+    stale = []
+    for name in names:
+        entry = snapshot["entries"].get(name)
+        if name in refresh or "all" in refresh or entry is None or now - entry["fetched_at"] > ttl:
+            stale.append(name)
+    return stale
+
+def find_snapshot(cache_dir, vpc_identifier, region=None, account=None):
+    """Finds the newest cached snapshot whose VPC ID or Name tag matches vpc_identifier."""
+    pattern = os.path.join(cache_dir, account or "*", region or "*", "*.json")
+    is_vpc_id = vpc_identifier.lower().startswith('vpc-')
+    best = None
+
+    for path in glob.glob(pattern):
+        if is_vpc_id and os.path.basename(path) != f"{vpc_identifier}.json":
+            continue
+        snapshot = load_snapshot(path)
+        if not snapshot:
+            continue
+        if not is_vpc_id and snapshot.get("vpc_name") != vpc_identifier:
+            continue
+        fetched_at = snapshot["entries"].get("vpc", {}).get("fetched_at", 0)
+        if best is None or fetched_at > best[0]:
+            best = (fetched_at, snapshot)
+
+    return best[1] if best else None
+
+def load_records(cache_dir, vpc_identifier, region=None, account=None):
+    """Returns the cached import records for a VPC, or None when it was never discovered."""
+    snapshot = find_snapshot(cache_dir, vpc_identifier, region, account)
+    if snapshot is None:
+        return None
+    return snapshot["records"]
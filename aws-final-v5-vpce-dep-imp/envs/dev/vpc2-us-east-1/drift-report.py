@@ -0,0 +1,246 @@
+import argparse
+import hashlib
+import json
+import sys
+from collections import namedtuple
+
+import discovery_cache
+import record_stream
+
+STATE_FILE = "terraform.tfstate"
+
+# Attributes compared per resource type: (field, discovery metadata key, state attribute).
+# Routes and NACL entries need more than a lookup and are handled in
+# record_fields / state_fields.
+COMPARED_FIELDS = {
+    "aws_vpc": (("cidr", "CidrBlock", "cidr_block"),),
+    "aws_internet_gateway": (("vpc", "VpcId", "vpc_id"),),
+    "aws_subnet": (("cidr", "CidrBlock", "cidr_block"), ("az", "AvailabilityZone", "availability_zone")),
+    "aws_nat_gateway": (("subnet", "SubnetId", "subnet_id"),),
+    "aws_eip": (),
+    "aws_route_table": (("vpc", "VpcId", "vpc_id"),),
+    "aws_route_table_association": (("subnet", "SubnetId", "subnet_id"), ("route_table", "RouteTableId", "route_table_id")),
+    "aws_route": (("route_table", "RouteTableId", "route_table_id"),),
+    "aws_network_acl": (("vpc", "VpcId", "vpc_id"),),
+    "aws_network_acl_association": (("subnet", "SubnetId", "subnet_id"), ("nacl", "NaclId", "network_acl_id")),
+    "aws_vpc_endpoint": (("service", "ServiceName", "service_name"), ("vpc", "VpcId", "vpc_id")),
+    "aws_security_group": (("name", "GroupName", "name"), ("vpc", "VpcId", "vpc_id")),
+    "aws_vpc_dhcp_options": (
+        ("domain_name", "DomainName", "domain_name"), ("domain_name_servers", "DomainNameServers", "domain_name_servers"),
+        ("ntp_servers", "NtpServers", "ntp_servers"), ("netbios_name_servers", "NetbiosNameServers", "netbios_name_servers"),
+        ("netbios_node_type", "NetbiosNodeType", "netbios_node_type"),
+    ),
+}
+
+ROUTE_STATE_DESTINATIONS = ("destination_cidr_block", "destination_ipv6_cidr_block", "destination_prefix_list_id")
+ROUTE_STATE_TARGETS = (
+    "gateway_id", "nat_gateway_id", "vpc_endpoint_id", "transit_gateway_id", "vpc_peering_connection_id",
+    "egress_only_gateway_id", "carrier_gateway_id", "local_gateway_id", "network_interface_id", "core_network_arn",
+)
+PROTOCOL_NUMBERS = {"all": "-1", "icmp": "1", "tcp": "6", "udp": "17", "icmpv6": "58"}
+
+StateInstance = namedtuple("StateInstance", "address type join_id attributes")
+Fingerprint = namedtuple("Fingerprint", "digest fields")
+
+
+def normalize(value):
+    """Folds the ways AWS and the provider spell the same value: empty is None, numbers are strings, lists are tuples."""
+    if value in (None, "", [], ()):
+        return None
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, int):
+        return str(value)
+    if isinstance(value, (list, tuple)):
+        return tuple(normalize(v) for v in value)
+    return value
+
+def nacl_rule_key(egress, rule_no, protocol, from_port, to_port, cidr, action):
+    protocol = str(protocol).lower()
+    return (bool(egress), int(rule_no), PROTOCOL_NUMBERS.get(protocol, protocol),
+            int(from_port or 0), int(to_port or 0), cidr, str(action).lower())
+
+def fingerprint(fields):
+    digest = hashlib.blake2b(json.dumps(fields, sort_keys=True).encode(), digest_size=16).hexdigest()
+    return Fingerprint(digest, fields)
+
+def record_fields(record):
+    metadata = record.get('metadata') or {}
+    resource_type = record.get('type')
+    fields = {field: normalize(metadata.get(key)) for field, key, _ in COMPARED_FIELDS[resource_type]}
+    if resource_type == "aws_route":
+        fields["destination"] = metadata.get('Destination')
+        fields["target"] = metadata.get('TargetId')
+    elif resource_type == "aws_network_acl" and metadata.get('Entries') is not None:
+        fields["rules"] = sorted(nacl_rule_key(e["egress"], e["rule_no"], e["protocol"], e["from"], e["to"], e["cidr"],
+                                               e["action"]) for e in metadata['Entries'])
+    return fields
+
+def state_fields(resource_type, attributes):
+    fields = {field: normalize(attributes.get(attr)) for field, _, attr in COMPARED_FIELDS[resource_type]}
+    if resource_type == "aws_route":
+        fields["destination"] = next((attributes[a] for a in ROUTE_STATE_DESTINATIONS if attributes.get(a)), None)
+        fields["target"] = next((attributes[a] for a in ROUTE_STATE_TARGETS if attributes.get(a)), None)
+    elif resource_type == "aws_network_acl":
+        fields["rules"] = sorted(
+            nacl_rule_key(egress, r.get("rule_no"), r.get("protocol"), r.get("from_port"), r.get("to_port"),
+                          r.get("cidr_block") or r.get("ipv6_cidr_block"), r.get("action"))
+            for egress, rules in ((False, attributes.get("ingress") or ()), (True, attributes.get("egress") or ()))
+            for r in rules)
+    return fields
+
+
+def instance_address(resource, index_key):
+    address = f"{resource['type']}.{resource['name']}"
+    if resource.get('module'):
+        address = f"{resource['module']}.{address}"
+    if isinstance(index_key, str):
+        return f'{address}[{json.dumps(index_key)}]'
+    if index_key is not None:
+        return f"{address}[{index_key}]"
+    return address
+
+def state_join_id(resource_type, attributes):
+    """The id discovery records the resource under; for routes that is the import id <route table id>_<destination>."""
+    if resource_type == "aws_route":
+        destination = next((attributes[a] for a in ROUTE_STATE_DESTINATIONS if attributes.get(a)), None)
+        return f"{attributes.get('route_table_id')}_{destination}"
+    return attributes.get('id')
+
+def load_state(f):
+    """Yields a StateInstance per managed resource instance of a compared type in a v4 state file object."""
+    state = json.load(f)
+    if state.get('version') != 4:
+        raise ValueError(f"unsupported state format version {state.get('version')!r} (expected 4)")
+    for resource in state.get('resources', []):
+        if resource.get('mode') != 'managed' or resource.get('type') not in COMPARED_FIELDS:
+            continue
+        for instance in resource.get('instances', []):
+            attributes = instance.get('attributes') or {}
+            yield StateInstance(instance_address(resource, instance.get('index_key')), resource['type'],
+                                state_join_id(resource['type'], attributes), attributes)
+
+
+def diff(records, instances):
+    """Returns (added, removed, changed, unmanaged) between discovery records and state instances.
+
+    Both sides are joined by AWS id; what is left is paired by address, so
+    a resource replaced under the same address shows up as an id change.
+    added is [record] (in AWS, not in state), removed [StateInstance],
+    changed [(record, instance, {field: (state value, discovered value)})].
+    Only the fingerprints are compared until one differs. unmanaged holds
+    the records left over that discovery gave no terraform address (the
+    main route table, routes the route-tables module doesn't define).
+    """
+    discovered = {}
+    for record in records:
+        if record.get('type') in COMPARED_FIELDS and record.get('aws_id'):
+            discovered.setdefault(record['aws_id'], record)
+    managed = {}
+    for instance in instances:
+        managed.setdefault(instance.join_id, instance)
+
+    changed = []
+    pairs = [(discovered.pop(join_id), instance) for join_id, instance in list(managed.items()) if join_id in discovered]
+    for record, _ in pairs:
+        del managed[record['aws_id']]
+
+    by_address = {}
+    for instance in managed.values():
+        by_address.setdefault((instance.type, instance.address), instance)
+    for aws_id, record in list(discovered.items()):
+        instance = by_address.pop((record['type'], record.get('terraform_address')), None)
+        if instance:
+            del discovered[aws_id]
+            del managed[instance.join_id]
+            changed.append((record, instance, {"id": (instance.join_id, aws_id)}))
+
+    for record, instance in pairs:
+        found, expected = fingerprint(record_fields(record)), fingerprint(state_fields(instance.type, instance.attributes))
+        if found.digest != expected.digest:
+            changed.append((record, instance, {field: (expected.fields.get(field), found.fields.get(field))
+                                               for field in found.fields
+                                               if found.fields.get(field) != expected.fields.get(field)}))
+
+    added = [record for record in discovered.values() if record.get('terraform_address')]
+    unmanaged = [record for record in discovered.values() if not record.get('terraform_address')]
+    return added, list(managed.values()), changed, unmanaged
+
+
+def report_json(added, removed, changed, unmanaged=()):
+    return {
+        "added": [{"type": r['type'], "aws_id": r['aws_id'], "terraform_address": r.get('terraform_address')} for r in added],
+        "removed": [{"type": i.type, "aws_id": i.join_id, "terraform_address": i.address} for i in removed],
+        "changed": [{"type": i.type, "aws_id": r['aws_id'], "terraform_address": i.address,
+                     "fields": {field: {"state": before, "aws": after} for field, (before, after) in fields.items()}}
+                    for r, i, fields in changed],
+        "unmanaged": [{"type": r['type'], "aws_id": r['aws_id'], "terraform_address": r.get('terraform_address')}
+                      for r in unmanaged],
+    }
+
+def print_report(added, removed, changed, unmanaged=()):
+    for record in added:
+        print(f"+ {record['type']} {record['aws_id']}: in AWS, not in state (discovered as {record.get('terraform_address')})")
+    for instance in removed:
+        print(f"- {instance.address} ({instance.join_id}): in state, not found in AWS")
+    for record, instance, fields in changed:
+        print(f"~ {instance.address} ({record['aws_id']})")
+        for field, (before, after) in fields.items():
+            print(f"    {field}: {before!r} -> {after!r}")
+    for record in unmanaged:
+        print(f"? {record['type']} {record['aws_id']}: in AWS, not managed by this configuration (no terraform address)")
+    print(f"\nDrift: {len(added)} added, {len(removed)} removed, {len(changed)} changed."
+          + (f" {len(unmanaged)} unmanaged, not counted as drift." if unmanaged else ""))
+
+def drift_report(records, state_file=STATE_FILE, as_json=False):
+    """Prints the drift between discovery records and a terraform.tfstate; returns True when there is any.
+
+    Unmanaged records are listed but aren't drift.
+    """
+    try:
+        if state_file == "-":
+            instances = list(load_state(sys.stdin))
+        else:
+            with open(state_file) as f:
+                instances = list(load_state(f))
+    except (OSError, ValueError) as e:
+        print(f"ERROR reading state file {state_file}: {e}")
+        sys.exit(1)
+
+    try:
+        added, removed, changed, unmanaged = diff(records, instances)
+    except Exception as e:
+        print(f"ERROR reading or decoding discovery file: {e}")
+        sys.exit(1)
+
+    if as_json:
+        print(json.dumps(report_json(added, removed, changed, unmanaged), indent=2))
+    else:
+        print_report(added, removed, changed, unmanaged)
+    return bool(added or removed or changed)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Report drift between discovery records and terraform.tfstate without a provider refresh",
+        epilog="Exit status: 0 no drift, 2 drift found, 1 error. For the s3 backend: terraform state pull | drift-report.py --state -")
+    parser.add_argument("json_file", nargs="?", default=None,
+                        help=f"discovery records, NDJSON or legacy JSON (default: {record_stream.RECORDS_FILE}, else {record_stream.LEGACY_FILE})")
+    parser.add_argument("--state", default=STATE_FILE, help="v4 state file, or - for stdin (default: %(default)s)")
+    parser.add_argument("--from-cache", metavar="VPC_ID_OR_NAME_TAG",
+                        help="compare against the discovery snapshot cache instead of a JSON file (no AWS access)")
+    parser.add_argument("--cache-dir", default=discovery_cache.CACHE_DIR)
+    parser.add_argument("--region", help="restrict the cache lookup to this region")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    if args.from_cache:
+        records = discovery_cache.load_records(args.cache_dir, args.from_cache, args.region)
+        if records is None:
+            print(f"ERROR: no cached snapshot for '{args.from_cache}' in {args.cache_dir}.")
+            sys.exit(1)
+    else:
+        json_file = args.json_file or record_stream.default_records_file()
+        if not args.json:
+            print(f"-> Reading discovery data from: {json_file}")
+        records = record_stream.iter_records(json_file, tuple(COMPARED_FIELDS))
+    sys.exit(2 if drift_report(records, args.state, args.json) else 0)
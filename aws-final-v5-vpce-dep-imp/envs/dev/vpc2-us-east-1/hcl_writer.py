@@ -0,0 +1,112 @@
+import io
+import re
+from functools import lru_cache
+
+IDENTIFIER_RE = re.compile(r'^[A-Za-z_][A-Za-z0-9_-]*$')
+NEEDS_ESCAPE_RE = re.compile(r'[\\"\n\r\t]|[$%]\{')
+CONTAINER_TYPES = (dict, list, tuple, set, frozenset)
+
+# Layout matches the original hcl_format_map/hcl_format_list output: keys are
+# sorted, a nested non-empty container repeats its own indent after "key = ",
+# empty containers are written inline, and lists only go multi-line when they
+# hold maps.
+
+
+def hcl_string(value):
+    """Quotes a string as an HCL literal, escaping quotes, control characters and template sequences."""
+    if not NEEDS_ESCAPE_RE.search(value):
+        return f'"{value}"'
+    escaped = (value.replace('\\', '\\\\')
+                    .replace('"', '\\"')
+                    .replace('\n', '\\n')
+                    .replace('\r', '\\r')
+                    .replace('\t', '\\t')
+                    .replace('${', '$${')
+                    .replace('%{', '%%{'))
+    return f'"{escaped}"'
+
+@lru_cache(maxsize=4096)
+def hcl_key(key):
+    key = str(key)
+    return key if IDENTIFIER_RE.match(key) else hcl_string(key)
+
+def hcl_scalar(value):
+    if isinstance(value, str):
+        return hcl_string(value)
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (int, float)):
+        return str(value)
+    raise TypeError(f"cannot write {type(value).__name__} as HCL")
+
+def _as_list(value):
+    if isinstance(value, (set, frozenset)):
+        return sorted(value, key=str)
+    return value
+
+def write_hcl_value(out, value, indent=0):
+    """Writes any value right after an already written "key = " (or at the top level)."""
+    if isinstance(value, dict):
+        write_hcl_map(out, value, indent)
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        write_hcl_list(out, _as_list(value), indent)
+    else:
+        out.write(hcl_scalar(value))
+
+def write_hcl_map(out, data, indent=0):
+    if not data:
+        out.write("{}")
+        return
+
+    write = out.write
+    inner_indent_str = ' ' * (indent + 2)
+    write(' ' * indent + "{")
+    separator = ""
+    for key in sorted(data.keys()):
+        value = data[key]
+        if isinstance(value, CONTAINER_TYPES):
+            write(f'{separator}\n{inner_indent_str}{hcl_key(key)} = ')
+            write_hcl_value(out, value, indent + 2)
+        else:
+            write(f'{separator}\n{inner_indent_str}{hcl_key(key)} = {hcl_scalar(value)}')
+        separator = ","
+    write('\n' + ' ' * indent + "}")
+
+def write_hcl_list(out, data, indent=0):
+    if not data:
+        out.write("[]")
+        return
+
+    if not any(isinstance(item, dict) for item in data):
+        if not any(isinstance(item, CONTAINER_TYPES) for item in data):
+            out.write("[" + ", ".join(hcl_scalar(item) for item in data) + "]")
+            return
+        out.write("[")
+        for i, item in enumerate(data):
+            if i:
+                out.write(", ")
+            write_hcl_value(out, item, indent)
+        out.write("]")
+        return
+
+    out.write(' ' * indent + "[")
+    for i, item in enumerate(data):
+        out.write(",\n" if i else "\n")
+        if isinstance(item, dict):
+            write_hcl_map(out, item, indent + 2)
+        else:
+            out.write(' ' * (indent + 2))
+            write_hcl_value(out, item, indent + 2)
+    out.write('\n' + ' ' * indent + "]")
+
+def write_hcl_assignment(out, name, value):
+    out.write(f'{name} = ')
+    write_hcl_value(out, value, 0)
+
+def hcl_format(value, indent=0):
+    """Returns the HCL text for a value; mainly for tests and small snippets."""
+    out = io.StringIO()
+    write_hcl_value(out, value, indent)
+    return out.getvalue()
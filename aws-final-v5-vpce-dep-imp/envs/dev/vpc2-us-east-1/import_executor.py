@@ -0,0 +1,247 @@
+import glob
+import json
+import os
+import re
+import subprocess
+import threading
+import time
+from collections import Counter, namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import rate_limiter
+
+CHECKPOINT_FILE = ".import-checkpoint.ndjson"
+PLUGIN_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".terraform.d", "plugin-cache")
+DEFAULT_PARALLELISM = 4
+DEFAULT_ATTEMPTS = 4
+RETRY_DELAY = 2.0
+LOCK_TIMEOUT = "300s"
+
+# Imports run tier by tier; everything in a tier waits for the tiers before it.
+# Types not listed here go last.
+IMPORT_TIERS = (
+    ("aws_vpc",),
+    ("aws_subnet", "aws_internet_gateway", "aws_eip", "aws_vpc_dhcp_options", "aws_security_group"),
+    ("aws_nat_gateway", "aws_route_table", "aws_network_acl", "aws_vpc_endpoint"),
+    ("aws_route", "aws_route_table_association", "aws_network_acl_association",
+     "aws_vpc_dhcp_options_association", "aws_security_group_rule"),
+)
+TIER_OF = {resource_type: tier for tier, types in enumerate(IMPORT_TIERS) for resource_type in types}
+
+# Record metadata keys holding the AWS id of another resource; when that one
+# fails to import, the resource referring to it is not attempted.
+REFERENCE_KEYS = ("VpcId", "SubnetId", "RouteTableId", "NaclId", "TargetId")
+
+DONE_STATUSES = {"imported", "already_managed"}
+ALREADY_MANAGED = "Resource already managed by Terraform"
+RETRYABLE_OUTPUT = (
+    "Error acquiring the state lock", "RequestLimitExceeded", "Throttling", "ServiceUnavailable",
+    "connection reset by peer", "i/o timeout", "TLS handshake timeout",
+)
+
+ImportTask = namedtuple("ImportTask", "address aws_id type refs")
+
+
+def plan_imports(blocks, records):
+    """Groups (address, aws_id) import blocks into dependency tiers of ImportTasks, earliest tier first."""
+    records_by_address = {}
+    for record in records:
+        records_by_address.setdefault(record.get('terraform_address'), record)
+
+    tiers = {}
+    for address, aws_id in blocks:
+        record = records_by_address.get(address, {})
+        metadata = record.get('metadata') or {}
+        refs = tuple(metadata[key] for key in REFERENCE_KEYS
+                     if isinstance(metadata.get(key), str) and metadata[key] != aws_id)
+        tier = TIER_OF.get(record.get('type'), len(IMPORT_TIERS))
+        tiers.setdefault(tier, []).append(ImportTask(address, aws_id, record.get('type'), refs))
+    return [tiers[tier] for tier in sorted(tiers)]
+
+
+def load_checkpoint(path):
+    """Returns {address: aws_id} for the imports the checkpoint file records as done."""
+    done = {}
+    try:
+        with open(path) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # torn write from an interrupted run
+                if entry.get('status') in DONE_STATUSES:
+                    done[entry.get('address')] = entry.get('aws_id')
+    except FileNotFoundError:
+        pass
+    return done
+
+class Checkpoint:
+    """Append-only NDJSON log of import outcomes, synced per line so an interrupted run loses nothing it finished.
+
+    An address counts as done only for the AWS id it was imported with, so a
+    rediscovered resource with a new id is imported again.
+    """
+
+    def __init__(self, path=CHECKPOINT_FILE):
+        self.path = path
+        self.done = load_checkpoint(path)
+        self._lock = threading.Lock()
+        self._file = open(path, 'a+')
+        self._file.seek(0, os.SEEK_END)
+        if self._file.tell():
+            self._file.seek(self._file.tell() - 1)
+            if self._file.read(1) != '\n':
+                self._file.write('\n')
+
+    def completed(self, task):
+        return task.address in self.done and self.done[task.address] == task.aws_id
+
+    def record(self, task, status, detail=None):
+        entry = {"address": task.address, "aws_id": task.aws_id, "status": status,
+                 "at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())}
+        if detail:
+            entry["detail"] = detail
+        with self._lock:
+            self._file.write(json.dumps(entry) + '\n')
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            if status in DONE_STATUSES:
+                self.done[task.address] = task.aws_id
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _backend_block(text):
+    match = re.search(r'\bbackend\s+"(\w+)"\s*\{', text)
+    if not match:
+        return None, None
+    depth = 0
+    for i in range(match.end() - 1, len(text)):
+        if text[i] == '{':
+            depth += 1
+        elif text[i] == '}':
+            depth -= 1
+            if depth == 0:
+                return match.group(1), text[match.end():i]
+    return match.group(1), text[match.end():]
+
+def backend_locks_state(workdir="."):
+    """False when the configured s3 backend sets neither dynamodb_table nor use_lockfile.
+
+    Without a lock, concurrent terraform runs each write back their own copy
+    of the state and all but the last import are lost. The local backend and
+    the other remote backends lock by themselves. Settings passed with
+    -backend-config at init time can't be seen here.
+    """
+    for path in sorted(glob.glob(os.path.join(workdir, "*.tf"))):
+        with open(path) as f:
+            backend, body = _backend_block(f.read())
+        if backend is None:
+            continue
+        if backend != "s3":
+            return True
+        return re.search(r'^\s*(dynamodb_table|use_lockfile)\s*=', body, re.M) is not None
+    return True
+
+def terraform_env(plugin_cache_dir=None):
+    """The environment for terraform subprocesses: non-interactive, with one shared provider plugin cache."""
+    env = dict(os.environ)
+    plugin_cache_dir = plugin_cache_dir or env.get("TF_PLUGIN_CACHE_DIR") or PLUGIN_CACHE_DIR
+    os.makedirs(plugin_cache_dir, exist_ok=True)
+    env["TF_PLUGIN_CACHE_DIR"] = plugin_cache_dir
+    env["TF_IN_AUTOMATION"] = "1"
+    env["TF_INPUT"] = "0"
+    return env
+
+def error_summary(output):
+    """The first 'Error: ...' line of terraform output, else its last non-empty line."""
+    lines = [line.strip() for line in output.splitlines() if line.strip()]
+    for line in lines:
+        if line.startswith("Error:"):
+            return line
+    return lines[-1] if lines else "no output"
+
+def terraform_init(terraform, workdir, env):
+    """Runs terraform init once up front so every import reuses the providers from the plugin cache.
+
+    Returns None on success, else the error summary.
+    """
+    result = subprocess.run([terraform, "init", "-input=false", "-no-color"], cwd=workdir, env=env,
+                            capture_output=True, text=True)
+    return None if result.returncode == 0 else error_summary(result.stdout + result.stderr)
+
+def run_import(task, terraform, workdir, env, lock_timeout=LOCK_TIMEOUT, policy=None):
+    """Runs terraform import for one task, retrying lock contention and API throttling.
+
+    Returns (status, detail) with status "imported", "already_managed" or "failed".
+    """
+    policy = policy or rate_limiter.RetryPolicy(DEFAULT_ATTEMPTS, base_delay=RETRY_DELAY)
+    cmd = [terraform, "import", "-input=false", "-no-color", f"-lock-timeout={lock_timeout}", task.address, task.aws_id]
+    attempt = 0
+    while True:
+        result = subprocess.run(cmd, cwd=workdir, env=env, capture_output=True, text=True)
+        output = result.stdout + result.stderr
+        if result.returncode == 0:
+            return "imported", None
+        if ALREADY_MANAGED in output:
+            return "already_managed", None
+        if attempt + 1 >= policy.max_attempts or not any(marker in output for marker in RETRYABLE_OUTPUT):
+            return "failed", error_summary(output)
+        time.sleep(policy.backoff(attempt))
+        attempt += 1
+
+def run_imports(tiers, checkpoint, terraform="terraform", workdir=".", parallelism=DEFAULT_PARALLELISM,
+                env=None, lock_timeout=LOCK_TIMEOUT, attempts=DEFAULT_ATTEMPTS):
+    """Imports tier by tier with up to parallelism terraform processes at a time; returns a Counter of outcomes.
+
+    Tasks the checkpoint already has are skipped, and tasks referring to a
+    resource that failed (or was itself blocked) are not attempted.
+    """
+    env = env if env is not None else terraform_env()
+    policy = rate_limiter.RetryPolicy(attempts, base_delay=RETRY_DELAY)
+    total = sum(len(tier) for tier in tiers)
+    summary = Counter()
+    failed_ids = set()
+    finished = 0
+
+    def report(task, status, detail=None):
+        nonlocal finished
+        finished += 1
+        print(f"[{finished}/{total}] {status:<15} {task.address}" + (f": {detail}" if detail else ""))
+
+    with ThreadPoolExecutor(max_workers=max(1, parallelism)) as pool:
+        for tier in tiers:
+            futures = {}
+            for task in tier:
+                failed_ref = next((ref for ref in task.refs if ref in failed_ids), None)
+                if checkpoint.completed(task):
+                    summary["skipped"] += 1
+                    finished += 1
+                elif failed_ref:
+                    detail = f"depends on {failed_ref}, which was not imported"
+                    checkpoint.record(task, "blocked", detail)
+                    failed_ids.add(task.aws_id)
+                    summary["blocked"] += 1
+                    report(task, "blocked", detail)
+                else:
+                    futures[pool.submit(run_import, task, terraform, workdir, env, lock_timeout, policy)] = task
+            try:
+                for future in as_completed(futures):
+                    task = futures[future]
+                    status, detail = future.result()
+                    checkpoint.record(task, status, detail)
+                    if status not in DONE_STATUSES:
+                        failed_ids.add(task.aws_id)
+                    summary[status] += 1
+                    report(task, status, detail)
+            except KeyboardInterrupt:
+                pool.shutdown(wait=False, cancel_futures=True)
+                raise
+    return summary
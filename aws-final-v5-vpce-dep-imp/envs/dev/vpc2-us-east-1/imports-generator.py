@@ -0,0 +1,196 @@
+import argparse
+import json
+import os
+import shutil
+import sys
+
+import address_catalog
+import discovery_cache
+import import_executor
+import record_stream
+
+JSON_FILE = record_stream.LEGACY_FILE
+OUTPUT_FILE = "imports.tf"
+TF_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def validate_address(address):
+    """Returns why a terraform_address can't be used in an import block, or None if it can."""
+    if not address:
+        return "empty address"
+    if '<' in address or '>' in address:
+        return "unresolved placeholder"
+    if not address_catalog.ADDRESS_RE.match(address):
+        return "not a valid resource address"
+    return None
+
+def build_import_blocks(records, catalog=None):
+    """Returns ([(address, aws_id)], [problem]) with invalid and colliding records dropped.
+
+    The first record claiming an address wins; exact repeats are dropped
+    silently, while a second id for the same address (or the same id under
+    a second address) is reported. With an address_catalog.AddressCatalog,
+    addresses the configuration doesn't define are dropped too.
+    """
+    blocks = []
+    problems = []
+    by_address = {}
+    by_id = {}
+
+    for record in records:
+        address = record.get('terraform_address')
+        aws_id = record.get('aws_id')
+        label = f"{record.get('type', '?')} {aws_id}"
+
+        error = validate_address(address) or (catalog and catalog.check(address))
+        if error:
+            problems.append(f"{label}: {error} ({address})")
+            continue
+        if not aws_id:
+            problems.append(f"{label}: missing aws_id ({address})")
+            continue
+
+        if address in by_address:
+            if by_address[address] != aws_id:
+                problems.append(f"{label}: address {address} already imports {by_address[address]}")
+            continue
+        if aws_id in by_id:
+            problems.append(f"{label}: already imported as {by_id[aws_id]}, not also as {address}")
+            continue
+
+        by_address[address] = aws_id
+        by_id[aws_id] = address
+        blocks.append((address, aws_id))
+
+    return blocks, problems
+
+def render_import_blocks(blocks, source=JSON_FILE):
+    lines = [f'# Generated from {source} by {os.path.basename(__file__)}', '']
+    for address, aws_id in blocks:
+        lines.append('import {')
+        lines.append(f'  to = {address}')
+        lines.append(f'  id = {json.dumps(aws_id)}')
+        lines.append('}')
+        lines.append('')
+    return '\n'.join(lines)
+
+def generate_imports_from_json(json_file=JSON_FILE, output_file=OUTPUT_FILE, records=None):
+    if records is None:
+        print(f"-> Reading discovery data from: {json_file}")
+        records = record_stream.iter_records(json_file)
+
+    try:
+        blocks, problems = build_import_blocks(records, address_catalog.load_catalog(TF_DIR))
+    except Exception as e:
+        print(f"ERROR reading or decoding discovery file: {e}")
+        sys.exit(1)
+
+    for problem in problems:
+        print(f"Warning: skipping {problem}")
+
+    if not blocks:
+        print("\n--- IMPORT GENERATION FAILED ---")
+        print("No importable resources were found.")
+        sys.exit(1)
+
+    try:
+        with open(output_file, 'w') as f:
+            f.write(render_import_blocks(blocks, json_file))
+    except Exception as e:
+        print(f"ERROR writing file: {e}")
+        sys.exit(1)
+
+    print("\n--- IMPORT GENERATION COMPLETE ---")
+    print(f"Wrote {len(blocks)} import blocks to '{output_file}' ({len(problems)} skipped).")
+    print("Run 'terraform plan' then 'terraform apply' to import everything in one pass.")
+
+def execute_imports(json_file=JSON_FILE, records=None, terraform="terraform", parallelism=import_executor.DEFAULT_PARALLELISM,
+                    checkpoint_file=import_executor.CHECKPOINT_FILE, plugin_cache_dir=None, init=True):
+    """Runs terraform import per record in dependency order, resuming from the checkpoint file."""
+    if records is None:
+        print(f"-> Reading discovery data from: {json_file}")
+        records = record_stream.iter_records(json_file)
+
+    try:
+        records = list(records)
+        blocks, problems = build_import_blocks(records, address_catalog.load_catalog(TF_DIR))
+    except Exception as e:
+        print(f"ERROR reading or decoding discovery file: {e}")
+        sys.exit(1)
+
+    for problem in problems:
+        print(f"Warning: skipping {problem}")
+
+    if not blocks:
+        print("\n--- IMPORT FAILED ---")
+        print("No importable resources were found.")
+        sys.exit(1)
+
+    if not shutil.which(terraform):
+        print(f"ERROR: terraform binary '{terraform}' not found.")
+        sys.exit(1)
+
+    if parallelism > 1 and not import_executor.backend_locks_state():
+        print("Warning: the s3 backend has no dynamodb_table or use_lockfile, so parallel imports would overwrite "
+              "each other's state; importing one at a time.")
+        parallelism = 1
+
+    env = import_executor.terraform_env(plugin_cache_dir)
+    if init:
+        print(f"-> terraform init (plugin cache: {env['TF_PLUGIN_CACHE_DIR']})")
+        error = import_executor.terraform_init(terraform, ".", env)
+        if error:
+            print(f"ERROR: terraform init failed: {error}")
+            sys.exit(1)
+
+    tiers = import_executor.plan_imports(blocks, records)
+    print(f"-> Importing {len(blocks)} resources in {len(tiers)} tiers, {parallelism} at a time (checkpoint: {checkpoint_file})")
+    try:
+        with import_executor.Checkpoint(checkpoint_file) as checkpoint:
+            summary = import_executor.run_imports(tiers, checkpoint, terraform, ".", parallelism, env)
+    except KeyboardInterrupt:
+        print(f"\nInterrupted; rerun to resume from '{checkpoint_file}'.")
+        sys.exit(130)
+
+    print("\n--- IMPORT COMPLETE ---" if not summary["failed"] + summary["blocked"] else "\n--- IMPORT INCOMPLETE ---")
+    print(", ".join(f"{count} {status}" for status, count in sorted(summary.items())) + f"; {len(problems)} invalid records not attempted.")
+    if summary["failed"] or summary["blocked"]:
+        print(f"Fix the failures and rerun; addresses recorded in '{checkpoint_file}' are not imported again.")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate Terraform import {} blocks from discovery records")
+    parser.add_argument("json_file", nargs="?", default=None,
+                        help=f"discovery records, NDJSON or legacy JSON (default: {record_stream.RECORDS_FILE}, else {record_stream.LEGACY_FILE})")
+    parser.add_argument("-o", "--output", default=OUTPUT_FILE)
+    parser.add_argument("--from-cache", metavar="VPC_ID_OR_NAME_TAG",
+                        help="read records from the discovery snapshot cache instead of a JSON file (no AWS access)")
+    parser.add_argument("--cache-dir", default=discovery_cache.CACHE_DIR)
+    parser.add_argument("--region", help="restrict the cache lookup to this region")
+    parser.add_argument("--execute", action="store_true",
+                        help="run terraform import per resource in dependency order instead of writing import blocks")
+    parser.add_argument("--parallelism", type=int, default=import_executor.DEFAULT_PARALLELISM,
+                        help="concurrent terraform import processes with --execute (needs a locking backend)")
+    parser.add_argument("--checkpoint", default=import_executor.CHECKPOINT_FILE,
+                        help="resume log; addresses already imported are skipped on rerun")
+    parser.add_argument("--terraform", default=os.environ.get("TERRAFORM", "terraform"),
+                        help="terraform binary to run (default: $TERRAFORM or terraform on PATH)")
+    parser.add_argument("--plugin-cache-dir", help=f"shared TF_PLUGIN_CACHE_DIR (default: $TF_PLUGIN_CACHE_DIR or {import_executor.PLUGIN_CACHE_DIR})")
+    parser.add_argument("--skip-init", action="store_true", help="don't run terraform init before importing")
+    args = parser.parse_args()
+
+    def run(source, records=None):
+        if args.execute:
+            execute_imports(source, records, args.terraform, args.parallelism, args.checkpoint,
+                            args.plugin_cache_dir, not args.skip_init)
+        else:
+            generate_imports_from_json(source, args.output, records)
+
+    if args.from_cache:
+        records = discovery_cache.load_records(args.cache_dir, args.from_cache, args.region)
+        if records is None:
+            print(f"ERROR: no cached snapshot for '{args.from_cache}' in {args.cache_dir}.")
+            sys.exit(1)
+        run(f"{args.cache_dir} snapshot of {args.from_cache}", records)
+    else:
+        run(args.json_file or record_stream.default_records_file())
@@ -0,0 +1,327 @@
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+from collections import Counter, namedtuple
+
+import discovery_cache
+import record_stream
+
+CHUNK_SIZE = 1 << 20
+CATEGORIES = ("clean", "updated", "replaced", "unexpected", "missing")
+REPORT_LIMIT = 50
+ATTRIBUTE_LIMIT = 5
+
+WS_RE = re.compile(r'[ \t\n\r]*')
+STRING_RE = re.compile(r'"[^"\\]*(?:\\.[^"\\]*)*"')
+SCALAR_RE = re.compile(r'[^,\]}\s]+')
+# Everything up to the next bracket, stepping over whole strings (which may hold brackets).
+# A string cut off by the end of the buffer stops the match at its opening quote.
+SKIP_RE = re.compile(r'[^"\[\]{}]*(?:"[^"\\]*(?:\\.[^"\\]*)*"[^"\[\]{}]*)*')
+
+Verdict = namedtuple("Verdict", "category address aws_id detail")
+
+
+class JsonStream:
+    """Walks a JSON document from a file object without holding more than one chunk, or the value being read, in memory."""
+
+    def __init__(self, f, chunk_size=CHUNK_SIZE):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buf = ""
+        self.pos = 0
+        self.mark = None  # start of a value that is being kept for decoding
+
+    def fill(self):
+        """Reads another chunk, dropping what has been consumed; False at the end of the input."""
+        keep = self.pos if self.mark is None else self.mark
+        chunk = self.f.read(self.chunk_size)
+        if not chunk:
+            return False
+        self.buf = self.buf[keep:] + chunk
+        self.pos -= keep
+        if self.mark is not None:
+            self.mark = 0
+        return True
+
+    def peek(self):
+        """The next non-whitespace character, or '' at the end of the input."""
+        while True:
+            self.pos = WS_RE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self.fill():
+                return ''
+
+    def expect(self, char):
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"expected '{char}' but found {found!r} in the plan JSON")
+        self.pos += 1
+
+    def string(self):
+        if self.peek() != '"':
+            raise ValueError(f"expected a string but found {self.peek()!r} in the plan JSON")
+        while True:
+            match = STRING_RE.match(self.buf, self.pos)
+            if match:
+                self.pos = match.end()
+                return json.loads(match.group())
+            if not self.fill():
+                raise ValueError("unterminated string in the plan JSON")
+
+    def skip(self):
+        """Moves past one value; strings are stepped over by regex and only brackets are counted."""
+        first = self.peek()
+        if not first:
+            raise ValueError("truncated plan JSON")
+        if first == '"':
+            self.string()
+            return
+        if first not in '[{':
+            while True:
+                match = SCALAR_RE.match(self.buf, self.pos)
+                if match and match.end() < len(self.buf):
+                    self.pos = match.end()
+                    return
+                if not self.fill():
+                    if not match:
+                        raise ValueError("truncated plan JSON")
+                    self.pos = match.end()
+                    return
+        depth = 0
+        while True:
+            self.pos = SKIP_RE.match(self.buf, self.pos).end()
+            if self.pos == len(self.buf) or self.buf[self.pos] == '"':
+                if not self.fill():
+                    raise ValueError("truncated plan JSON")
+                continue
+            char = self.buf[self.pos]
+            self.pos += 1
+            depth += 1 if char in '[{' else -1
+            if depth == 0:
+                return
+
+    def value(self):
+        """Decodes the next value."""
+        self.peek()
+        self.mark = self.pos
+        try:
+            self.skip()
+            return json.loads(self.buf[self.mark:self.pos])
+        finally:
+            self.mark = None
+
+    def members(self):
+        """Yields the keys of the object at the cursor; the caller reads or skips each value."""
+        self.expect('{')
+        if self.peek() == '}':
+            self.pos += 1
+            return
+        while True:
+            key = self.string()
+            self.expect(':')
+            yield key
+            separator = self.peek()
+            self.pos += 1
+            if separator == '}':
+                return
+            if separator != ',':
+                raise ValueError(f"expected ',' or '}}' but found {separator!r} in the plan JSON")
+
+    def items(self):
+        """Yields each element of the array at the cursor, decoded one at a time."""
+        self.expect('[')
+        if self.peek() == ']':
+            self.pos += 1
+            return
+        while True:
+            yield self.value()
+            separator = self.peek()
+            self.pos += 1
+            if separator == ']':
+                return
+            if separator != ',':
+                raise ValueError(f"expected ',' or ']' but found {separator!r} in the plan JSON")
+
+def resource_changes(f, chunk_size=CHUNK_SIZE):
+    """Yields the resource_changes of `terraform show -json` output one at a time; every other section is skipped unread."""
+    stream = JsonStream(f, chunk_size)
+    found = False
+    for key in stream.members():
+        if key == "resource_changes":
+            found = True
+            yield from stream.items()
+        else:
+            stream.skip()
+    if not found:
+        raise ValueError("no resource_changes in the plan JSON (is it `terraform show -json` of a saved plan?)")
+
+
+def changed_attributes(change):
+    """Top-level attributes the plan changes, or leaves unknown until apply."""
+    before = change.get('before') or {}
+    after = change.get('after') or {}
+    unknown = change.get('after_unknown') or {}
+    return sorted({key for key in before.keys() | after.keys() if before.get(key) != after.get(key)}
+                  | {key for key, value in unknown.items() if value})
+
+def brief(names):
+    shown = ", ".join(names[:ATTRIBUTE_LIMIT])
+    return shown + (f" and {len(names) - ATTRIBUTE_LIMIT} more" if len(names) > ATTRIBUTE_LIMIT else "")
+
+def classify(resource_change, expected):
+    """Returns a Verdict for one resource change, or None when it doesn't concern the import.
+
+    expected maps discovered addresses to AWS ids. A no-op is clean; an
+    update, a replacement or any change outside the discovery records is
+    not, and neither is an import of a different id than the one discovered.
+    """
+    if resource_change.get('mode') != 'managed':
+        return None
+    address = resource_change.get('address')
+    change = resource_change.get('change') or {}
+    actions = tuple(change.get('actions') or ())
+    importing = (change.get('importing') or {}).get('id')
+    aws_id = expected.get(address)
+
+    if address not in expected:
+        if actions == ("no-op",) and not importing:
+            return None
+        return Verdict("unexpected", address, importing, f"{'/'.join(actions)}, but discovery has no such resource")
+    if importing and importing != aws_id:
+        return Verdict("unexpected", address, aws_id, f"imports {importing}, but discovery found {aws_id}")
+    if actions == ("no-op",):
+        return Verdict("clean", address, aws_id, None)
+    if actions == ("update",):
+        return Verdict("updated", address, aws_id, f"changes {brief(changed_attributes(change))}")
+    if set(actions) == {"delete", "create"}:
+        paths = [".".join(str(p) for p in path) for path in change.get('replace_paths') or ()]
+        return Verdict("replaced", address, aws_id, f"forced by {brief(paths)}" if paths else resource_change.get('action_reason'))
+    if actions == ("create",):
+        return Verdict("unexpected", address, aws_id, "would be created instead of imported")
+    return Verdict("unexpected", address, aws_id, f"{'/'.join(actions)}")
+
+def verify_plan(f, records, chunk_size=CHUNK_SIZE):
+    """Classifies every resource change in the plan JSON read from f against the discovery records.
+
+    Returns (Counter of categories, [Verdict] for what isn't clean, at
+    most REPORT_LIMIT per category). Discovered addresses the plan never
+    mentions are "missing". Memory grows with the discovery records, not
+    with the plan.
+    """
+    expected = {}
+    for record in records:
+        if record.get('terraform_address') and record.get('aws_id'):
+            expected.setdefault(record['terraform_address'], record['aws_id'])
+
+    counts = Counter()
+    problems = []
+    seen = set()
+    for resource_change in resource_changes(f, chunk_size):
+        verdict = classify(resource_change, expected)
+        if verdict is None:
+            continue
+        seen.add(verdict.address)
+        counts[verdict.category] += 1
+        if verdict.category != "clean" and counts[verdict.category] <= REPORT_LIMIT:
+            problems.append(verdict)
+    for address, aws_id in expected.items():
+        if address not in seen:
+            counts["missing"] += 1
+            if counts["missing"] <= REPORT_LIMIT:
+                problems.append(Verdict("missing", address, aws_id, "discovered, but not in the plan"))
+    return counts, problems
+
+
+def report_json(counts, problems):
+    return {
+        "summary": {category: counts[category] for category in CATEGORIES},
+        "problems": [verdict._asdict() for verdict in problems],
+    }
+
+def print_report(counts, problems):
+    for category in CATEGORIES[1:]:
+        for verdict in problems:
+            if verdict.category == category:
+                print(f"{category:<11}{verdict.address} ({verdict.aws_id}): {verdict.detail}")
+        if counts[category] > REPORT_LIMIT:
+            print(f"{category:<11}... and {counts[category] - REPORT_LIMIT} more")
+    print(f"\nPlan: {counts['clean']} imported cleanly, {counts['updated']} updated in place, {counts['replaced']} replaced, "
+          f"{counts['unexpected']} unexpected, {counts['missing']} missing.")
+
+def open_plan(plan_json=None, tfplan=None, terraform="terraform"):
+    """The plan JSON as a text stream: a file, stdin, or `terraform show -json` of a saved plan read as it is written."""
+    if tfplan:
+        return subprocess.Popen([terraform, "show", "-json", "-no-color", tfplan], stdout=subprocess.PIPE, text=True)
+    if plan_json == "-":
+        return None
+    return open(plan_json)
+
+def plan_report(records, plan_json=None, tfplan=None, terraform="terraform", as_json=False):
+    """Prints how the plan treats the discovered resources; returns True when anything isn't a clean import."""
+    try:
+        source = open_plan(plan_json, tfplan, terraform)
+    except OSError as e:
+        print(f"ERROR reading plan {tfplan or plan_json}: {e}")
+        sys.exit(1)
+
+    try:
+        if source is None:
+            counts, problems = verify_plan(sys.stdin, records)
+        elif isinstance(source, subprocess.Popen):
+            with source:
+                try:
+                    counts, problems = verify_plan(source.stdout, records)
+                except ValueError:
+                    source.stdout.close()
+                    if source.wait():
+                        raise ValueError(f"terraform show exited with status {source.returncode}") from None
+                    raise
+            if source.returncode:
+                raise ValueError(f"terraform show exited with status {source.returncode}")
+        else:
+            with source:
+                counts, problems = verify_plan(source, records)
+    except ValueError as e:
+        print(f"ERROR reading plan {tfplan or plan_json}: {e}")
+        sys.exit(1)
+
+    if as_json:
+        print(json.dumps(report_json(counts, problems), indent=2))
+    else:
+        print_report(counts, problems)
+    return bool(problems)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Check that a plan after importing leaves the discovered resources unchanged",
+        epilog="Exit status: 0 clean, 2 changes or missing resources, 1 error. "
+               "Example: terraform plan -out tfplan && plan-verifier.py --tfplan tfplan")
+    parser.add_argument("json_file", nargs="?", default=None,
+                        help=f"discovery records, NDJSON or legacy JSON (default: {record_stream.RECORDS_FILE}, else {record_stream.LEGACY_FILE})")
+    plan = parser.add_mutually_exclusive_group(required=True)
+    plan.add_argument("--plan-json", metavar="PATH", help="`terraform show -json` output, or - for stdin")
+    plan.add_argument("--tfplan", metavar="PATH", help="saved plan file; runs terraform show -json on it")
+    parser.add_argument("--terraform", default=os.environ.get("TERRAFORM", "terraform"),
+                        help="terraform binary for --tfplan (default: $TERRAFORM or terraform on PATH)")
+    parser.add_argument("--from-cache", metavar="VPC_ID_OR_NAME_TAG",
+                        help="compare against the discovery snapshot cache instead of a JSON file (no AWS access)")
+    parser.add_argument("--cache-dir", default=discovery_cache.CACHE_DIR)
+    parser.add_argument("--region", help="restrict the cache lookup to this region")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    if args.from_cache:
+        records = discovery_cache.load_records(args.cache_dir, args.from_cache, args.region)
+        if records is None:
+            print(f"ERROR: no cached snapshot for '{args.from_cache}' in {args.cache_dir}.")
+            sys.exit(1)
+    else:
+        json_file = args.json_file or record_stream.default_records_file()
+        if not args.json:
+            print(f"-> Reading discovery data from: {json_file}")
+        records = record_stream.iter_records(json_file)
+    sys.exit(2 if plan_report(records, args.plan_json, args.tfplan, args.terraform, args.json) else 0)
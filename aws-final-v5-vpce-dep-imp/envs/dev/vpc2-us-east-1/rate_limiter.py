@@ -0,0 +1,178 @@
+import random
+import threading
+import time
+
+from api_metrics import THROTTLING_CODES, error_code
+
+# EC2 meters non-mutating (Describe*) calls per account and region with a
+# token bucket of roughly 100 burst / 20 per second refill.
+DEFAULT_RATE = 20.0
+DEFAULT_BURST = 100
+MIN_RATE = 1.0
+BACKOFF_WINDOW = 1.0
+
+DEFAULT_MAX_ATTEMPTS = 6
+BASE_DELAY = 0.25
+MAX_DELAY = 20.0
+
+TRANSIENT_CODES = {
+    "InternalError", "InternalFailure", "ServiceUnavailable", "Unavailable",
+    "RequestTimeout", "RequestTimeoutException", "RequestExpired",
+}
+TRANSIENT_EXCEPTIONS = {
+    "EndpointConnectionError", "ConnectionClosedError", "ReadTimeoutError", "ConnectTimeoutError",
+}
+
+
+class TokenBucket:
+    """Thread-safe token bucket whose refill rate halves on throttling and creeps back up on success."""
+
+    def __init__(self, rate=DEFAULT_RATE, burst=DEFAULT_BURST, min_rate=MIN_RATE):
+        self.max_rate = float(rate)
+        self.rate = float(rate)
+        self.min_rate = min(float(min_rate), self.max_rate)
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.last_backoff = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self):
+        """Blocks until a token is available and takes it; returns the seconds spent waiting."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill(time.monotonic())
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                delay = (1 - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+    def throttled(self):
+        """Halves the rate and drains the bucket; throttles landing within BACKOFF_WINDOW of the last cut count once."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.tokens = min(self.tokens, 0.0)
+            if now - self.last_backoff >= BACKOFF_WINDOW:
+                self.rate = max(self.min_rate, self.rate / 2)
+                self.last_backoff = now
+
+    def succeeded(self):
+        with self._lock:
+            if self.rate < self.max_rate:
+                self.rate = min(self.max_rate, self.rate + self.max_rate / 20)
+
+class RetryPolicy:
+    """Bounded retries with full-jitter exponential backoff for throttling and transient errors."""
+
+    def __init__(self, max_attempts=DEFAULT_MAX_ATTEMPTS, base_delay=BASE_DELAY, max_delay=MAX_DELAY):
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def retryable(self, exc):
+        code = error_code(exc)
+        return code in THROTTLING_CODES or code in TRANSIENT_CODES or type(exc).__name__ in TRANSIENT_EXCEPTIONS
+
+    def backoff(self, attempt):
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+
+_settings = {"rate": DEFAULT_RATE, "burst": DEFAULT_BURST, "max_attempts": DEFAULT_MAX_ATTEMPTS}
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def configure(rate=None, burst=None, max_attempts=None):
+    """Sets the process-wide defaults; limiters already handed out keep their rate."""
+    for key, value in (("rate", rate), ("burst", burst), ("max_attempts", max_attempts)):
+        if value is not None:
+            _settings[key] = value
+
+def limiter_for(region):
+    """The shared bucket for a region, so every client and thread in this process draws from one API budget."""
+    with _limiters_lock:
+        limiter = _limiters.get(region)
+        if limiter is None:
+            limiter = _limiters[region] = TokenBucket(_settings["rate"], _settings["burst"])
+        return limiter
+
+def default_policy():
+    return RetryPolicy(_settings["max_attempts"])
+
+
+class RateLimitedPaginator:
+    def __init__(self, client, paginator):
+        self._client = client
+        self._paginator = paginator
+
+    def paginate(self, **kwargs):
+        """Yields pages, taking a token per page; a failed page is retried from the last NextToken."""
+        token = None
+        pages = None
+
+        def next_page():
+            nonlocal pages
+            if pages is None:
+                resume = {'PaginationConfig': {'StartingToken': token}} if token else {}
+                pages = iter(self._paginator.paginate(**kwargs, **resume))
+            try:
+                return next(pages, None)
+            except Exception:
+                pages = None
+                raise
+
+        while True:
+            page = self._client.call(next_page)
+            if page is None:
+                return
+            token = page.get('NextToken')
+            yield page
+
+class RateLimitedClient:
+    """Wraps a boto3 client so every describe_* request and page goes through a shared TokenBucket and RetryPolicy.
+
+    Retries made here are added to the response's ResponseMetadata.RetryAttempts,
+    so instrumentation sees them like botocore's own.
+    """
+
+    def __init__(self, client, limiter, policy=None):
+        self._client = client
+        self.limiter = limiter
+        self.policy = policy or default_policy()
+
+    def call(self, request):
+        attempt = 0
+        while True:
+            self.limiter.acquire()
+            try:
+                response = request()
+            except Exception as e:
+                if not self.policy.retryable(e) or attempt + 1 >= self.policy.max_attempts:
+                    raise
+                if error_code(e) in THROTTLING_CODES:
+                    self.limiter.throttled()
+                time.sleep(self.policy.backoff(attempt))
+                attempt += 1
+                continue
+            self.limiter.succeeded()
+            if attempt and isinstance(response, dict):
+                metadata = response.setdefault('ResponseMetadata', {})
+                metadata['RetryAttempts'] = metadata.get('RetryAttempts', 0) + attempt
+            return response
+
+    def get_paginator(self, operation):
+        return RateLimitedPaginator(self, self._client.get_paginator(operation))
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        if not name.startswith('describe_') or not callable(attr):
+            return attr
+        return lambda **kwargs: self.call(lambda: attr(**kwargs))
@@ -0,0 +1,103 @@
+import glob
+import json
+import os
+
+RECORDS_FILE = "resources_for_import.ndjson"
+LEGACY_FILE = "resources_for_import.json"
+
+
+def default_records_file():
+    """The NDJSON file when discovery wrote one, otherwise the legacy pretty JSON file."""
+    return RECORDS_FILE if os.path.exists(RECORDS_FILE) or not os.path.exists(LEGACY_FILE) else LEGACY_FILE
+
+def records_file_in(directory):
+    """The records file discovery left in directory (NDJSON preferred), or None."""
+    for name in (RECORDS_FILE, LEGACY_FILE):
+        path = os.path.join(directory, name)
+        if os.path.isfile(path):
+            return path
+    return None
+
+def find_records_files(paths):
+    """Expands files, directories (searched recursively, as laid out by batch discovery) and glob
+    patterns into a sorted list of discovery files."""
+    found = set()
+    for pattern in paths:
+        for path in sorted(glob.glob(pattern, recursive=True)) or [pattern]:
+            if os.path.isdir(path):
+                for directory, _, _ in os.walk(path):
+                    records_file = records_file_in(directory)
+                    if records_file:
+                        found.add(records_file)
+            elif os.path.isfile(path):
+                found.add(path)
+    return sorted(found)
+
+def records_file_for(fmt):
+    return LEGACY_FILE if fmt == "json" else RECORDS_FILE
+
+def _write_stream(records, path, header, separator, footer, dump):
+    count = 0
+    tmp_path = path + ".tmp"
+    f = None
+    try:
+        for record in records:
+            if f is None:
+                f = open(tmp_path, "w")
+                f.write(header)
+            else:
+                f.write(separator)
+            f.write(dump(record))
+            count += 1
+        if f is not None:
+            f.write(footer)
+            f.close()
+            os.replace(tmp_path, path)
+    finally:
+        if f is not None and not f.closed:
+            f.close()
+            os.remove(tmp_path)
+    return count
+
+def write_records(records, path):
+    """Streams records to path as they are produced and returns how many were written.
+
+    .ndjson paths get one compact JSON object per line; anything else gets the
+    legacy array laid out like json.dump(..., indent=4). The file is only
+    replaced once at least one record arrived, so a failed discovery never
+    clobbers the previous output.
+    """
+    if path.endswith(".ndjson"):
+        return _write_stream(records, path, "", "", "",
+                             lambda record: json.dumps(record, separators=(',', ':')) + "\n")
+    return _write_stream(records, path, "[\n", ",\n", "\n]",
+                         lambda record: "    " + json.dumps(record, indent=4).replace("\n", "\n    "))
+
+def iter_records(path, types=None):
+    """Yields records from an NDJSON or legacy JSON file; NDJSON is read one line at a time.
+
+    With types, only records of those types are yielded, and NDJSON lines
+    that can't hold one of them are skipped without being decoded.
+    """
+    with open(path, 'r') as f:
+        first = f.read(1)
+        while first and first.isspace():
+            first = f.read(1)
+        if first == '[':
+            f.seek(0)
+            records = json.load(f)
+            yield from (r for r in records if r.get('type') in types) if types else records
+            return
+        f.seek(0)
+        markers = [f'"{t}"' for t in types] if types else None
+        for line_no, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            if markers and not any(marker in line for marker in markers):
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                raise ValueError(f"{path}:{line_no}: {e}") from None
+            if not types or record.get('type') in types:
+                yield record
@@ -0,0 +1,201 @@
+def parse_tags(tags):
+    """Returns {key: value} for an AWS Tags list; an already parsed dict is returned as is."""
+    if not tags:
+        return {}
+    if isinstance(tags, dict):
+        return tags
+    return {tag.get('Key'): tag.get('Value') for tag in tags}
+
+def _attrs(fields):
+    return tuple(attr for _, attr in fields)
+
+
+# One class per discovered resource type. FIELDS maps each metadata key of the
+# import record to the attribute holding it, in record order; metadata keys
+# whose value is None are left out of the record. Tags are parsed once into a
+# dict and kept for lookups, but are not written back into records.
+
+class Resource:
+    __slots__ = ("aws_id", "terraform_address", "tags")
+    TYPE = None
+    FIELDS = ()
+
+    def __init__(self, aws_id=None, terraform_address=None, tags=None, **fields):
+        self.aws_id = aws_id
+        self.terraform_address = terraform_address
+        self.tags = parse_tags(tags)
+        for attr in self.__slots__:
+            setattr(self, attr, fields.pop(attr, None))
+        if fields:
+            raise TypeError(f"{type(self).__name__} has no field(s) {', '.join(fields)}")
+
+    @classmethod
+    def from_record(cls, record):
+        metadata = record.get('metadata') or {}
+        return cls(record.get('aws_id'), record.get('terraform_address'), metadata.get('Tags'),
+                   **{attr: metadata.get(key) for key, attr in cls.FIELDS})
+
+    def to_record(self):
+        metadata = {}
+        for key, attr in self.FIELDS:
+            value = getattr(self, attr)
+            if value is not None:
+                metadata[key] = value
+        return {"type": self.TYPE, "aws_id": self.aws_id, "terraform_address": self.terraform_address, "metadata": metadata}
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.aws_id!r}, {self.terraform_address!r})"
+
+class Vpc(Resource):
+    TYPE = "aws_vpc"
+    FIELDS = (("Name", "name"), ("VpcId", "vpc_id"), ("CidrBlock", "cidr"), ("SecondaryCidrBlocks", "secondary_cidrs"),
+              ("Region", "region"), ("Environment", "environment"))
+    __slots__ = _attrs(FIELDS)
+
+class InternetGateway(Resource):
+    TYPE = "aws_internet_gateway"
+    FIELDS = (("VpcId", "vpc_id"),)
+    __slots__ = _attrs(FIELDS)
+
+class Subnet(Resource):
+    TYPE = "aws_subnet"
+    FIELDS = (("Name", "name"), ("AvailabilityZone", "az"), ("Type", "subnet_type"), ("CidrBlock", "cidr"))
+    __slots__ = _attrs(FIELDS)
+
+    @property
+    def az_key(self):
+        return self.az[-1:] if self.az else None
+
+class NatGateway(Resource):
+    TYPE = "aws_nat_gateway"
+    FIELDS = (("VpcId", "vpc_id"), ("SubnetId", "subnet_id"), ("AzKey", "az_key"))
+    __slots__ = _attrs(FIELDS)
+
+class Eip(Resource):
+    TYPE = "aws_eip"
+    FIELDS = (("AzKey", "az_key"),)
+    __slots__ = _attrs(FIELDS)
+
+class RouteTable(Resource):
+    TYPE = "aws_route_table"
+    FIELDS = (("Name", "name"), ("VpcId", "vpc_id"), ("RtType", "rt_type"), ("RtAzKey", "az_key"))
+    __slots__ = _attrs(FIELDS)
+
+class RouteTableAssociation(Resource):
+    TYPE = "aws_route_table_association"
+    FIELDS = (("SubnetId", "subnet_id"), ("RouteTableId", "route_table_id"), ("SubnetType", "subnet_type"))
+    __slots__ = _attrs(FIELDS)
+
+class Route(Resource):
+    TYPE = "aws_route"
+    FIELDS = (("RouteTableId", "route_table_id"), ("Destination", "destination"), ("TargetType", "target_type"),
+              ("TargetId", "target_id"), ("TargetAddress", "target_address"), ("RtType", "rt_type"), ("RtAzKey", "az_key"))
+    __slots__ = _attrs(FIELDS)
+
+class NetworkAcl(Resource):
+    TYPE = "aws_network_acl"
+    FIELDS = (("VpcId", "vpc_id"), ("NaclType", "nacl_type"), ("Entries", "entries"))
+    __slots__ = _attrs(FIELDS)
+
+class NetworkAclAssociation(Resource):
+    TYPE = "aws_network_acl_association"
+    FIELDS = (("SubnetId", "subnet_id"), ("NaclId", "nacl_id"), ("SubnetType", "subnet_type"))
+    __slots__ = _attrs(FIELDS)
+
+class VpcEndpoint(Resource):
+    TYPE = "aws_vpc_endpoint"
+    FIELDS = (("ServiceName", "service_name"), ("VpcId", "vpc_id"))
+    __slots__ = _attrs(FIELDS)
+
+class SecurityGroup(Resource):
+    TYPE = "aws_security_group"
+    FIELDS = (("GroupName", "name"), ("VpcId", "vpc_id"), ("IngressRules", "ingress"), ("EgressRules", "egress"))
+    __slots__ = _attrs(FIELDS)
+
+class DhcpOptions(Resource):
+    TYPE = "aws_vpc_dhcp_options"
+    FIELDS = (("DomainName", "domain_name"), ("DomainNameServers", "domain_name_servers"), ("NtpServers", "ntp_servers"),
+              ("NetbiosNameServers", "netbios_name_servers"), ("NetbiosNodeType", "netbios_node_type"))
+    __slots__ = _attrs(FIELDS)
+
+RESOURCE_TYPES = {cls.TYPE: cls for cls in (
+    Vpc, InternetGateway, Subnet, NatGateway, Eip, RouteTable, Route,
+    RouteTableAssociation, NetworkAcl, NetworkAclAssociation, VpcEndpoint,
+    SecurityGroup, DhcpOptions,
+)}
+
+
+def resource_from_record(record):
+    """Builds the model object for an import record, or None for a type the model doesn't know."""
+    cls = RESOURCE_TYPES.get(record.get('type'))
+    return cls.from_record(record) if cls else None
+
+class ResourceIndex:
+    """Discovered resources with O(1) lookups by AWS id, type, (type, az_key) and subnet association."""
+    __slots__ = ("by_id", "by_type", "by_type_az", "subnet_route_table", "subnet_nacl")
+
+    def __init__(self, resources=()):
+        self.by_id = {}
+        self.by_type = {}
+        self.by_type_az = {}
+        self.subnet_route_table = {}
+        self.subnet_nacl = {}
+        for resource in resources:
+            self.add(resource)
+
+    @classmethod
+    def from_records(cls, records):
+        index = cls()
+        for record in records:
+            index.add_record(record)
+        return index
+
+    def add(self, resource):
+        """Indexes a resource and returns it, so discovery can add and emit in one step."""
+        if resource.aws_id:
+            self.by_id[resource.aws_id] = resource
+        self.by_type.setdefault(resource.TYPE, []).append(resource)
+        az_key = getattr(resource, 'az_key', None)
+        if az_key is not None:
+            self.by_type_az.setdefault((resource.TYPE, az_key), []).append(resource)
+        if isinstance(resource, RouteTableAssociation) and resource.subnet_id:
+            self.subnet_route_table[resource.subnet_id] = resource.route_table_id
+        elif isinstance(resource, NetworkAclAssociation) and resource.subnet_id:
+            self.subnet_nacl[resource.subnet_id] = resource.nacl_id
+        return resource
+
+    def add_record(self, record):
+        resource = resource_from_record(record)
+        return self.add(resource) if resource is not None else None
+
+    def get(self, aws_id, resource_type=None):
+        resource = self.by_id.get(aws_id)
+        if resource is None or (resource_type and resource.TYPE != resource_type):
+            return None
+        return resource
+
+    def of_type(self, resource_type):
+        return self.by_type.get(resource_type, [])
+
+    def first(self, resource_type):
+        resources = self.by_type.get(resource_type)
+        return resources[0] if resources else None
+
+    def count(self, resource_type):
+        return len(self.by_type.get(resource_type, ()))
+
+    def in_az(self, resource_type, az_key):
+        return self.by_type_az.get((resource_type, az_key), [])
+
+    def route_table_for(self, subnet_id):
+        return self.by_id.get(self.subnet_route_table.get(subnet_id))
+
+    def nacl_for(self, subnet_id):
+        return self.by_id.get(self.subnet_nacl.get(subnet_id))
+
+    def __len__(self):
+        return sum(len(resources) for resources in self.by_type.values())
+
+    def __iter__(self):
+        for resources in self.by_type.values():
+            yield from resources
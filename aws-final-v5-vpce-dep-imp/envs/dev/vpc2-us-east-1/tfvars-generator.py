@@ -1,35 +1,44 @@
-import json
+import argparse
+import contextlib
+import glob
+import hashlib
+import io
 import sys
 import os
-import ipaddress
+import time
 
-JSON_FILE = "resources_for_import.json"
+import cidr_index
+import discovery_cache
+import record_stream
+import tfvars_validator
+from hcl_writer import write_hcl_assignment
+from resource_model import (
+    DhcpOptions, NatGateway, NetworkAcl, NetworkAclAssociation, ResourceIndex, Route, SecurityGroup, Subnet, Vpc,
+    VpcEndpoint,
+)
+
+JSON_FILE = record_stream.LEGACY_FILE
 OUTPUT_FILE = "dev-us-east-1.tfvars"
+BANNER = '#' * 66
+VPC_ENDPOINT_SERVICES = ("ssm", "ec2messages", "s3")
+# for DHCP options sets that don't set one; AWS recommends 2 (point-to-point)
+DEFAULT_NETBIOS_NODE_TYPE = 2
+TF_DIR = os.path.dirname(os.path.abspath(__file__))
 
 def get_cidr_size(cidr):
     try:
-        return ipaddress.ip_network(cidr).prefixlen
+        return cidr_index.parse_cidr(cidr)[3]
     except ValueError:
         return 32
 
-def get_tag_value(resource, key):
-    tags = resource.get('metadata', {}).get('Tags', {})
-    if isinstance(tags, list):
-        for tag in tags:
-            if tag.get('Key') == key:
-                return tag.get('Value')
-    elif isinstance(tags, dict):
-        return tags.get(key)
-    return None
-
 def determine_az_key(az_name):
     """Extracts the single-letter AZ key (e.g., 'us-east-1a' -> 'a')."""
     if not az_name:
         return 'z'
     return az_name[-1:]
 
-def determine_subnet_type(resource):
-    subnet_name = resource['metadata'].get('Name') or get_tag_value(resource, 'Name') or ''
+def determine_subnet_type(subnet):
+    subnet_name = subnet.name or subnet.tags.get('Name') or ''
     name = subnet_name.lower()
     
     if "public" in name or "internet" in name:
@@ -40,113 +49,203 @@ def determine_subnet_type(resource):
     
     return "private"
 
-def hcl_format_list(data, indent=0):
-    if not data:
-        return "[]"
-    
-    indent_str = ' ' * indent
-    lines = [indent_str + "["]
-    
-    for i, item in enumerate(data):
-        is_last = (i == len(data) - 1)
-        comma = "," if not is_last else ""
-        map_content = hcl_format_map(item, indent + 2) 
-        map_lines = map_content.split('\n')
-        map_lines[-1] += comma   
-        lines.append('\n' + '\n'.join(map_lines)) 
-        
-    lines.append('\n' + indent_str + "]")
-    return "".join(lines)
+def write_tfvars(out, header, sections):
+    """Streams the tfvars file: a header, then banner-titled sections of variable assignments."""
+    out.write(header)
+    for title, assignments in sections:
+        out.write(f'\n\n{BANNER}\n# {title}\n{BANNER}')
+        for name, value in assignments:
+            out.write('\n')
+            write_hcl_assignment(out, name, value)
 
+def validate_sections(sections):
+    """Checks the tfvars sections against this environment's variables.tf and the module invariants; returns the problems."""
+    values = {name: value for _, assignments in sections for name, value in assignments}
+    return tfvars_validator.validate_tfvars(values, tfvars_validator.load_variables(TF_DIR))
 
-def hcl_format_map(data, indent=0):
-    if not data:
-        return "{}"
+def load_resources(json_file=JSON_FILE):
+    """Returns an iterator over the discovery records; NDJSON files are streamed line by line."""
+    print(f"-> Reading discovery data from: {json_file}")
+    if not os.path.exists(json_file):
+        print(f"ERROR reading discovery file: {json_file} not found")
+        print("Using static data as JSON file was not found.")
+        return iter([
+            {"type": "aws_vpc", "metadata": {"VpcId": "vpc-012345", "CidrBlock": "10.0.0.0/16", "Region": "us-east-1", "Tags": [{"Key": "Name", "Value": "dev-us-east-1-vpc"}]}},
+            {"type": "aws_subnet", "metadata": {"CidrBlock": "10.65.2.0/28", "AvailabilityZone": "us-east-1a", "Tags": [{"Key": "Name", "Value": "nonroutable-a"}]}},
+            {"type": "aws_subnet", "metadata": {"CidrBlock": "10.65.0.0/26", "AvailabilityZone": "us-east-1a", "Tags": [{"Key": "Name", "Value": "private-a"}]}},
+            {"type": "aws_subnet", "metadata": {"CidrBlock": "10.65.1.0/28", "AvailabilityZone": "us-east-1a", "Tags": [{"Key": "Name", "Value": "public-a"}]}},
+            {"type": "aws_nat_gateway", "metadata": {}},
+            {"type": "aws_nat_gateway", "metadata": {}}
+        ])
+    return record_stream.iter_records(json_file)
+
+def add_subnet(subnets_var, subnet):
+    subnet_type = determine_subnet_type(subnet)
+    az_key = determine_az_key(subnet.az)
     
-    indent_str = ' ' * indent
-    inner_indent_str = ' ' * (indent + 2)
-    lines = [indent_str + "{"]
-    keys = sorted(data.keys())
-
-    for i, key in enumerate(keys):
-        value = data[key]
-        is_last = (i == len(keys) - 1)
-        comma = "," if not is_last else ""
+    if subnet_type in subnets_var:
+        if az_key in subnets_var[subnet_type]:
+            return
         
-        if isinstance(value, dict):
-            hcl_value = hcl_format_map(value, indent + 2)
-        elif isinstance(value, list) and value and isinstance(value[0], dict):
-            hcl_value = hcl_format_list(value, indent + 2)
-        elif isinstance(value, list):
-            list_items = ', '.join([f'"{x}"' if isinstance(x, str) else str(x) for x in value])
-            hcl_value = f'[{list_items}]'
-        elif isinstance(value, str):
-            hcl_value = f'"{value}"'
-        elif isinstance(value, bool):
-            hcl_value = str(value).lower()
-        elif isinstance(value, (int, float)):
-            hcl_value = str(value)
-        else:
-            lines.append(f'\n{inner_indent_str}# TODO: Unhandled type for {key}')
-            continue
-            
-        if hcl_value.startswith('{') or hcl_value.startswith('['):
-            hcl_lines = hcl_value.split('\n')
-            hcl_lines[-1] += comma
-            
-            lines.append(f'\n{inner_indent_str}{key} = {hcl_lines[0]}')
-            lines.append('\n'.join(hcl_lines[1:]))
-            
-        else:
-            lines.append(f'\n{inner_indent_str}{key} = {hcl_value}{comma}')
-            
-    lines.append('\n' + indent_str + "}")
-    return "".join(lines)
-
+        subnets_var[subnet_type][az_key] = {
+            "cidr": subnet.cidr,
+            "az": subnet.az,
+        }
 
+def build_subnets_var(index):
+    subnets_var = { "public": {}, "private": {}, "nonroutable": {} }
+    for subnet in index.of_type(Subnet.TYPE):
+        add_subnet(subnets_var, subnet)
+    return {k: v for k, v in subnets_var.items() if v}
 
-def generate_tfvars_from_json():
-    print(f"-> Reading discovery data from: {JSON_FILE}")
+def is_ipv4_cidr(cidr):
     try:
-        with open(JSON_FILE, 'r') as f:
-            resources = json.load(f)
-    except Exception as e:
-        print(f"ERROR reading or decoding JSON file: {e}")
-        if not os.path.exists(JSON_FILE):
-             print("Using static data as JSON file was not found.")
-             resources = [
-                {"type": "aws_vpc", "metadata": {"VpcId": "vpc-012345", "CidrBlock": "10.0.0.0/16", "Region": "us-east-1", "Tags": [{"Key": "Name", "Value": "dev-us-east-1-vpc"}]}},
-                {"type": "aws_subnet", "metadata": {"CidrBlock": "10.65.2.0/28", "AvailabilityZone": "us-east-1a", "Tags": [{"Key": "Name", "Value": "nonroutable-a"}]}},
-                {"type": "aws_subnet", "metadata": {"CidrBlock": "10.65.0.0/26", "AvailabilityZone": "us-east-1a", "Tags": [{"Key": "Name", "Value": "private-a"}]}},
-                {"type": "aws_subnet", "metadata": {"CidrBlock": "10.65.1.0/28", "AvailabilityZone": "us-east-1a", "Tags": [{"Key": "Name", "Value": "public-a"}]}},
-                {"type": "aws_nat_gateway", "metadata": {}},
-                {"type": "aws_nat_gateway", "metadata": {}}
-             ]
-        else:
-            sys.exit(1)
+        return cidr_index.parse_cidr(cidr)[0] == 4
+    except (ValueError, AttributeError):
+        return False
 
+def compact_rules(rules, group_fields):
+    """Merges rules that differ only in their CIDR.
 
-    # Filter Resources ---
-    vpc_data = next((r for r in resources if r['type'] == 'aws_vpc'), None)
-    subnets = [r for r in resources if r['type'] == 'aws_subnet']
-    nat_gateways = [r for r in resources if r['type'] == 'aws_nat_gateway']
-    
-    if not vpc_data:
-        print("ERROR: Could not find 'aws_vpc' resource in the JSON file. Cannot proceed.")
-        sys.exit(1)
+    Within each group of equal group_fields values, overlapping and adjacent
+    CIDRs are collapsed into the fewest covering blocks and duplicates drop
+    out. Each resulting rule keeps the other fields of the earliest rule it
+    covers, and rules come out in the order of those earliest rules.
+    """
+    groups = {}
+    for order, rule in enumerate(rules):
+        _, first, last, _ = cidr_index.parse_cidr(rule["cidr"])
+        groups.setdefault(tuple(rule[field] for field in group_fields), []).append((first, -last, order, rule))
+
+    compacted = []
+    for members in groups.values():
+        members.sort(key=lambda member: member[:3])
+        i = 0
+        for block in cidr_index.collapse_cidrs(member[3]["cidr"] for member in members):
+            last = cidr_index.parse_cidr(block)[2]
+            covered = []
+            while i < len(members) and members[i][0] <= last:
+                covered.append(members[i])
+                i += 1
+            _, _, order, rule = min(covered, key=lambda member: member[2])
+            compacted.append((order, dict(rule, cidr=block)))
+    compacted.sort(key=lambda item: item[0])
+    return [rule for _, rule in compacted]
+
+def build_sg_rules_var(index):
+    """sg_rules from the discovered security group, or None when the discovery data has none."""
+    group = index.first(SecurityGroup.TYPE)
+    if group is None:
+        return None
 
-    vpc_meta = vpc_data['metadata']
-    vpc_cidr = vpc_meta.get('CidrBlock', '10.0.0.0/16')
-    vpc_name = vpc_meta.get('Name') or get_tag_value(vpc_data, 'Name') or vpc_meta.get('VpcId', 'imported-vpc')
-    region = vpc_meta.get('Region', 'us-east-1')
+    sg_rules = {}
+    skipped = 0
+    for direction, rules in (("inbound", group.ingress or []), ("outbound", group.egress or [])):
+        usable = [rule for rule in rules if is_ipv4_cidr(rule.get("cidr"))]
+        skipped += len(rules) - len(usable)
+        compacted = compact_rules([
+            {"rule_no": 0, "description": rule.get("description", ""), "protocol": str(rule["protocol"]),
+             "from": rule["from"], "to": rule["to"], "cidr": rule["cidr"]}
+            for rule in usable
+        ], ("protocol", "from", "to"))
+        for i, rule in enumerate(compacted):
+            rule["rule_no"] = 100 + 10 * i
+        sg_rules[direction] = compacted
+
+    if skipped:
+        print(f"Warning: left out {skipped} security group rule(s) whose source isn't an IPv4 CIDR; sg_rules can't express them.")
+    return sg_rules
+
+def build_nacl_rules_var(index):
+    """nacl_rules from the discovered NACL entries, or None when the discovery data has none.
+
+    Each tier takes the entries of the NACL its subnets are associated with;
+    private falls back to the nonroutable subnets' NACL. The nacls module
+    writes every rule as allow, so a NACL with deny entries raises
+    ValueError: an allow-only list would open what it denies.
+    """
+    if not any(nacl.entries is not None for nacl in index.of_type(NetworkAcl.TYPE)):
+        return None
+    serving = {}
+    for assoc in index.of_type(NetworkAclAssociation.TYPE):
+        serving.setdefault(assoc.subnet_type, assoc.nacl_id)
+
+    nacl_rules = {}
+    skipped = 0
+    for tier, nacl_id in (("public", serving.get("public")), ("private", serving.get("private") or serving.get("nonroutable"))):
+        nacl = index.get(nacl_id, NetworkAcl.TYPE) if nacl_id else None
+        entries = (nacl.entries or []) if nacl else []
+        denies = [entry["rule_no"] for entry in entries if entry.get("action") != "allow"]
+        if denies:
+            raise ValueError(f"NACL {nacl.aws_id} ({tier}) has deny entries (rule {', '.join(map(str, denies))}) the "
+                             f"allow-only nacl_rules can't express; not writing rules that would open what it denies.")
+        usable = [entry for entry in entries if is_ipv4_cidr(entry.get("cidr"))]
+        skipped += len(entries) - len(usable)
+        compacted = compact_rules([
+            {"rule_no": entry["rule_no"], "protocol": str(entry["protocol"]), "from": entry["from"], "to": entry["to"],
+             "cidr": entry["cidr"], "egress": entry["egress"]}
+            for entry in usable
+        ], ("egress", "protocol", "from", "to"))
+        nacl_rules[tier] = sorted(compacted, key=lambda rule: (rule["egress"], rule["rule_no"]))
+
+    if skipped:
+        print(f"Warning: left out {skipped} NACL entries that are not IPv4; nacl_rules can't express them.")
+    return nacl_rules
+
+def default_domain_name(region):
+    return "ec2.internal" if region == "us-east-1" else f"{region}.compute.internal"
+
+def build_dhcp_var(index, region):
+    """dhcp from the DHCP options set associated with the VPC, or None when the discovery data has none.
+
+    An options set without a domain name or NetBIOS node type gets the
+    region's default domain name and node type 2, since variables.tf
+    requires both.
+    """
+    dhcp = index.first(DhcpOptions.TYPE)
+    if dhcp is None:
+        return None
+    return {
+        "domain_name": dhcp.domain_name or default_domain_name(region),
+        "domain_name_servers": dhcp.domain_name_servers or [],
+        "ntp_servers": dhcp.ntp_servers or [],
+        "netbios_name_servers": dhcp.netbios_name_servers or [],
+        "netbios_node_type": dhcp.netbios_node_type or DEFAULT_NETBIOS_NODE_TYPE,
+    }
+
+def build_vpc_endpoints_var(index):
+    services = {ep.service_name.rsplit('.', 1)[-1] for ep in index.of_type(VpcEndpoint.TYPE) if ep.service_name}
+    return {service: service in services for service in VPC_ENDPOINT_SERVICES}
+
+def build_tfvars(index, source=None):
+    """Returns (file name, header, sections) of the tfvars for one VPC's ResourceIndex.
+
+    The file name is <Environment tag>-<region>.tfvars. Raises ValueError
+    when there is no VPC record, it doesn't say which region it is in, or a
+    NACL has deny entries (see build_nacl_rules_var).
+    """
+    vpc = index.first(Vpc.TYPE)
+    if not vpc:
+        raise ValueError("Could not find 'aws_vpc' resource in the JSON file. Cannot proceed.")
+    if not vpc.region:
+        raise ValueError(f"the aws_vpc record of {vpc.vpc_id or vpc.aws_id} has no Region; rediscover it to record one.")
+
+    # subnets outside the VPC CIDRs or overlapping each other would only fail at plan time
+    cidrs, _ = cidr_index.index_resources(index, source)
+    for problem in cidr_index.find_problems(cidrs):
+        print(f"Warning: {problem}")
+
+    vpc_cidr = vpc.cidr or '10.0.0.0/16'
+    vpc_name = vpc.name or vpc.tags.get('Name') or vpc.vpc_id or 'imported-vpc'
+    region = vpc.region
     
     prefix_parts = vpc_name.split('-')
     name_prefix = '-'.join(prefix_parts[:-1]) if len(prefix_parts) > 1 and not vpc_name.startswith('vpc-') else vpc_name
     
     # vpc variable
-    vpc_tags_meta = vpc_meta.get('Tags', {})
+    vpc_tags_meta = vpc.tags
     vpc_tags_var = {
-        "Environment": vpc_tags_meta.get('Environment', 'dev'),
+        "Environment": vpc.environment or vpc_tags_meta.get('Environment', 'dev'),
         "Owner": vpc_tags_meta.get('Owner', 'imported-user'), 
         "Project": vpc_tags_meta.get('Project', name_prefix),
     }
@@ -155,46 +254,33 @@ def generate_tfvars_from_json():
         "tags": vpc_tags_var,
     }
 
-    subnets_var = { "public": {}, "private": {}, "nonroutable": {} }
-    
-    for subnet in subnets:
-        subnet_meta = subnet['metadata']
-        subnet_cidr = subnet_meta.get('CidrBlock')
-        subnet_type = determine_subnet_type(subnet)
-        
-        az = subnet_meta.get('AvailabilityZone')
-        az_key = determine_az_key(az)
-        
-        if subnet_type in subnets_var:
-            if az_key in subnets_var[subnet_type]:
-                continue
-            
-            subnets_var[subnet_type][az_key] = {
-                "cidr": subnet_cidr,
-                "az": az,
-            }
-        
-    subnets_var = {k: v for k, v in subnets_var.items() if v}
+    subnets_var = build_subnets_var(index)
 
 
     # nat variable
+    nat_count = index.count(NatGateway.TYPE)
     nat_var = {
-        "type": "per_az" if len(nat_gateways) > 1 else "single",
+        "type": "per_az" if nat_count > 1 else "single",
     }
-    if not nat_gateways:
-        nat_var['type'] = "none"
+    if not nat_count:
+        # variables.tf only knows per_az and single; the gateways module has no way to leave NAT gateways out
+        print("Warning: the VPC has no NAT gateways, but the gateways module creates one per AZ; "
+              "terraform plan will show them as new.")
 
 
     # route_tables
     private_keys = sorted(subnets_var.get('private', {}).keys())
     nonroutable_keys = sorted(subnets_var.get('nonroutable', {}).keys())
     
+    # the route-tables module only creates the public table's IGW routes, keyed by CIDR
+    public_routes = [{"cidr": cidr, "target": "igw"} for cidr in dict.fromkeys(
+        route.destination for route in index.of_type(Route.TYPE) if route.rt_type == "public" and route.target_type == "igw")]
     private_routes = [{ "cidr": "0.0.0.0/0", "target": "nat", "az_key": k } for k in private_keys]
     nonroutable_routes = [{ "cidr": "10.0.0.0/8", "target": "nat", "az_key": k } for k in nonroutable_keys]
     
     route_tables_var = {
         "public": {
-            "routes": [
+            "routes": public_routes or [
                 {"cidr": "0.0.0.0/0", "target": "igw"}
             ]
         },
@@ -206,45 +292,47 @@ def generate_tfvars_from_json():
         }
     }
 
-    # dhcp_enabled and dhcp
+    # dhcp_enabled and dhcp (static defaults for discovery data without them)
     dhcp_enabled = True
 
-    dhcp_var = {
-        "domain_name": "example.internal",
-        "domain_name_servers": ["10.0.0.2"],
-        "ntp_servers": ["10.0.0.10"],
-        "netbios_name_servers": ["10.0.0.20"],
-        "netbios_node_type": 2
-    }
+    dhcp_var = build_dhcp_var(index, region)
+    if dhcp_var is None:
+        dhcp_var = {
+            "domain_name": "example.internal",
+            "domain_name_servers": ["10.0.0.2"],
+            "ntp_servers": ["10.0.0.10"],
+            "netbios_name_servers": ["10.0.0.20"],
+            "netbios_node_type": 2
+        }
     
-    # sg_rules and nacl_rules
-    sg_rules_var = {
-        "inbound": [
-            {"rule_no": 100, "description": "Allow HTTPS", "protocol": "tcp", "from": 443, "to": 443, "cidr": "0.0.0.0/0"},
-            {"rule_no": 110, "description": "Allow SSH internal", "protocol": "tcp", "from": 22, "to": 22, "cidr": "10.0.0.0/8"}
-        ],
-        "outbound": [
-            {"rule_no": 100, "description": "Allow All outbound", "protocol": "-1", "from": 0, "to": 0, "cidr": "0.0.0.0/0"}
-        ]
-    }
+    # sg_rules and nacl_rules, compacted (static defaults for discovery data without them)
+    sg_rules_var = build_sg_rules_var(index)
+    if sg_rules_var is None:
+        sg_rules_var = {
+            "inbound": [
+                {"rule_no": 100, "description": "Allow HTTPS", "protocol": "tcp", "from": 443, "to": 443, "cidr": "0.0.0.0/0"},
+                {"rule_no": 110, "description": "Allow SSH internal", "protocol": "tcp", "from": 22, "to": 22, "cidr": "10.0.0.0/8"}
+            ],
+            "outbound": [
+                {"rule_no": 100, "description": "Allow All outbound", "protocol": "-1", "from": 0, "to": 0, "cidr": "0.0.0.0/0"}
+            ]
+        }
 
-    nacl_rules_var = {
-        "public": [
-            {"rule_no": 100, "protocol": "6", "from": 443, "to": 443, "cidr": "0.0.0.0/0", "egress": True},
-            {"rule_no": 110, "protocol": "6", "from": 1024, "to": 65535, "cidr": "0.0.0.0/0", "egress": False}
-        ],
-        "private": [
-            {"rule_no": 100, "protocol": "6", "from": 443, "to": 443, "cidr": "10.0.0.0/8", "egress": False},
-            {"rule_no": 110, "protocol": "6", "from": 0, "to": 65535, "cidr": "10.0.0.0/8", "egress": True}
-        ]
-    }
+    nacl_rules_var = build_nacl_rules_var(index)
+    if nacl_rules_var is None:
+        nacl_rules_var = {
+            "public": [
+                {"rule_no": 100, "protocol": "6", "from": 443, "to": 443, "cidr": "0.0.0.0/0", "egress": True},
+                {"rule_no": 110, "protocol": "6", "from": 1024, "to": 65535, "cidr": "0.0.0.0/0", "egress": False}
+            ],
+            "private": [
+                {"rule_no": 100, "protocol": "6", "from": 443, "to": 443, "cidr": "10.0.0.0/8", "egress": False},
+                {"rule_no": 110, "protocol": "6", "from": 0, "to": 65535, "cidr": "10.0.0.0/8", "egress": True}
+            ]
+        }
     
-    #  vpc_endpoints
-    vpc_endpoints_var = {
-        "ssm": True,
-        "ec2messages": True,
-        "s3": True,
-    }
+    #  vpc_endpoints, from the discovered endpoint services
+    vpc_endpoints_var = build_vpc_endpoints_var(index)
 
     # tags
     global_tags_var = {
@@ -255,72 +343,171 @@ def generate_tfvars_from_json():
 
 
     # Generate Output ---
-    hcl_content = [
-        f'# Generated from {JSON_FILE} by {os.path.basename(__file__)}',
-        '',
-        '##################################################################',
-        '# ENVIRONMENT METADATA',
-        '##################################################################',
-        f'name_prefix = "{name_prefix}"',
-        f'region = "{region}"',
-        '',
-        '##################################################################',
-        '# VPC CONFIGURATION',
-        '##################################################################',
-        f'vpc = {hcl_format_map(vpc_var, 0)}',
-        '',
-        '##################################################################',
-        '# SUBNET CONFIGURATION',
-        '##################################################################',
-        f'subnets = {hcl_format_map(subnets_var, 0)}',
-        '',
-        '##################################################################',
-        '# NAT CONFIGURATION',
-        '##################################################################',
-        f'nat = {hcl_format_map(nat_var, 0)}',
-        '',
-        '##################################################################',
-        '# ROUTE TABLE ',
-        '##################################################################',
-        f'route_tables = {hcl_format_map(route_tables_var, 0)}',
-        '',
-        '##################################################################',
-        '# DHCP OPTIONS',
-        '##################################################################',
-        f'dhcp_enabled = {str(dhcp_enabled).lower()}',
-        f'dhcp = {hcl_format_map(dhcp_var, 0)}',
-        '',
-        '##################################################################',
-        '# SG RULES',
-        '##################################################################',
-        f'sg_rules = {hcl_format_map(sg_rules_var, 0)}',
-        '',
-        '##################################################################',
-        '# NACL RULES',
-        '##################################################################',
-        f'nacl_rules = {hcl_format_map(nacl_rules_var, 0)}',
-        '',
-        '##################################################################',
-        '# VPC ENDPOINTS',
-        '##################################################################',
-        f'vpc_endpoints = {hcl_format_map(vpc_endpoints_var, 0)}',
-        '',
-        '##################################################################',
-        '# GLOBAL TAGS',
-        '##################################################################',
-        f'tags = {hcl_format_map(global_tags_var, 0)}',
+    header = f'# Generated from {source} by {os.path.basename(__file__)}'
+    sections = [
+        ("ENVIRONMENT METADATA", [("name_prefix", name_prefix), ("region", region)]),
+        ("VPC CONFIGURATION", [("vpc", vpc_var)]),
+        ("SUBNET CONFIGURATION", [("subnets", subnets_var)]),
+        ("NAT CONFIGURATION", [("nat", nat_var)]),
+        ("ROUTE TABLE ", [("route_tables", route_tables_var)]),
+        ("DHCP OPTIONS", [("dhcp_enabled", dhcp_enabled), ("dhcp", dhcp_var)]),
+        ("SG RULES", [("sg_rules", sg_rules_var)]),
+        ("NACL RULES", [("nacl_rules", nacl_rules_var)]),
+        ("VPC ENDPOINTS", [("vpc_endpoints", vpc_endpoints_var)]),
+        ("GLOBAL TAGS", [("tags", global_tags_var)]),
     ]
+    return f"{vpc_tags_var['Environment']}-{region}.tfvars", header, sections
+
+def generate_tfvars_from_json(resources=None, source=None):
+    if resources is None:
+        source = source or record_stream.default_records_file()
+        resources = load_resources(source)
+
+    # Index Resources ---
+    try:
+        index = ResourceIndex.from_records(resources)
+    except Exception as e:
+        print(f"ERROR reading or decoding JSON file: {e}")
+        sys.exit(1)
+
+    try:
+        _, header, sections = build_tfvars(index, source)
+    except ValueError as e:
+        print(f"ERROR: {e}")
+        sys.exit(1)
 
     try:
         with open(OUTPUT_FILE, 'w') as f:
-            f.write('\n'.join(hcl_content))
+            write_tfvars(f, header, sections)
         
         print("\n--- TFVARS GENERATION COMPLETE ---")
         print(f"Successfully generated tfvars file: '{OUTPUT_FILE}'")
         
     except Exception as e:
         print(f"ERROR writing file: {e}")
+        return
+
+    problems = validate_sections(sections)
+    if problems:
+        print(f"\n--- TFVARS VALIDATION FAILED ({len(problems)} problems) ---")
+        for problem in problems:
+            print(problem)
+        print("terraform plan would reject this file; fix the discovery data or the generator before running it.")
+        sys.exit(1)
+
+def file_digest(path):
+    """SHA-256 of a file's content, or None when it doesn't exist."""
+    try:
+        with open(path, 'rb') as f:
+            return hashlib.sha256(f.read()).digest()
+    except FileNotFoundError:
+        return None
+
+def generate_tfvars_file(records_file, out_dir):
+    """Batch worker: writes the tfvars for one discovery file into out_dir unless the content is unchanged.
+
+    Returns a result dict; warnings are collected rather than printed, so
+    output from parallel workers doesn't interleave.
+    """
+    result = {"file": records_file, "output": None, "status": "error", "warnings": [], "problems": [], "seconds": 0.0,
+              "error": None}
+    start = time.perf_counter()
+    captured = io.StringIO()
+    try:
+        with contextlib.redirect_stdout(captured):
+            index = ResourceIndex.from_records(record_stream.iter_records(records_file))
+            name, header, sections = build_tfvars(index, records_file)
+        result["problems"] = validate_sections(sections)
+        out = io.StringIO()
+        write_tfvars(out, header, sections)
+        content = out.getvalue().encode()
+
+        path = result["output"] = os.path.join(out_dir, name)
+        previous = file_digest(path)
+        if previous == hashlib.sha256(content).digest():
+            result["status"] = "unchanged"
+        else:
+            os.makedirs(out_dir, exist_ok=True)
+            with open(path + ".tmp", 'wb') as f:
+                f.write(content)
+            os.replace(path + ".tmp", path)
+            result["status"] = "created" if previous is None else "updated"
+    except Exception as e:
+        result["error"] = str(e)
+    result["warnings"] = [line for line in captured.getvalue().splitlines() if line.startswith("Warning:")]
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+def batch_root(paths):
+    """The directory the batch paths share, ignoring glob wildcards; files count as their directory."""
+    roots = []
+    for path in paths:
+        parts = os.path.abspath(path).split(os.sep)
+        fixed = os.sep.join(parts[:next((i for i, part in enumerate(parts) if glob.has_magic(part)), len(parts))])
+        roots.append(fixed if os.path.isdir(fixed) else os.path.dirname(fixed))
+    return os.path.commonpath(roots)
+
+def run_batch(paths, output_dir=None, workers=None):
+    """Generates tfvars for every discovery file under paths (files, directories or globs) in a process pool.
+
+    Each tfvars goes next to its discovery file, or with output_dir to the
+    same relative directory under output_dir.
+    """
+    files = record_stream.find_records_files(paths)
+    if not files:
+        return []
+    root = batch_root(paths)
+    out_dirs = [os.path.join(output_dir, os.path.relpath(os.path.dirname(os.path.abspath(f)), root)) if output_dir
+                else os.path.dirname(f) for f in files]
+
+    workers = min(workers or os.cpu_count() or 1, len(files))
+    if workers == 1:
+        return list(map(generate_tfvars_file, files, out_dirs))
+    # imported here so single-VPC runs don't load multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(generate_tfvars_file, files, out_dirs, chunksize=max(1, len(files) // (workers * 4))))
+
+def print_batch_summary(results):
+    for r in results:
+        if r['warnings'] or r['problems']:
+            print(f"-> {r['file']}")
+            print('\n'.join(r['warnings'] + [f"Invalid: {problem}" for problem in r['problems']]))
+    print("\n--- BATCH TFVARS SUMMARY ---")
+    print(f"{'DISCOVERY FILE':<60}{'STATUS':<11}{'WARNINGS':>9}{'INVALID':>8}{'SECONDS':>9}  OUTPUT")
+    for r in results:
+        status = f"ERROR: {r['error']}" if r['error'] else r['output']
+        print(f"{r['file'][-59:]:<60}{r['status']:<11}{len(r['warnings']):>9}{len(r['problems']):>8}{r['seconds']:>9.2f}  {status}")
+    counts = {status: sum(1 for r in results if r['status'] == status) for status in ("created", "updated", "unchanged", "error")}
+    invalid = sum(1 for r in results if r['problems'])
+    print(f"{len(results)} file(s): " + ", ".join(f"{count} {status}" for status, count in counts.items())
+          + (f"; {invalid} failed validation." if invalid else "."))
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=f"Generate {OUTPUT_FILE} from discovery records")
+    parser.add_argument("--from-cache", metavar="VPC_ID_OR_NAME_TAG",
+                        help="read records from the discovery snapshot cache instead of the discovery file (no AWS access)")
+    parser.add_argument("--cache-dir", default=discovery_cache.CACHE_DIR)
+    parser.add_argument("--region", help="restrict the cache lookup to this region")
+    parser.add_argument("--batch", nargs="+", metavar="PATH",
+                        help="batch mode: discovery files, directories (e.g. batch discovery's output) or globs")
+    parser.add_argument("--output-dir", help="batch mode: mirror the discovery directories here instead of writing next to each file")
+    parser.add_argument("--workers", type=int, default=None, help="batch mode: worker processes (default: CPU count)")
+    args = parser.parse_args()
+
+    if args.batch:
+        results = run_batch(args.batch, args.output_dir, args.workers)
+        if not results:
+            print(f"ERROR: no discovery files found in {' '.join(args.batch)}.")
+            sys.exit(1)
+        print_batch_summary(results)
+        sys.exit(1 if any(r['error'] or r['problems'] for r in results) else 0)
 
-    generate_tfvars_from_json()
+    if args.from_cache:
+        resources = discovery_cache.load_records(args.cache_dir, args.from_cache, args.region)
+        if resources is None:
+            print(f"ERROR: no cached snapshot for '{args.from_cache}' in {args.cache_dir}.")
+            sys.exit(1)
+        generate_tfvars_from_json(resources, f"{args.cache_dir} snapshot of {args.from_cache}")
+    else:
+        generate_tfvars_from_json()
@@ -0,0 +1,349 @@
+import json
+import os
+import re
+import threading
+
+import address_catalog
+import discovery_cache
+import hcl_writer
+
+VARIABLES_FILE = "variables.tf"
+CACHE_FILE = "variable-types.json"
+CACHE_VERSION = 2
+
+PRIMITIVE_TYPES = ("string", "number", "bool", "any")
+COLLECTION_TYPES = ("list", "set", "map")
+LITERALS = {"true": True, "false": False, "null": None}
+# an interpolation or directive that isn't escaped as $${ / %%{
+TEMPLATE_RE = re.compile(r'(?<![$%])[$%]\{')
+
+# Module invariants: what the modules index or assume rather than what variables.tf declares.
+NAT_TYPES = ("per_az", "single")
+SUBNET_TYPES = ("public", "private", "nonroutable")
+SUBNET_MODULES = "the subnets, gateways, route-tables and nacls modules"
+# route table -> (target its routes must use, subnet type holding the NAT gateway for an az_key)
+ROUTE_TARGETS = {"public": ("igw", None), "private": ("nat", "public"), "nonroutable": ("nat", "nonroutable")}
+
+# Parsed type constraints are plain JSON so they can be cached: "string",
+# "number", "bool" or "any"; ["list" | "set" | "map", element type];
+# ["tuple", [types]]; ["object", {attribute: [type, optional]}].
+
+
+class _Tokens:
+    """A cursor over address_catalog.tokens() with newlines dropped."""
+    __slots__ = ("items", "i")
+
+    def __init__(self, text):
+        self.items = [t for t in address_catalog.tokens(text) if t[0] != 'newline']
+        self.i = 0
+
+    def peek(self):
+        return self.items[self.i] if self.i < len(self.items) else (None, None)
+
+    def next(self):
+        token = self.peek()
+        self.i += 1
+        return token
+
+    def expect(self, kind):
+        token = self.next()
+        if token[0] != kind:
+            raise ValueError(f"expected '{kind}', found {token[1]!r}")
+        return token
+
+    def skip(self, kind):
+        if self.peek()[0] == kind:
+            self.i += 1
+            return True
+        return False
+
+def parse_type(tokens):
+    kind, name = tokens.next()
+    if kind != 'ident':
+        raise ValueError(f"expected a type, found {name!r}")
+    if name in PRIMITIVE_TYPES:
+        return name
+    tokens.expect('(')
+    if name in COLLECTION_TYPES:
+        parsed = [name, parse_type(tokens)]
+    elif name == "tuple":
+        tokens.expect('[')
+        elements = []
+        while not tokens.skip(']'):
+            elements.append(parse_type(tokens))
+            tokens.skip(',')
+        parsed = ["tuple", elements]
+    elif name == "object":
+        tokens.expect('{')
+        attributes = {}
+        while not tokens.skip('}'):
+            _, attribute = tokens.expect('ident')
+            tokens.expect('=')
+            optional = tokens.peek() == ('ident', 'optional')
+            if optional:
+                tokens.next()
+                tokens.expect('(')
+                attributes[attribute] = [parse_type(tokens), True]
+                if tokens.skip(','):
+                    parse_value(tokens)
+                tokens.expect(')')
+            else:
+                attributes[attribute] = [parse_type(tokens), False]
+            tokens.skip(',')
+        parsed = ["object", attributes]
+    else:
+        raise ValueError(f"unknown type {name!r}")
+    tokens.expect(')')
+    return parsed
+
+def parse_value(tokens):
+    """Reads a literal value: strings, numbers, true/false/null, lists and objects."""
+    kind, value = tokens.next()
+    if kind == 'string':
+        return value
+    if kind == 'number':
+        return float(value) if any(c in value for c in '.eE') else int(value)
+    if kind == 'ident' and value in LITERALS:
+        return LITERALS[value]
+    if kind == '[':
+        items = []
+        while not tokens.skip(']'):
+            items.append(parse_value(tokens))
+            tokens.skip(',')
+        return items
+    if kind == '{':
+        items = {}
+        while not tokens.skip('}'):
+            key_kind, key = tokens.next()
+            if key_kind not in ('ident', 'string'):
+                raise ValueError(f"expected an object key, found {key!r}")
+            tokens.expect('=')
+            items[key] = parse_value(tokens)
+            tokens.skip(',')
+        return items
+    raise ValueError(f"not a literal value: {value!r}")
+
+def parse_variables(text):
+    """Returns {name: {"type": parsed type, "required": bool, "default": value, "nullable": bool}} for the variable blocks in text.
+
+    A variable without a type constraint is "any"; a default that isn't a
+    literal is recorded as None.
+    """
+    tokens = _Tokens(text)
+    variables = {}
+    depth = 0
+    current = None
+    while tokens.peek()[0] is not None:
+        kind, value = tokens.next()
+        if kind in '{([':
+            depth += 1
+        elif kind in '})]':
+            depth -= 1
+        elif depth == 0 and (kind, value) == ('ident', 'variable') and tokens.peek()[0] == 'string':
+            current = variables[tokens.next()[1]] = {"type": "any", "required": True, "default": None, "nullable": True}
+        elif depth == 1 and current is not None and kind == 'ident' and tokens.peek()[0] == '=':
+            if value == "type":
+                tokens.next()
+                current["type"] = parse_type(tokens)
+            elif value == "default":
+                tokens.next()
+                current["required"] = False
+                try:
+                    current["default"] = parse_value(tokens)
+                except ValueError:
+                    current["default"] = None
+            elif value == "nullable":
+                tokens.next()
+                current["nullable"] = tokens.peek() != ('ident', 'false')
+    return variables
+
+
+_variables = {}
+_variables_lock = threading.Lock()
+
+
+def load_variables(tf_dir, cache_dir=discovery_cache.CACHE_DIR):
+    """The parsed variables.tf of tf_dir, or None when there is none.
+
+    Parsed once per process, and reused across runs from
+    <tf_dir>/<cache_dir>/variable-types.json until variables.tf changes.
+    """
+    path = os.path.join(os.path.abspath(tf_dir), VARIABLES_FILE)
+    with _variables_lock:
+        if path in _variables:
+            return _variables[path]
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            _variables[path] = None
+            return None
+        cache_path = os.path.join(os.path.dirname(path), cache_dir, CACHE_FILE)
+        try:
+            with open(cache_path) as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            cached = {}
+        if cached.get("version") == CACHE_VERSION and cached.get("mtime") == mtime:
+            variables = cached["variables"]
+        else:
+            with open(path) as f:
+                variables = parse_variables(f.read())
+            try:
+                os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+                with open(cache_path + ".tmp", 'w') as f:
+                    json.dump({"version": CACHE_VERSION, "mtime": mtime, "variables": variables}, f)
+                os.replace(cache_path + ".tmp", cache_path)
+            except OSError:
+                pass
+        _variables[path] = variables
+        return variables
+
+
+def unescaped(text):
+    """Whether hcl_writer's literal for text would read back as anything but one string."""
+    if not hcl_writer.NEEDS_ESCAPE_RE.search(text):
+        return False
+    literal = hcl_writer.hcl_string(text)
+    if TEMPLATE_RE.search(literal):
+        return True
+    return list(address_catalog.tokens(literal)) != [('string', literal[1:-1])]
+
+def is_number(value):
+    if isinstance(value, str):
+        try:
+            float(value)
+        except ValueError:
+            return False
+        return True
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+def type_problems(value, type_, path):
+    """Yields why value doesn't convert to the parsed type, one problem per offending path.
+
+    Primitive conversions follow Terraform's (a number is a valid string, "true"
+    a valid bool), and so does null: no type constraint rejects it, only a
+    variable's nullable = false (see validate_tfvars).
+    """
+    if value is None:
+        return
+    if isinstance(value, str) and unescaped(value):
+        yield f"{path}: {value!r} isn't written as a valid HCL string"
+        return
+    if type_ == "any":
+        return
+    if type_ == "string":
+        if not isinstance(value, (str, int, float, bool)):
+            yield f"{path}: expected a string, found {type(value).__name__}"
+        return
+    if type_ == "number":
+        if not is_number(value):
+            yield f"{path}: expected a number, found {value!r}"
+        return
+    if type_ == "bool":
+        if not isinstance(value, bool) and value not in ("true", "false"):
+            yield f"{path}: expected a bool, found {value!r}"
+        return
+
+    kind, element = type_
+    if kind in ("list", "set", "tuple"):
+        if not isinstance(value, (list, tuple, set, frozenset)):
+            yield f"{path}: expected a {kind}, found {type(value).__name__}"
+            return
+        items = sorted(value, key=str) if isinstance(value, (set, frozenset)) else list(value)
+        if kind == "tuple" and len(items) != len(element):
+            yield f"{path}: expected {len(element)} elements, found {len(items)}"
+            return
+        for i, item in enumerate(items):
+            yield from type_problems(item, element[i] if kind == "tuple" else element, f"{path}[{i}]")
+        return
+
+    if not isinstance(value, dict):
+        yield f"{path}: expected a {kind}, found {type(value).__name__}"
+        return
+    if kind == "map":
+        for key, item in value.items():
+            if unescaped(str(key)):
+                yield f"{path}: key {key!r} isn't written as a valid HCL string"
+            yield from type_problems(item, element, f'{path}["{key}"]')
+        return
+    for attribute, (attribute_type, optional) in element.items():
+        if attribute in value:
+            yield from type_problems(value[attribute], attribute_type, f"{path}.{attribute}")
+        elif not optional:
+            yield f"{path}: missing attribute {attribute!r}"
+    for attribute in value.keys() - element.keys():
+        yield f"{path}: unexpected attribute {attribute!r} (Terraform would drop it)"
+
+
+def module_problems(values, az_keys):
+    """Yields what the modules would reject even though variables.tf accepts it.
+
+    The subnets, gateways, route-tables and nacls modules index every subnet
+    type by each of az_keys; private routes go through the public NAT gateway
+    of their AZ and nonroutable ones through the private NAT gateway in the
+    nonroutable subnet; public routes go to the IGW and are keyed by CIDR.
+    """
+    nat = values.get("nat")
+    if isinstance(nat, dict) and "type" in nat and nat["type"] not in NAT_TYPES:
+        yield f"nat.type: {nat['type']!r} is not one of {', '.join(NAT_TYPES)}"
+
+    subnets = values.get("subnets") if isinstance(values.get("subnets"), dict) else {}
+    region = values.get("region")
+    for subnet_type in SUBNET_TYPES:
+        by_key = subnets.get(subnet_type)
+        if not isinstance(by_key, dict):
+            continue
+        for key in az_keys:
+            if key not in by_key:
+                yield f'subnets.{subnet_type}: no "{key}" subnet; {SUBNET_MODULES} index it directly'
+        for key, subnet in by_key.items():
+            az = subnet.get("az") if isinstance(subnet, dict) else None
+            if isinstance(az, str) and isinstance(region, str) and not az.startswith(region):
+                yield f'subnets.{subnet_type}["{key}"].az: {az!r} is not in region {region!r}'
+
+    route_tables = values.get("route_tables") if isinstance(values.get("route_tables"), dict) else {}
+    for table, (target, nat_subnet_type) in ROUTE_TARGETS.items():
+        table_var = route_tables.get(table)
+        routes = table_var.get("routes") if isinstance(table_var, dict) else None
+        if not isinstance(routes, list):
+            continue
+        cidrs = set()
+        for i, route in enumerate(routes):
+            if not isinstance(route, dict):
+                continue
+            path = f"route_tables.{table}.routes[{i}]"
+            if route.get("target") != target:
+                yield f"{path}.target: {route.get('target')!r}, but the route-tables module routes {table} tables to the {target}"
+            if table == "public":
+                if route.get("cidr") in cidrs:
+                    yield f"{path}.cidr: {route.get('cidr')!r} repeats; public routes are keyed by CIDR"
+                cidrs.add(route.get("cidr"))
+            elif route.get("target") == "nat":
+                az_key = route.get("az_key")
+                if az_key is None:
+                    yield f"{path}: NAT route without an az_key"
+                elif az_key not in az_keys or az_key not in (subnets.get(nat_subnet_type) or {}):
+                    yield f'{path}.az_key: no {nat_subnet_type} subnet "{az_key}" for its NAT gateway'
+
+def validate_tfvars(values, variables):
+    """Returns the problems with one tfvars file's {variable: value}.
+
+    values are checked against variables (from load_variables; None skips
+    the type checks) and the module invariants.
+    """
+    problems = []
+    az_keys = values.get("availability_zone_keys")
+    if variables is not None:
+        for name, value in values.items():
+            if name not in variables:
+                problems.append(f"{name}: not declared in {VARIABLES_FILE}")
+            elif value is None and not variables[name].get("nullable", True):
+                problems.append(f"{name}: is null, but {VARIABLES_FILE} declares it nullable = false")
+            else:
+                problems.extend(type_problems(value, variables[name]["type"], name))
+        problems.extend(f"{name}: required variable is not set"
+                        for name, variable in variables.items() if variable["required"] and name not in values)
+        if az_keys is None:
+            az_keys = (variables.get("availability_zone_keys") or {}).get("default")
+    problems.extend(module_problems(values, az_keys or ()))
+    return problems
@@ -0,0 +1,135 @@
+"""Discover a VPC and generate its tfvars and import blocks in one process.
+
+    python vpc-pipeline.py all dev-us-east-1-vpc1        # records file, tfvars and imports.tf
+    python vpc-pipeline.py generate vpc-054415081e04329ba  # tfvars only
+    python vpc-pipeline.py imports --records resources_for_import.ndjson
+
+Stages hand the discovery records to each other in memory instead of through
+the records file, and each script (and boto3) is only imported when a stage
+needs it, so an --offline or --records run never touches AWS.
+"""
+import argparse
+import importlib.util
+import os
+import sys
+import time
+
+import api_metrics
+import discovery_cache
+import record_stream
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+STAGES = {
+    "discover": ("records",),
+    "generate": ("tfvars",),
+    "imports": ("imports",),
+    "all": ("records", "tfvars", "imports"),
+}
+
+
+def load_script(filename):
+    """Imports one of the hyphenated CLI scripts as a module, once per process; its __main__ block doesn't run."""
+    name = filename[:-3].replace('-', '_')
+    module = sys.modules.get(name)
+    if module is None:
+        spec = importlib.util.spec_from_file_location(name, os.path.join(SCRIPT_DIR, filename))
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[name] = module
+        spec.loader.exec_module(module)
+    return module
+
+def discover(args, profile, failures):
+    """Returns (records, source label) from --records, the snapshot cache or a live discovery."""
+    if args.records:
+        return list(record_stream.iter_records(args.records)), args.records
+    if args.offline:
+        records = discovery_cache.load_records(args.cache_dir, args.vpc, args.region)
+        if records is None:
+            print(f"ERROR: no cached snapshot for '{args.vpc}' in {args.cache_dir}.")
+            sys.exit(1)
+        return records, f"{args.cache_dir} snapshot of {args.vpc}"
+
+    discover_aws = load_script("discover-aws.py")
+    workers = args.workers or discover_aws.DEFAULT_WORKERS
+    if args.cache:
+        client_factory = lambda max_workers, region: discover_aws.connect(max_workers, region, profile)
+        records = discover_aws.discover_vpc_cached(args.vpc, args.cache_dir, args.ttl, (), args.region, workers,
+                                                   client_factory, profile, failures)
+    else:
+        client = discover_aws.connect(workers, args.region, profile)
+        records = discover_aws.discover_vpc_resources(args.vpc, client, workers, profile, failures)
+    return list(records), f"discovery of {args.vpc}"
+
+def run_pipeline(args):
+    profile = api_metrics.DiscoveryProfile() if args.profile else api_metrics.NO_PROFILE
+    failures = {}
+    timings = []
+
+    start = time.perf_counter()
+    records, source = discover(args, profile, failures)
+    timings.append(("discover", time.perf_counter() - start))
+
+    if not records:
+        print("\n--- DISCOVERY FAILED ---")
+        print("No resources were discovered. Check the VPC ID/Name and AWS connectivity.")
+        sys.exit(1)
+    print(f"-> {len(records)} records from {source}")
+
+    for stage in STAGES[args.command]:
+        if failures and stage != "records":
+            print(f"\nSkipping {stage}: discovery was partial.")
+            continue
+        start = time.perf_counter()
+        if stage == "records":
+            output_file = record_stream.records_file_for(args.format)
+            count = record_stream.write_records(records, output_file)
+            print(f"-> Wrote {count} records to '{output_file}'")
+            source = output_file
+        elif stage == "tfvars":
+            load_script("tfvars-generator.py").generate_tfvars_from_json(records, source)
+        else:
+            load_script("imports-generator.py").generate_imports_from_json(source, args.output, records)
+        timings.append((stage, time.perf_counter() - start))
+
+    print("\nStages: " + ", ".join(f"{stage} {seconds:.2f}s" for stage, seconds in timings))
+    if args.profile:
+        profile.finish()
+        profile.print_summary()
+    if failures:
+        print("\n--- PARTIAL DISCOVERY ---")
+        for name, error in sorted(failures.items()):
+            print(f"Could not describe {name}: {error}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    helps = {
+        "discover": f"discover the VPC and write {record_stream.RECORDS_FILE}",
+        "generate": "discover the VPC and write its tfvars",
+        "imports": "discover the VPC and write imports.tf",
+        "all": "discover once, then write the records file, the tfvars and imports.tf",
+    }
+    for command, help_text in helps.items():
+        sub = subparsers.add_parser(command, help=help_text)
+        sub.add_argument("vpc", metavar="VPC_ID_OR_NAME_TAG", nargs="?")
+        if command != "discover":
+            sub.add_argument("--records", metavar="PATH", help="start from this discovery file instead of discovering")
+        sub.add_argument("--region", help="AWS region (defaults to the AWS config/environment)")
+        sub.add_argument("--workers", type=int, help="concurrent describe_* calls (1 = sequential; default: one per resource type)")
+        sub.add_argument("--cache", action="store_true", help="serve unchanged resource types from the snapshot cache")
+        sub.add_argument("--offline", action="store_true", help="use the cached snapshot without contacting AWS")
+        sub.add_argument("--cache-dir", default=discovery_cache.CACHE_DIR)
+        sub.add_argument("--ttl", type=int, default=discovery_cache.DEFAULT_TTL,
+                         help="seconds before a cached resource type is described again")
+        if "records" in STAGES[command]:
+            sub.add_argument("--format", choices=["ndjson", "json"], default="ndjson", help="records file format")
+        if "imports" in STAGES[command]:
+            sub.add_argument("-o", "--output", default="imports.tf", help="import blocks file")
+        sub.add_argument("--profile", action="store_true", help="print per-call API statistics and discovery phase times")
+    args = parser.parse_args()
+    args.records = getattr(args, "records", None)
+    if not args.vpc and not args.records:
+        parser.error("a VPC_ID_OR_NAME_TAG (or --records) is required")
+
+    run_pipeline(args)